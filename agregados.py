@@ -0,0 +1,70 @@
+import pandas as pd
+
+# --- RESUMOS FINANCEIROS POR OBRA ---
+# Mantidos junto da partição de custos de cada obra: montados uma vez na carga e depois
+# corrigidos só com as linhas que entram/saem, para os dashboards não varrerem todos os
+# lançamentos a cada execução. Cada alteração gera um resumo novo (os leitores nunca veem
+# um resumo pela metade).
+ETAPA_MAO_DE_OBRA = "Mão de Obra"
+ETAPA_ENTRADA_CLIENTE = "Entrada Cliente"
+
+
+def _somar(destino, chaves, valores, sinal):
+    g = pd.DataFrame({"k": chaves, "v": valores}).groupby("k")["v"].agg(["sum", "count"])
+    for chave, soma, n in zip(g.index, g["sum"], g["count"]):
+        s, c = destino.get(chave, (0.0, 0))
+        s, c = s + sinal * soma, c + sinal * n
+        if c > 0: destino[chave] = (s, c)
+        else: destino.pop(chave, None)
+
+
+class ResumoCustos:
+    """Totais de uma obra por mês, por etapa e por descrição (material/serviço)"""
+
+    def __init__(self, mes=None, etapa=None, descricao=None):
+        # chave -> (soma do total, quantidade de lançamentos)
+        self.mes = mes or {}
+        self.etapa = etapa or {}
+        self.descricao = descricao or {}
+
+    @classmethod
+    def de_frame(cls, df):
+        return cls().com(df)
+
+    def com(self, entram=None, saem=None):
+        """Novo resumo com as linhas que entraram somadas e as que saíram descontadas"""
+        novo = ResumoCustos(dict(self.mes), dict(self.etapa), dict(self.descricao))
+        for df, sinal in ((saem, -1), (entram, 1)):
+            if df is None or df.empty or "total" not in df.columns: continue
+            total = pd.to_numeric(df["total"], errors="coerce").fillna(0.0)
+            if "data" in df.columns:
+                _somar(novo.mes, pd.to_datetime(df["data"], errors="coerce").dt.strftime("%Y-%m").fillna("sem data"), total, sinal)
+            if "etapa" in df.columns:
+                _somar(novo.etapa, df["etapa"].astype(object).fillna("Geral").astype(str), total, sinal)
+            if "descricao" in df.columns:
+                _somar(novo.descricao, df["descricao"].fillna("").astype(str), total, sinal)
+        return novo
+
+    @staticmethod
+    def _serie(d):
+        return pd.Series({k: s for k, (s, _) in d.items()}, dtype="float64")
+
+    def por_mes(self):
+        return self._serie(self.mes).sort_index()
+
+    def por_etapa(self):
+        return self._serie(self.etapa).sort_index()
+
+    def por_descricao(self, top=None):
+        s = self._serie(self.descricao).sort_values(ascending=False)
+        return s.head(top) if top else s
+
+    def total(self, etapa=None):
+        if etapa is not None: return self.etapa.get(etapa, (0.0, 0))[0]
+        return sum(s for s, _ in self.etapa.values())
+
+    def saldo_pedreiro(self, orcamento_pedreiro):
+        return float(orcamento_pedreiro) - self.total(ETAPA_MAO_DE_OBRA)
+
+    def saldo_cliente(self, orcamento_cliente):
+        return float(orcamento_cliente) - self.total(ETAPA_ENTRADA_CLIENTE)
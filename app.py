@@ -1,99 +1,32 @@
-import streamlit as st
-import pandas as pd
-from supabase import create_client, Client
 import time
-from datetime import datetime
-import numpy as np 
-import re 
+inicio_execucao = time.perf_counter()
+import streamlit as st
+from metricas import Metricas
+from partida import Aquecimento, montar
 
 # --- CONFIGURAÇÃO ---
 st.set_page_config(page_title="Gestão de Obra PRO", layout="wide", page_icon="🏗️")
 
-# --- CONEXÃO SUPABASE ---
+# --- PARTIDA ---
+# Até a tela de login só o Streamlit é carregado; pandas, a conexão (Supabase ou SQLite local,
+# conforme secrets.toml) e a primeira carga ficam prontos numa thread (partida.py)
 @st.cache_resource
-def init_connection():
-    try:
-        url = st.secrets["supabase"]["url"]
-        key = st.secrets["supabase"]["key"]
-        return create_client(url, key)
-    except:
-        st.error("❌ Erro: Configure o arquivo .streamlit/secrets.toml com as chaves do Supabase.")
-        st.stop()
-
-supabase = init_connection()
-
-# --- DEFINIÇÃO DO PADRÃO CONSTRUTIVO (BASEADO NA PLANILHA) ---
-TEMPLATE_ETAPAS = [
-    ("1. Planejamento e Preliminares", 5000.0, [
-        "Projetos e Aprovações", "Limpeza do Terreno", "Ligação Provisória (Água/Luz)", "Barracão e Tapumes"
-    ]),
-    ("2. Infraestrutura (Fundação)", 15000.0, [
-        "Gabarito e Marcação", "Escavação", "Concretagem Sapatas/Estacas", "Vigas Baldrame", 
-        "Impermeabilização", "Passagem de tubulação de esgoto", "Passagem de tubulação de alimentação de energia"
-    ]),
-    ("3. Supraestrutura (Estrutura)", 25000.0, [
-        "Pilares", "Vigas", "Lajes", "Escadas"
-    ]),
-    ("3. Supraestrutura e Alvenaria", 20000.0, [
-        "Marcação dasParedes", "Locação Caixinhas (conferencia de altura e alinhamento)", 
-        "Conferencia dos pontos hidráulicos e esgoto (altura dos mesmos)", "Impermeabilização das 3 fiadas", 
-        "Embuço", "Impermeabilização dos Banheiros"
-    ]),
-    ("4. Alvenaria e Vedação", 12000.0, [
-        "Levantamento de Paredes", "Vergas e Contravergas", "Chapisco e Emboço"
-    ]),
-    ("4. Cobertura", 10000.0, [
-        "Montagem da Lage", "Passagem e Conferencia dos Conduites", "Estrutura Telhado", "Telhamento", "Calhas e Rufos"
-    ]),
-    ("5. Instalações", 10000.0, [
-        "Conferir medidas de saida de esgoto do vaso", "Ralo dentro e fora do boxe", 
-        "Conferir medida do desnível para o chuveiro", "Conferir novamente pontos de esgoto e aguá das pias(alturas)"
-    ]),
-    ("6. Instalações", 15000.0, [
-        "Tubulação Água/Esgoto", "Eletrodutos e Caixinhas", "Fiação e Cabos", "Tubulação Gás/Ar"
-    ]),
-    ("7. Acabamentos", 30000.0, [
-        "Contrapiso", "Reboco/Gesso", "Revestimentos (Piso/Parede)", "Louças e Metais", 
-        "Esquadrias (Portas/Janelas)", "Conferir alinhamento dos pisos", 
-        "Conferir alinhamento dos pisos nas varandas em todos os cantos", "Conferir largura do desnível dos banheiros"
-    ]),
-    ("8. Área Externa e Finalização", 5000.0, [
-        "Muros e Calçadas", "Pintura Interna/Externa", "Elétrica Final (Tomadas/Luz)", "Limpeza Pós-Obra"
-    ])
-]
+def init_metricas():
+    # Latência das chamadas ao banco e das execuções (aba Performance); com "metricas" no
+    # [armazenamento] do secrets.toml também grava em JSON lines
+    return Metricas(st.secrets.get("armazenamento", {}).get("metricas"))
 
-# --- FUNÇÕES AUXILIARES ---
-def extrair_numero_etapa(texto):
-    try:
-        match = re.match(r"(\d+)", str(texto))
-        return int(match.group(1)) if match else 9999
-    except: return 9999
-
-def run_query(table_name):
-    """Busca dados do Supabase e converte para DataFrame"""
-    try:
-        response = supabase.table(table_name).select("*").execute()
-        df = pd.DataFrame(response.data)
-        return df if not df.empty else pd.DataFrame()
-    except:
-        return pd.DataFrame()
-
-@st.cache_data(ttl=2) 
-def carregar_tudo():
-    dados = {}
-    tabelas = ["obras", "custos", "cronograma", "materiais", "fornecedores", "pontos_criticos", "tarefas"]
-    
-    for tbl in tabelas:
-        dados[tbl] = run_query(tbl)
-            
-    # Converte números
-    if not dados['custos'].empty:
-        for c in ['valor', 'total', 'qtd']:
-            dados['custos'][c] = pd.to_numeric(dados['custos'][c], errors='coerce').fillna(0.0)
-    if not dados['cronograma'].empty:
-        dados['cronograma']['orcamento'] = pd.to_numeric(dados['cronograma']['orcamento'], errors='coerce').fillna(0.0)
+metricas = init_metricas()
 
-    return dados
+TABELAS_GLOBAIS = ["obras", "materiais", "fornecedores", "modelos", "obras_arquivadas"]
+TABELAS_OBRA = ["custos", "cronograma", "pontos_criticos", "tarefas"]
+
+@st.cache_resource
+def init_aquecimento():
+    # Começa na primeira execução do processo, enquanto a tela de login é desenhada
+    return Aquecimento(montar, st.secrets.to_dict(), metricas, TABELAS_GLOBAIS, TABELAS_OBRA)
+
+aquecimento = init_aquecimento()
 
 # --- LOGIN ---
 if "password_correct" not in st.session_state: st.session_state["password_correct"] = False
@@ -106,8 +39,80 @@ if not st.session_state["password_correct"]:
             if pwd == st.secrets["acesso"]["senha_admin"]:
                 st.session_state["password_correct"] = True
                 st.rerun()
+    metricas.registrar("partida", "tela_login", (time.perf_counter() - inicio_execucao) * 1000)
     st.stop()
 
+# --- CONEXÃO COM O BANCO ---
+try:
+    if aquecimento.pronto(): repo, cache, carteira, padroes, arquivo = aquecimento.resultado()
+    else:
+        with st.spinner("Conectando ao banco..."), metricas.medir("partida", "espera_apos_login"):
+            repo, cache, carteira, padroes, arquivo = aquecimento.resultado()
+except Exception:
+    init_aquecimento.clear()  # tenta de novo na próxima execução
+    st.error("❌ Erro: Configure o arquivo .streamlit/secrets.toml com as chaves do Supabase.")
+    st.stop()
+
+from datetime import datetime
+from armazenamento import STATUS_ARQUIVADA, STATUS_CONCLUIDA
+from dados import linhas_alteradas
+from planilhas import ImportadorPrecos, adivinhar_colunas, cabecalho, ler_blocos
+from modelos import linhas_padrao
+from notas import acrescentar, completar, grade_vazia, ler_itens, ler_texto, linhas_nota, nota_lancada
+from vigia import INTERVALO_S
+
+# --- FUNÇÕES AUXILIARES ---
+def cursores_pagina(prefixo, params):
+    """Pilha de cursores da paginação (o topo é a página atual); volta à 1ª página se os filtros mudam"""
+    if st.session_state.get(f"{prefixo}_params") != params:
+        st.session_state[f"{prefixo}_params"] = params
+        st.session_state[f"{prefixo}_cursores"] = [None]
+    return st.session_state[f"{prefixo}_cursores"]
+
+ORDENS_HISTORICO = {"Data (recentes)": ("data", True), "Data (antigas)": ("data", False),
+                    "Valor (maiores)": ("total", True), "Valor (menores)": ("total", False)}
+TAMANHO_PAGINA = 50
+
+@st.fragment(run_every="10s")
+def situacao_envio():
+    pend, env, falhas, erro = cache.fila.situacao()
+    if pend: st.warning(f"⏳ {pend} lançamento(s) aguardando envio" + (f"\n\nÚltimo erro: {erro}" if erro else ""))
+    elif not falhas: st.caption(f"✅ Lançamentos sincronizados ({env} nas últimas 24h)")
+    if falhas:
+        # Recusados pelo banco: fora do envio (o resto da fila segue) até reenviar ou descartar
+        st.error(f"❌ {falhas} lançamento(s) recusado(s) pelo banco")
+        with st.expander("Ver recusados"):
+            regs = cache.fila.falhas()
+            sel = st.dataframe([{"Tabela": r["tabela"], "Obra": r["id_obra"], "Tentativas": r["tentativas"], "Erro": r["erro"],
+                                 "Dados": str({k: v for k, v in r["linha"].items() if k != "chave_idem"})} for r in regs],
+                               hide_index=True, on_select="rerun", selection_mode="multi-row", key="falhas_envio")
+            seqs = [regs[i]["seq"] for i in sel.selection.rows if i < len(regs)]
+            c1, c2 = st.columns(2)
+            if c1.button("🔁 Reenviar", disabled=not seqs, key="falhas_reenviar"):
+                cache.fila.reenviar(seqs); st.rerun(scope="fragment")
+            if c2.button("🗑️ Descartar", disabled=not seqs, key="falhas_descartar"):
+                cache.descartar_pendentes(seqs); st.rerun()
+
+@st.fragment(run_every=f"{INTERVALO_S}s")
+def acompanhar_mudancas(id_obra):
+    # Roda sozinho a cada INTERVALO_S: só redesenha a página se o que ela mostra mudou no cache
+    if cache.versoes(id_obra) != st.session_state.get("versoes_vistas"): st.rerun()
+
+def ja_visto(id_obra):
+    # Logo após ler os dados, e depois das gravações desta sessão feitas dentro de fragmentos
+    # (essas já aparecem sem redesenhar a página toda)
+    st.session_state["versoes_vistas"] = cache.versoes(id_obra)
+
+def carregar_tudo():
+    """Tabelas globais em cache; após a primeira carga busca em paralelo só o que mudou"""
+    with metricas.medir("fase", "carregar_tudo"):
+        return cache.sincronizar()
+
+def carregar_obra(id_obra):
+    """Custos, cronograma, checklist e tarefas só da obra selecionada"""
+    with metricas.medir("fase", "carregar_obra"):
+        return cache.carregar_obra(id_obra)
+
 # --- INTERFACE ---
 st.title("🏗️ Gestor Multi-Obras (SQL)")
 DB = carregar_tudo()
@@ -119,21 +124,14 @@ with st.sidebar:
     # SELETOR DE OBRAS
     if DB['obras'].empty:
         st.warning("Nenhuma obra cadastrada.")
-        opcoes = []
         id_obra_atual = 0
         nome_obra_atual = "Sem Obra"
         status_obra = ""
     else:
-        opcoes = DB['obras'].apply(lambda x: f"{x['id']} - {x['nome']}", axis=1).tolist()
-        selecao = st.selectbox("Selecione:", opcoes)
-        try:
-            id_obra_atual = int(selecao.split(" - ")[0])
-            nome_obra_atual = selecao.split(" - ")[1]
-            status_obra = DB['obras'][DB['obras']['id'] == id_obra_atual].iloc[0]['status']
-        except:
-            id_obra_atual = 0
-            nome_obra_atual = "Erro"
-            status_obra = ""
+        v_obras = cache.visao("obras")
+        id_obra_atual = int(st.selectbox("Selecione:", v_obras.ids(), format_func=v_obras.rotulo))
+        nome_obra_atual = v_obras.valor(id_obra_atual, 'nome')
+        status_obra = v_obras.valor(id_obra_atual, 'status', "")
 
     # NOVA OBRA
     with st.expander("➕ Nova Obra", expanded=(DB['obras'].empty)):
@@ -141,47 +139,75 @@ with st.sidebar:
             n_nome = st.text_input("Nome da Obra")
             n_end = st.text_input("Endereço")
             if st.form_submit_button("Criar Obra"):
-                # 1. Cria a Obra
-                res = supabase.table("obras").insert({"nome": n_nome, "endereco": n_end, "status": "Ativa"}).execute()
-                new_id = res.data[0]['id']
-                
-                # 2. Gera Cronograma Padrão
-                lista_crono = [{"id_obra": new_id, "etapa": str(e), "status": "Pendente", "orcamento": float(o), "porcentagem": 0} for e, o, _ in TEMPLATE_ETAPAS]
-                supabase.table("cronograma").insert(lista_crono).execute()
-                
-                # 3. Gera Checklist Padrão
-                lista_subs = []
-                for e, _, subs in TEMPLATE_ETAPAS:
-                    for s in subs: lista_subs.append({"id_obra": new_id, "etapa_pai": str(e), "descricao": str(s), "feito": "FALSE"})
-                supabase.table("pontos_criticos").insert(lista_subs).execute()
-                
-                st.success("Obra criada com sucesso!"); st.cache_data.clear(); time.sleep(1); st.rerun()
+                # Obra + Cronograma + Checklist padrão numa operação só
+                crono, pontos = linhas_padrao(padroes.atual("padrao")["etapas"])
+                cache.criar_obra({"nome": n_nome, "endereco": n_end, "status": "Ativa"}, crono, pontos)
+                st.success("Obra criada com sucesso!"); time.sleep(1); st.rerun()
 
     if id_obra_atual > 0:
-        if status_obra == "Concluída": st.success("✅ OBRA CONCLUÍDA")
+        if status_obra == STATUS_CONCLUIDA: st.success("✅ OBRA CONCLUÍDA")
+        elif status_obra == STATUS_ARQUIVADA: st.info("🗄️ OBRA ARQUIVADA")
         else: st.info("🚧 EM ANDAMENTO")
         
         if st.button("🗑️ Excluir Obra Atual", type="primary"):
-            supabase.table("custos").delete().eq("id_obra", id_obra_atual).execute()
-            supabase.table("cronograma").delete().eq("id_obra", id_obra_atual).execute()
-            supabase.table("pontos_criticos").delete().eq("id_obra", id_obra_atual).execute()
-            supabase.table("obras").delete().eq("id", id_obra_atual).execute()
-            st.success("Excluído!"); st.cache_data.clear(); time.sleep(1); st.rerun()
+            cache.excluir_obra(id_obra_atual)
+            st.success("Excluído!"); time.sleep(1); st.rerun()
 
-    if st.button("🔄 Atualizar Dados"): st.cache_data.clear(); st.rerun()
+    if st.button("🔄 Atualizar Dados"):
+        # Só a obra aberta é recarregada; as demais sessões só redesenham se algo mudar de fato
+        cache.invalidar(*TABELAS_GLOBAIS); cache.invalidar(*TABELAS_OBRA, id_obra=id_obra_atual)
+        cache.vigia.acordar(); st.rerun()
+    situacao_envio()
 
 # --- FILTROS ---
 if id_obra_atual == 0:
     st.info("👈 Crie ou selecione uma obra no menu lateral para começar.")
+    ja_visto(0); acompanhar_mudancas(0)
+    st.stop()
+
+# --- OBRA ARQUIVADA ---
+# As linhas estão no arquivo morto (arquivo_morto.py): baixadas só agora e só para leitura
+if status_obra == STATUS_ARQUIVADA:
+    st.subheader(f"🗄️ {nome_obra_atual} (arquivada)")
+    res = arquivo.resumo(id_obra_atual) or {}
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Gasto", f"R$ {res.get('gasto', 0):,.2f}")
+    c2.metric("Recebido do Cliente", f"R$ {res.get('recebido', 0):,.2f}")
+    c3.metric("Orçado (Etapas)", f"R$ {res.get('orcado', 0):,.2f}")
+    c4.metric("Lançamentos", int(res.get('n_custos', 0)))
+    if res: st.caption(f"Arquivada em {str(res['arquivada_em'])[:10]} · {res['bytes'] / 1024:,.0f} KB em Parquet")
+    with st.spinner("Abrindo o arquivo da obra..."), metricas.medir("fase", "carregar_arquivo"):
+        ARQ = arquivo.carregar(id_obra_atual)
+    a1, a2, a3 = st.tabs(["📊 Histórico", "📅 Cronograma", "✅ Checklist e Tarefas"])
+    with a1:
+        if ARQ['custos'].empty: st.info("Sem lançamentos.")
+        else:
+            st.dataframe(ARQ['custos'].sort_values(['data', 'id'], ascending=False)[["data", "descricao", "qtd", "valor", "total", "etapa", "fornecedor"]],
+                         hide_index=True, use_container_width=True, column_config={"data": st.column_config.DateColumn("Data", format="DD/MM/YYYY")})
+            st.download_button("⬇️ Exportar lançamentos (CSV)", ARQ['custos'].to_csv(index=False).encode("utf-8"),
+                               file_name=f"custos_obra_{id_obra_atual}.csv", mime="text/csv")
+    with a2: st.dataframe(ARQ['cronograma'][['etapa', 'status', 'orcamento', 'porcentagem']], hide_index=True, use_container_width=True)
+    with a3:
+        st.dataframe(ARQ['pontos_criticos'][['etapa_pai', 'descricao', 'feito']], hide_index=True, use_container_width=True)
+        st.dataframe(ARQ['tarefas'][['descricao', 'responsavel', 'status']], hide_index=True, use_container_width=True)
+    if st.button("♻️ Reabrir Obra", help="Devolve os lançamentos às tabelas do banco; a obra volta a concluída"):
+        with st.spinner("Reabrindo..."): arquivo.desarquivar(id_obra_atual)
+        st.success("Obra reaberta!"); st.rerun()
+    ja_visto(0); acompanhar_mudancas(0)
     st.stop()
 
-custos_f = DB['custos'][DB['custos']['id_obra'] == id_obra_atual] if not DB['custos'].empty else pd.DataFrame()
-crono_f = DB['cronograma'][DB['cronograma']['id_obra'] == id_obra_atual] if not DB['cronograma'].empty else pd.DataFrame()
-tarefas_f = DB['tarefas'][DB['tarefas']['id_obra'] == id_obra_atual] if not DB['tarefas'].empty else pd.DataFrame()
-pontos_f = DB['pontos_criticos'][DB['pontos_criticos']['id_obra'] == id_obra_atual] if not DB['pontos_criticos'].empty else pd.DataFrame()
+OBRA = carregar_obra(id_obra_atual)
+ja_visto(id_obra_atual)
+custos_f = OBRA['custos']
+crono_f = OBRA['cronograma']
+tarefas_f = OBRA['tarefas']
+pontos_f = OBRA['pontos_criticos']
 
 # --- ABAS ---
-t1, t2, t3, t4, t5, t6, t7 = st.tabs(["📝 Lançar Custos", "📅 Cronograma", "✅ Tarefas", "📦 Cadastros", "📊 Histórico", "📈 Dashboards", "⚙️ Ajustes"])
+# A aba Performance mostra erros crus do banco: só com performance = true no [acesso] do secrets.toml
+MOSTRAR_PERFORMANCE = bool(st.secrets.get("acesso", {}).get("performance", False))
+t1, t2, t3, t4, t5, t6, t7, t8, *t9 = st.tabs(["📝 Lançar Custos", "📅 Cronograma", "✅ Tarefas", "📦 Cadastros", "📊 Histórico", "📈 Dashboards", "🏢 Carteira", "⚙️ Ajustes"]
+                                             + (["⏱️ Performance"] if MOSTRAR_PERFORMANCE else []))
 
 # 1. LANÇAR
 with t1:
@@ -190,19 +216,28 @@ with t1:
     # Selectboxes Dinâmicos
     if "reset_lanc" not in st.session_state: st.session_state.reset_lanc = 0
     
-    lista_mat = [""] + (DB['materiais'].apply(lambda x: f"{x['id']} - {x['nome']}", axis=1).tolist() if not DB['materiais'].empty else [])
-    sel_mat = st.selectbox("Produto/Serviço", lista_mat, key=f"mat_{st.session_state.reset_lanc}")
+    # Só as melhores sugestões da busca vão para o selectbox, não o cadastro inteiro
+    v_mat = cache.visao("materiais")
+    c_busca, c_mat = st.columns([1, 2])
+    termo = c_busca.text_input("🔎 Buscar material", key=f"busca_mat_{st.session_state.reset_lanc}")
+    sugestoes = v_mat.busca.buscar(termo)
+    # O termo entra na chave para o selectbox recomeçar (já na melhor sugestão) a cada busca
+    sel_mat = c_mat.selectbox("Produto/Serviço", [None] + sugestoes, format_func=v_mat.rotulo, index=1 if termo and sugestoes else 0,
+                              key=f"mat_{st.session_state.reset_lanc}_{termo}")
+    if termo and not sugestoes: c_busca.caption("Nenhum material encontrado.")
     
     lista_forn = ["-"] + (DB['fornecedores']['nome'].tolist() if not DB['fornecedores'].empty else [])
     sel_forn = st.selectbox("Fornecedor", lista_forn, key=f"forn_{st.session_state.reset_lanc}")
     
     # Preenchimento automático
     nome, un, val = "", "un", 0.0
-    if sel_mat:
-        cod = int(sel_mat.split(" - ")[0])
-        item = DB['materiais'][DB['materiais']['id'] == cod].iloc[0]
+    if sel_mat is not None:
+        item = v_mat.linha(sel_mat)
         nome, un, val = item['nome'], item['unidade'], float(item['preco_ref'])
 
+    # Etapas ordenadas
+    etapas_disp = cache.visao("cronograma", id_obra_atual).df['etapa'].tolist() if not crono_f.empty else ["Geral"]
+
     with st.form("lancar", clear_on_submit=True):
         c1,c2,c3 = st.columns(3)
         data = c1.date_input("Data")
@@ -210,53 +245,103 @@ with t1:
         valor = c3.number_input("Valor Unitário (R$)", value=val)
         c4,c5 = st.columns(2)
         qtd = c4.number_input("Quantidade", 1.0)
-        
-        # Etapas ordenadas
-        etapas_disp = ["Geral"]
-        if not crono_f.empty:
-            df_temp = crono_f.copy()
-            df_temp['sid'] = df_temp['etapa'].apply(extrair_numero_etapa)
-            etapas_disp = df_temp.sort_values('sid')['etapa'].tolist()
         etapa = c5.selectbox("Etapa", etapas_disp)
         
         if st.form_submit_button("💾 Salvar Lançamento"):
-            if not sel_mat: st.error("Selecione um item da lista.")
+            if sel_mat is None: st.error("Selecione um item da lista.")
             else:
-                supabase.table("custos").insert({
+                cache.enfileirar("custos", [{
                     "id_obra": id_obra_atual, "data": str(data), "descricao": nome,
                     "qtd": qtd, "unidade": un, "valor": valor, "total": valor*qtd,
                     "classe": "Material", "etapa": etapa, "fornecedor": sel_forn
-                }).execute()
-                st.success("Salvo!"); st.session_state.reset_lanc += 1; st.cache_data.clear(); time.sleep(0.5); st.rerun()
+                }], id_obra=id_obra_atual)
+                st.toast("Salvo!"); st.session_state.reset_lanc += 1; st.rerun()
+
+    # NOTA FISCAL: vários itens com a mesma data, fornecedor e etapa, gravados de uma vez
+    with st.expander("🧾 Lançar Nota Fiscal (vários itens)"):
+        if "nota" not in st.session_state: st.session_state.nota = {"v": 0, "lote": 0, "itens": grade_vazia(), "cab": {}}
+        nota = st.session_state.nota
+        c_arq, c_txt = st.columns(2)
+        arq = c_arq.file_uploader("XML da NF-e ou planilha dos itens", type=["xml", "csv", "txt", "xlsx"], key=f"nota_arq_{nota['lote']}")
+        colado = c_txt.text_area("...ou cole as linhas (descrição, quantidade, unidade, valor)", key=f"nota_txt_{nota['lote']}", height=100)
+        if st.button("📥 Carregar Itens", disabled=not (arq or colado.strip())):
+            try:
+                itens, cab = ler_itens(arq, arq.name) if arq else ler_texto(colado)
+                st.session_state.nota = {"v": nota["v"] + 1, "lote": nota["lote"] + 1, "itens": completar(itens, v_mat), "cab": cab}
+                st.rerun()
+            except Exception as e: st.error(f"Não foi possível ler os itens: {e}")
+
+        cab = nota["cab"]
+        if cab.get("numero"): st.caption(f"NF-e nº {cab['numero']}" + (f" · {cab['fornecedor']}" if cab.get("fornecedor") else ""))
+        if nota_lancada(custos_f, cab.get("chave")): st.warning("⚠️ Esta NF-e já foi lançada nesta obra: os itens já gravados não serão repetidos.")
+        c1, c2, c3 = st.columns(3)
+        n_data = c1.date_input("Data da Nota", datetime.strptime(cab["data"], "%Y-%m-%d").date() if cab.get("data") else "today", key=f"nota_data_{nota['lote']}")
+        opcoes_forn = lista_forn + ([cab["fornecedor"]] if cab.get("fornecedor") and cab["fornecedor"] not in lista_forn else [])
+        n_forn = c2.selectbox("Fornecedor", opcoes_forn, index=opcoes_forn.index(cab["fornecedor"]) if cab.get("fornecedor") else 0, key=f"nota_forn_{nota['lote']}")
+        n_etapa = c3.selectbox("Etapa", etapas_disp, key=f"nota_etapa_{nota['lote']}")
+
+        grade = st.data_editor(nota["itens"], num_rows="dynamic", hide_index=True, use_container_width=True, key=f"nota_grade_{nota['v']}",
+                               column_config={"descricao": st.column_config.TextColumn("Descrição", width="large"),
+                                              "qtd": st.column_config.NumberColumn("Qtd", min_value=0.0, format="%.2f"),
+                                              "unidade": "Unidade", "valor": st.column_config.NumberColumn("Valor Unitário (R$)", min_value=0.0, format="R$ %.2f")})
+        # Itens digitados com o nome de um material do cadastro recebem unidade e preço de referência
+        grade = completar(grade, v_mat)
+        linhas = linhas_nota(grade, id_obra_atual, n_data, n_forn, n_etapa, chave=cab.get("chave"))
+        sem_valor = sum(1 for l in linhas if not l["valor"])
+        if sem_valor: st.caption(f"{sem_valor} item(ns) sem valor: confira antes de salvar.")
+
+        c_add, c_salvar = st.columns(2)
+        if c_add.button("➕ Adicionar o Produto/Serviço selecionado", disabled=sel_mat is None):
+            st.session_state.nota = {**nota, "v": nota["v"] + 1, "itens": acrescentar(grade, nome, 1.0, un, val)}
+            st.rerun()
+        if c_salvar.button(f"💾 Salvar Nota ({len(linhas)} itens · R$ {sum(l['total'] for l in linhas):,.2f})", type="primary", disabled=not linhas):
+            # Uma transação no diário local; o envio manda a nota num insert só
+            cache.enfileirar("custos", linhas, id_obra=id_obra_atual)
+            st.session_state.nota = {"v": nota["v"] + 1, "lote": nota["lote"] + 1, "itens": grade_vazia(), "cab": {}}
+            st.toast(f"Nota salva: {len(linhas)} itens."); st.rerun()
 
 # 2. CRONOGRAMA
+# Gravações nos callbacks dos widgets: rodam antes do fragmento se redesenhar, então ele
+# já mostra o valor novo sem precisar de st.rerun()
+def salvar_progresso(id_obra, id_etapa):
+    cache.atualizar("cronograma", id_etapa, {"porcentagem": st.session_state[f"s_{id_etapa}"]}, id_obra=id_obra)
+    ja_visto(id_obra)
+
+def marcar_ponto(id_obra, id_ponto):
+    feito = st.session_state[f"ck_{id_ponto}"]
+    cache.atualizar("pontos_criticos", id_ponto, {"feito": "TRUE" if feito else "FALSE"}, id_obra=id_obra)
+    ja_visto(id_obra)
+
+def adicionar_ponto(id_obra, id_etapa, etapa):
+    cache.inserir("pontos_criticos", {"id_obra": id_obra, "etapa_pai": etapa, "descricao": st.session_state[f"ns_{id_etapa}"]}, id_obra=id_obra)
+    st.session_state[f"ns_{id_etapa}"] = ""
+    ja_visto(id_obra)
+
+@st.fragment
+def etapa_cronograma(id_obra, id_etapa):
+    """Uma etapa com o checklist: um widget alterado aqui redesenha só esta etapa"""
+    row = cache.visao("cronograma", id_obra).linha(id_etapa)
+    if row is None: return
+    with st.expander(f"📌 {row['etapa']} ({row['porcentagem']}%) | Meta: R$ {float(row['orcamento']):,.2f}"):
+        col_s, col_chk = st.columns([0.4, 0.6])
+        
+        with col_s:
+            st.slider("Progresso", 0, 100, int(row['porcentagem']), key=f"s_{id_etapa}", on_change=salvar_progresso, args=(id_obra, id_etapa))
+        
+        with col_chk:
+            subs = cache.visao("pontos_criticos", id_obra).grupo(row['etapa'])
+            for _, sub in subs.iterrows():
+                st.checkbox(sub['descricao'], value=bool(sub['feito']), key=f"ck_{sub['id']}", on_change=marcar_ponto, args=(id_obra, int(sub['id'])))
+            
+            # Botão rápido para adicionar sub-tarefa pontual
+            c_add1, c_add2 = st.columns([0.8, 0.2])
+            c_add1.text_input("Nova Sub-tarefa", key=f"ns_{id_etapa}")
+            c_add2.button("Add", key=f"bns_{id_etapa}", on_click=adicionar_ponto, args=(id_obra, id_etapa, row['etapa']))
+
 with t2:
     if not crono_f.empty:
-        crono_f['sid'] = crono_f['etapa'].apply(extrair_numero_etapa)
-        for _, row in crono_f.sort_values("sid").iterrows():
-            with st.expander(f"📌 {row['etapa']} ({row['porcentagem']}%) | Meta: R$ {float(row['orcamento']):,.2f}"):
-                col_s, col_chk = st.columns([0.4, 0.6])
-                
-                with col_s:
-                    nv = st.slider("Progresso", 0, 100, int(row['porcentagem']), key=f"s_{row['id']}")
-                    if nv != int(row['porcentagem']):
-                        supabase.table("cronograma").update({"porcentagem": nv}).eq("id", int(row['id'])).execute()
-                        st.cache_data.clear(); st.rerun()
-                
-                with col_chk:
-                    subs = pontos_f[pontos_f['etapa_pai'] == row['etapa']]
-                    for _, sub in subs.iterrows():
-                        chk = st.checkbox(sub['descricao'], value=(sub['feito']=="TRUE"), key=f"ck_{sub['id']}")
-                        if chk != (sub['feito']=="TRUE"):
-                            supabase.table("pontos_criticos").update({"feito": "TRUE" if chk else "FALSE"}).eq("id", int(sub['id'])).execute()
-                            st.cache_data.clear(); st.rerun()
-                    
-                    # Botão rápido para adicionar sub-tarefa pontual
-                    c_add1, c_add2 = st.columns([0.8, 0.2])
-                    ns = c_add1.text_input("Nova Sub-tarefa", key=f"ns_{row['id']}")
-                    if c_add2.button("Add", key=f"bns_{row['id']}"):
-                        supabase.table("pontos_criticos").insert({"id_obra": id_obra_atual, "etapa_pai": row['etapa'], "descricao": ns}).execute()
-                        st.cache_data.clear(); st.rerun()
+        for id_etapa in cache.visao("cronograma", id_obra_atual).ids():
+            etapa_cronograma(id_obra_atual, int(id_etapa))
 
 # 3. TAREFAS
 with t3:
@@ -264,16 +349,16 @@ with t3:
         d = st.text_input("Tarefa")
         r = st.text_input("Responsável")
         if st.form_submit_button("Adicionar"):
-            supabase.table("tarefas").insert({"id_obra": id_obra_atual, "descricao": d, "responsavel": r, "status": "Pendente"}).execute()
-            st.cache_data.clear(); st.rerun()
+            cache.inserir("tarefas", {"id_obra": id_obra_atual, "descricao": d, "responsavel": r, "status": "Pendente"}, id_obra=id_obra_atual)
+            st.rerun()
     
     if not tarefas_f.empty:
         for _, t in tarefas_f.iterrows():
             if t['status'] != 'Concluída':
                 c1, c2 = st.columns([0.05, 0.95])
                 if c1.checkbox("", key=f"t_{t['id']}"):
-                    supabase.table("tarefas").update({"status": "Concluída"}).eq("id", int(t['id'])).execute()
-                    st.cache_data.clear(); st.rerun()
+                    cache.atualizar("tarefas", t['id'], {"status": "Concluída"}, id_obra=id_obra_atual)
+                    st.rerun()
                 c2.write(f"{t['descricao']} ({t['responsavel']})")
 
 # 4. CADASTROS
@@ -286,8 +371,28 @@ with t4:
             u = st.selectbox("Unidade", ["un","m","m²","m³","kg","sc"])
             p = st.number_input("Preço Ref", 0.0)
             if st.form_submit_button("Salvar Material"):
-                supabase.table("materiais").insert({"nome": n, "unidade": u, "preco_ref": p}).execute()
-                st.success("OK"); st.cache_data.clear(); st.rerun()
+                cache.inserir("materiais", {"nome": n, "unidade": u, "preco_ref": p})
+                st.success("OK"); st.rerun()
+
+        with st.expander("📥 Importar tabela de preços (CSV/XLSX)"):
+            arq = st.file_uploader("Planilha do fornecedor", type=["csv", "xlsx"], key="up_precos")
+            if arq is not None:
+                colunas = cabecalho(arq, arq.name)
+                palpite = adivinhar_colunas(colunas)
+                opcoes = [None] + colunas
+                mapa = {campo: st.selectbox(rotulo, opcoes, index=opcoes.index(palpite[campo]), format_func=lambda c: "— não importar —" if c is None else c, key=f"map_{campo}")
+                        for campo, rotulo in (("nome", "Coluna do nome"), ("unidade", "Coluna da unidade"), ("preco_ref", "Coluna do preço"))}
+                if st.button("Importar planilha", disabled=mapa["nome"] is None):
+                    imp = ImportadorPrecos(cache)
+                    barra = st.progress(0.0, text="Importando...")
+                    try:
+                        for bloco, lido in ler_blocos(arq, arq.name):
+                            imp.aplicar(bloco, mapa)
+                            barra.progress(lido, text=f"{imp.linhas} linhas lidas")
+                        st.success(imp.resumo())
+                    except Exception as e:
+                        # Os blocos anteriores já foram gravados; importar de novo só completa o que faltou
+                        st.error(f"Erro: {e} — até aqui: {imp.resumo()}")
     
     with c2:
         st.write("🚚 **Fornecedores**")
@@ -295,60 +400,117 @@ with t4:
             n = st.text_input("Nome")
             t = st.text_input("Tel")
             if st.form_submit_button("Salvar Fornecedor"):
-                supabase.table("fornecedores").insert({"nome": n, "telefone": t}).execute()
-                st.success("OK"); st.cache_data.clear(); st.rerun()
+                cache.inserir("fornecedores", {"nome": n, "telefone": t})
+                st.success("OK"); st.rerun()
 
 # 5. HISTORICO
 with t5:
     if not custos_f.empty:
-        df_edit = custos_f.copy()
-        df_edit.insert(0, "Excluir", False)
-        res = st.data_editor(df_edit[["Excluir", "data", "descricao", "qtd", "valor", "total", "etapa"]], hide_index=True, use_container_width=True)
+        # Só a página visível vem do banco, já filtrada e ordenada no servidor
+        f1, f2, f3, f4 = st.columns(4)
+        periodo = f1.date_input("Período", value=(), format="DD/MM/YYYY", key="hist_periodo")
+        f_etapa = f2.selectbox("Etapa", ["Todas"] + sorted(cache.resumo(id_obra_atual).etapa), key="hist_etapa")
+        f_forn = f3.selectbox("Fornecedor", lista_forn, key="hist_forn")
+        ordem = ORDENS_HISTORICO[f4.selectbox("Ordenar por", list(ORDENS_HISTORICO), key="hist_ordem")]
+        filtros = {}
+        if len(periodo) == 2: filtros.update(data_de=str(periodo[0]), data_ate=str(periodo[1]))
+        if f_etapa != "Todas": filtros["etapa"] = f_etapa
+        if f_forn != "-": filtros["fornecedor"] = f_forn
         
-        if res["Excluir"].any():
-            if st.button("Confirmar Exclusão"):
-                ids = custos_f.loc[res[res["Excluir"]].index, "id"].tolist()
-                for i in ids: supabase.table("custos").delete().eq("id", int(i)).execute()
-                st.success("Apagado!"); st.cache_data.clear(); st.rerun()
+        cursores = cursores_pagina("hist", (id_obra_atual, tuple(sorted(filtros.items())), ordem))
+        try: pag, proximo = cache.pagina("custos", id_obra_atual, filtros, ordem, cursores[-1], TAMANHO_PAGINA)
+        except Exception as e:
+            # Falha do banco não derruba a aba: mostra o erro e volta à primeira página
+            st.error(f"❌ Erro ao buscar o histórico: {e}"); del cursores[1:]
+            pag, proximo = custos_f.iloc[:0], None
+        if pag.empty: st.info("Nenhum lançamento com esses filtros.")
+        else:
+            df_edit = pag[["data", "descricao", "qtd", "valor", "total", "etapa", "fornecedor"]]
+            df_edit.insert(0, "Excluir", False)
+            res = st.data_editor(df_edit, hide_index=True, use_container_width=True, disabled=list(df_edit.columns[1:]),
+                                 column_config={"data": st.column_config.DateColumn("Data", format="DD/MM/YYYY")}, key=f"hist_editor_{len(cursores)}")
+            
+            if res["Excluir"].any():
+                if st.button("Confirmar Exclusão"):
+                    ids = pag.loc[res[res["Excluir"]].index, "id"].tolist()
+                    cache.excluir_lote("custos", ids, id_obra=id_obra_atual)
+                    st.success(f"Apagado! {len(ids)} lançamento(s)."); st.rerun()
+        
+        n1, n2, n3 = st.columns([1, 1, 4])
+        if n1.button("⬅️ Anterior", disabled=len(cursores) == 1): cursores.pop(); st.rerun()
+        if n2.button("Próxima ➡️", disabled=proximo is None): cursores.append(proximo); st.rerun()
+        n3.caption(f"Página {len(cursores)}")
+        # Lançamentos ainda na fila (id provisório negativo) só chegam ao histórico depois do envio
+        pend = int((custos_f["id"] < 0).sum())
+        if pend: n3.caption(f"⏳ {pend} lançamento(s) aguardando envio ainda não aparecem aqui.")
 
 # 6. DASHBOARDS
 with t6:
     if custos_f.empty: st.info("Sem dados.")
     else:
-        df_c = custos_f.copy()
-        df_c['dt'] = pd.to_datetime(df_c['data'])
-        df_c['mes'] = df_c['dt'].dt.strftime('%Y-%m')
+        # Totais pré-calculados, mantidos pelo cache a cada lançamento
+        resumo = cache.resumo(id_obra_atual)
         
         c1, c2 = st.columns(2)
         c1.markdown("### 📅 Gastos Mensais")
-        c1.bar_chart(df_c.groupby('mes')['total'].sum())
+        c1.bar_chart(resumo.por_mes())
         
         c2.markdown("### 🧱 Curva ABC (Top Materiais)")
-        top = df_c.groupby('descricao')['total'].sum().sort_values(ascending=False).head(10)
-        c2.bar_chart(top)
+        c2.bar_chart(resumo.por_descricao(top=10))
 
-# 7. AJUSTES (NOVA ABA)
+# 7. CARTEIRA (TODAS AS OBRAS)
 with t7:
-    st.header("⚙️ Ajustes da Obra")
-    
-    st.markdown("### 1. Atualizar Estrutura")
-    st.warning("⚠️ CUIDADO: O botão abaixo apaga todas as etapas atuais e recria baseada na nova planilha.")
-    if st.button("🔄 Aplicar Novo Padrão (Planilha) nesta Obra"):
-        # 1. Limpa cronograma e checklist atuais desta obra
-        supabase.table("pontos_criticos").delete().eq("id_obra", id_obra_atual).execute()
-        supabase.table("cronograma").delete().eq("id_obra", id_obra_atual).execute()
+    orc = carteira.orcado_realizado()
+    if orc.empty: st.info("Sem dados.")
+    else:
+        obras = DB['obras'].reindex(columns=['id', 'nome', 'orcamento_cliente']).set_index('id')
+        orc = orc.join(obras, on='id_obra').dropna(subset=['nome'])
+        orc['uso'] = (orc['gasto'] / orc['orcado'].where(orc['orcado'] > 0) * 100).fillna(0.0)
         
-        # 2. Recria Cronograma
-        lista_crono = [{"id_obra": id_obra_atual, "etapa": str(e), "status": "Pendente", "orcamento": float(o), "porcentagem": 0} for e, o, _ in TEMPLATE_ETAPAS]
-        supabase.table("cronograma").insert(lista_crono).execute()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Obras", len(orc))
+        c2.metric("Gasto Total", f"R$ {orc['gasto'].sum():,.2f}")
+        c3.metric("Orçado (Etapas)", f"R$ {orc['orcado'].sum():,.2f}")
         
-        # 3. Recria Checklist
-        lista_subs = []
-        for e, _, subs in TEMPLATE_ETAPAS:
-            for s in subs: lista_subs.append({"id_obra": id_obra_atual, "etapa_pai": str(e), "descricao": str(s), "feito": "FALSE"})
-        supabase.table("pontos_criticos").insert(lista_subs).execute()
+        st.markdown("### 📅 Gasto Mensal por Obra")
+        gm = carteira.gasto_mensal()
+        st.bar_chart(gm.assign(obra=gm['id_obra'].map(obras['nome'])).dropna(subset=['obra'])
+                     .pivot_table(index='mes', columns='obra', values='total', aggfunc='sum'))
         
-        st.success("Estrutura atualizada com sucesso!"); st.cache_data.clear(); time.sleep(1); st.rerun()
+        st.markdown("### 💰 Orçado x Realizado")
+        st.dataframe(orc[['nome', 'orcado', 'orcamento_cliente', 'gasto', 'recebido', 'uso']], hide_index=True, use_container_width=True,
+                     column_config={"nome": "Obra", "orcado": st.column_config.NumberColumn("Orçado (Etapas)", format="R$ %.2f"),
+                                    "orcamento_cliente": st.column_config.NumberColumn("Orçamento Cliente", format="R$ %.2f"),
+                                    "gasto": st.column_config.NumberColumn("Gasto", format="R$ %.2f"),
+                                    "recebido": st.column_config.NumberColumn("Recebido", format="R$ %.2f"),
+                                    "uso": st.column_config.ProgressColumn("% do Orçado", format="%.0f%%", min_value=0, max_value=100)})
+        
+        st.markdown("### 🧱 Top Materiais (Todas as Obras)")
+        st.dataframe(carteira.top_materiais(), hide_index=True, use_container_width=True,
+                     column_config={"descricao": "Material/Serviço", "total": st.column_config.NumberColumn("Total", format="R$ %.2f"), "obras": "Obras"})
+        st.caption(f"Cópia atualizada às {datetime.fromtimestamp(carteira.ultima_sync):%H:%M:%S} · consultas em {carteira.motor}")
+
+# 8. AJUSTES (NOVA ABA)
+with t8:
+    st.header("⚙️ Ajustes da Obra")
+    
+    st.markdown("### 1. Atualizar Estrutura")
+    padrao = padroes.atual("padrao")
+    st.info(f"Padrão construtivo na versão {padrao['versao']}: etapas e itens renomeados, novos ou retirados do padrão "
+            "são levados às obras sem perder porcentagem, itens feitos e lançamentos. "
+            "Etapas criadas à mão e as que já têm avanço não são apagadas.")
+    alcance = st.radio("Aplicar em:", ["Esta obra", "Todas as obras ativas"], horizontal=True, key="alcance_padrao")
+    if st.button(f"🔄 Aplicar Padrão v{padrao['versao']}"):
+        if alcance == "Esta obra": ids = [id_obra_atual]
+        else: ids = DB['obras'].loc[~DB['obras']['status'].isin([STATUS_CONCLUIDA, STATUS_ARQUIVADA]), 'id'].tolist()
+        with st.spinner("Comparando as obras com o padrão..."), metricas.medir("fase", "aplicar_padrao"):
+            r = padroes.aplicar("padrao", ids)
+        if r["obras"]:
+            st.success(f"Padrão aplicado em {r['obras']} obra(s): {r['inserir']} linha(s) nova(s), "
+                       f"{r['atualizar']} renomeada(s), {r['excluir']} retirada(s)."
+                       + (f" {r['mantidas']} fora do padrão mantida(s) por já terem avanço." if r["mantidas"] else ""))
+        else: st.success("As obras já estão na versão atual do padrão.")
+        time.sleep(1); st.rerun()
         
     st.markdown("---")
     st.markdown("### 2. Editor Manual de Etapas")
@@ -358,25 +520,68 @@ with t7:
         df_crono_edit = st.data_editor(crono_f[['id', 'etapa', 'orcamento']], key="editor_crono", hide_index=True)
         
         if st.button("💾 Salvar Alterações nas Etapas"):
-            # Compara e salva alterações
-            for index, row in df_crono_edit.iterrows():
-                # Atualiza no banco
-                supabase.table("cronograma").update({
-                    "etapa": row['etapa'],
-                    "orcamento": row['orcamento']
-                }).eq("id", int(row['id'])).execute()
-            st.success("Salvo!"); st.cache_data.clear(); time.sleep(0.5); st.rerun()
+            # Envia só as linhas alteradas, num único upsert
+            n = cache.salvar_lote("cronograma", linhas_alteradas(crono_f, df_crono_edit, ['etapa', 'orcamento']), id_obra=id_obra_atual)
+            st.success(f"Salvo! {n} etapa(s) alterada(s)."); time.sleep(0.5); st.rerun()
             
     st.markdown("---")
     st.markdown("### 3. Editor Manual de Sub-Etapas (Checklist)")
     if not pontos_f.empty:
         st.write("Edite descrições das sub-tarefas:")
-        df_pontos_edit = st.data_editor(pontos_f[['id', 'etapa_pai', 'descricao']], key="editor_pontos", hide_index=True)
+        df_pontos_edit = st.data_editor(pontos_f[['id', 'etapa_pai', 'descricao']].astype({'etapa_pai': str}), key="editor_pontos", hide_index=True)
         
         if st.button("💾 Salvar Alterações nas Sub-Etapas"):
-            for index, row in df_pontos_edit.iterrows():
-                supabase.table("pontos_criticos").update({
-                    "descricao": row['descricao'],
-                    "etapa_pai": row['etapa_pai']
-                }).eq("id", int(row['id'])).execute()
-            st.success("Salvo!"); st.cache_data.clear(); time.sleep(0.5); st.rerun()
\ No newline at end of file
+            n = cache.salvar_lote("pontos_criticos", linhas_alteradas(pontos_f, df_pontos_edit, ['descricao', 'etapa_pai']), id_obra=id_obra_atual)
+            st.success(f"Salvo! {n} sub-etapa(s) alterada(s)."); time.sleep(0.5); st.rerun()
+
+    st.markdown("---")
+    st.markdown("### 4. Arquivo Morto")
+    st.info("Obras concluídas podem ser arquivadas: os lançamentos saem das tabelas do banco (que ficam menores e mais rápidas) "
+            "e vão para arquivos Parquet. A obra continua na lista, aberta só para leitura, e entra normalmente na Carteira.")
+    c1, c2 = st.columns(2)
+    if status_obra != STATUS_CONCLUIDA:
+        if c1.button("✅ Marcar Obra como Concluída"):
+            cache.atualizar("obras", id_obra_atual, {"status": STATUS_CONCLUIDA})
+            st.success("Obra concluída!"); st.rerun()
+    elif c1.button("🗄️ Arquivar Esta Obra"):
+        with st.spinner("Arquivando..."), metricas.medir("fase", "arquivar"):
+            try: r = arquivo.arquivar(id_obra_atual)
+            except Exception as e: st.error(f"Não arquivada: {e}"); st.stop()
+        st.success(f"Arquivada! {r['n_custos']} lançamento(s), {r['bytes'] / 1024:,.0f} KB."); time.sleep(1); st.rerun()
+    n_concl = int((DB['obras']['status'] == STATUS_CONCLUIDA).sum())
+    if c2.button(f"🗄️ Arquivar Todas as Concluídas ({n_concl})", disabled=n_concl == 0):
+        with st.spinner("Arquivando..."), metricas.medir("fase", "arquivar"):
+            erros = arquivo.arquivar_concluidas()
+        if erros: st.warning("Não arquivadas: " + "; ".join(f"obra {i}: {e}" for i, e in erros.items()))
+        else: st.success(f"{n_concl} obra(s) arquivada(s)!")
+        time.sleep(1); st.rerun()
+
+# 9. PERFORMANCE
+if MOSTRAR_PERFORMANCE:
+    with t9[0]:
+        st.caption("Chamadas ao banco, fases de carga e execuções do script desta instância do app.")
+        # Só monta a tabela quando pedido: as abas rodam todas a cada execução
+        if st.toggle("Mostrar medições", key="perf_mostrar"):
+            res = metricas.resumo()
+            if res.empty: st.info("Sem medições ainda.")
+            else:
+                st.dataframe(res, hide_index=True, use_container_width=True,
+                             column_config={c: st.column_config.NumberColumn(format="%.1f") for c in ["p50_ms", "p95_ms", "max_ms", "linhas_media", "kb_total"]})
+                execucoes = metricas.frame().query("tipo == 'execucao'").tail(200)
+                if not execucoes.empty:
+                    st.markdown("### ⏱️ Últimas execuções do script (ms)")
+                    st.line_chart(execucoes.reset_index(drop=True)["ms"])
+            c1, c2 = st.columns(2)
+            c1.download_button("⬇️ Exportar (JSON lines)", metricas.para_jsonl(), file_name="metricas.jsonl", mime="application/x-ndjson")
+            if c2.button("🧹 Limpar medições"): metricas.limpar(); st.rerun()
+            vg = cache.vigia
+            rodada = f"{datetime.fromtimestamp(vg.ultima_rodada):%H:%M:%S}" if vg.ultima_rodada else "—"
+            st.caption(f"Vigia do banco: {'Realtime + consulta' if vg.realtime else 'consulta'} · última rodada {rodada} · "
+                       f"{vg.linhas_recebidas} linha(s) de outros usuários" + (f" · erro: {vg.ultimo_erro}" if vg.ultimo_erro else ""))
+            if cache.erro_pacote:
+                st.caption(f"Carga da obra {'numa ida (pacote_obra)' if cache.usar_pacote else 'tabela por tabela'} · última falha do pacote: {cache.erro_pacote}")
+
+acompanhar_mudancas(id_obra_atual)
+
+# Tempo da execução completa (as que param antes, no login ou sem obra, não entram)
+metricas.registrar("execucao", "script", (time.perf_counter() - inicio_execucao) * 1000)
@@ -1,91 +1,32 @@
-import streamlit as st
-import pandas as pd
-from supabase import create_client, Client
 import time
-from datetime import datetime
-import numpy as np
+inicio_execucao = time.perf_counter()
+import streamlit as st
+from metricas import Metricas
+from partida import Aquecimento, montar
 
 # --- CONFIGURAÇÃO ---
 st.set_page_config(page_title="Gestão de Obra PRO", layout="wide", page_icon="🏗️")
 
-# --- CONEXÃO SUPABASE ---
+# --- PARTIDA ---
+# Até a tela de login só o Streamlit é carregado; pandas, a conexão (Supabase ou SQLite local,
+# conforme secrets.toml) e a primeira carga ficam prontos numa thread (partida.py)
 @st.cache_resource
-def init_connection():
-    try:
-        url = st.secrets["supabase"]["url"]
-        key = st.secrets["supabase"]["key"]
-        return create_client(url, key)
-    except Exception as e:
-        st.error(f"Erro de Conexão: {e}")
-        st.stop()
-
-supabase = init_connection()
-
-# --- PADRÃO DE ETAPAS (Fiel ao seu arquivo cronograma.xlsx) ---
-ETAPAS_PADRAO = [
-    {"pai": "1. Planejamento e Preliminares", "sub": "Projetos e Aprovações"},
-    {"pai": "1. Planejamento e Preliminares", "sub": "Limpeza do Terreno"},
-    {"pai": "1. Planejamento e Preliminares", "sub": "Ligação Provisória (Água/Luz)"},
-    {"pai": "1. Planejamento e Preliminares", "sub": "Barracão e Tapumes"},
-    {"pai": "2. Infraestrutura (Fundação)", "sub": "Gabarito e Marcação"},
-    {"pai": "2. Infraestrutura (Fundação)", "sub": "Escavação"},
-    {"pai": "2. Infraestrutura (Fundação)", "sub": "Concretagem Sapatas/Estacas"},
-    {"pai": "2. Infraestrutura (Fundação)", "sub": "Vigas Baldrame"},
-    {"pai": "2. Infraestrutura (Fundação)", "sub": "Impermeabilização"},
-    {"pai": "2. Infraestrutura (Fundação)", "sub": "Passagem de tubulação de esgoto"},
-    {"pai": "2. Infraestrutura (Fundação)", "sub": "Passagem de tubulação de alimentação de energia"},
-    {"pai": "3. Supraestrutura (Estrutura)", "sub": "Pilares"},
-    {"pai": "3. Supraestrutura (Estrutura)", "sub": "Vigas"},
-    {"pai": "3. Supraestrutura (Estrutura)", "sub": "Lajes"},
-    {"pai": "3. Supraestrutura (Estrutura)", "sub": "Escadas"},
-    {"pai": "3. Supraestrutura e Alvenaria", "sub": "Marcação das Paredes"},
-    {"pai": "3. Supraestrutura e Alvenaria", "sub": "Levantamento de Paredes"},
-    {"pai": "3. Supraestrutura e Alvenaria", "sub": "Impermeabilização das 3 fiadas"},
-    {"pai": "3. Supraestrutura e Alvenaria", "sub": "Locação Caixinhas"},
-    {"pai": "4. Alvenaria e Vedação", "sub": "Vergas e Contravergas"},
-    {"pai": "4. Alvenaria e Vedação", "sub": "Chapisco e Emboço"},
-    {"pai": "5. Cobertura", "sub": "Estrutura Telhado"},
-    {"pai": "5. Cobertura", "sub": "Telhamento"},
-    {"pai": "6. Instalações", "sub": "Tubulação Água/Esgoto"},
-    {"pai": "7. Acabamentos", "sub": "Revestimentos (Piso/Parede)"},
-    {"pai": "8. Área Externa e Finalização", "sub": "Pintura Interna/Externa"}
-]
+def init_metricas():
+    # Latência das chamadas ao banco e das execuções (aba Performance); com "metricas" no
+    # [armazenamento] do secrets.toml também grava em JSON lines
+    return Metricas(st.secrets.get("armazenamento", {}).get("metricas"))
 
-# --- FUNÇÕES AUXILIARES ---
-def formatar_moeda(valor):
-    try: return f"R$ {float(valor):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except: return "R$ 0,00"
+metricas = init_metricas()
 
-def garantir_colunas(df, colunas, tipo="valor"):
-    if df.empty: return pd.DataFrame(columns=colunas)
-    for col in colunas:
-        if col not in df.columns: df[col] = 0.0 if tipo == "valor" else ""
-    return df
+TABELAS_GLOBAIS = ["obras", "materiais", "modelos", "obras_arquivadas"]
+TABELAS_OBRA = ["custos", "cronograma", "tarefas"]
 
-def run_query(table_name):
-    try:
-        response = supabase.table(table_name).select("*").execute()
-        return pd.DataFrame(response.data)
-    except: return pd.DataFrame()
+@st.cache_resource
+def init_aquecimento():
+    # Começa na primeira execução do processo, enquanto a tela de login é desenhada
+    return Aquecimento(montar, st.secrets.to_dict(), metricas, TABELAS_GLOBAIS, TABELAS_OBRA)
 
-@st.cache_data(ttl=2) 
-def carregar_tudo():
-    dados = {}
-    for tbl in ["obras", "custos", "cronograma", "tarefas", "materiais"]:
-        df = run_query(tbl)
-        if tbl == 'obras':
-            df = garantir_colunas(df, ['id', 'nome', 'orcamento_pedreiro', 'orcamento_cliente'])
-        if tbl == 'custos':
-            df = garantir_colunas(df, ['id', 'id_obra', 'valor', 'total', 'descricao', 'data', 'etapa'])
-            if not df.empty: df['data'] = pd.to_datetime(df['data']).dt.date
-        if tbl == 'cronograma':
-            df = garantir_colunas(df, ['id', 'id_obra', 'etapa', 'porcentagem'])
-        if tbl == 'tarefas':
-            df = garantir_colunas(df, ['id', 'id_obra', 'descricao', 'responsavel', 'status'], "texto")
-        if tbl == 'materiais':
-            df = garantir_colunas(df, ['id', 'nome'], "texto")
-        dados[tbl] = df
-    return dados
+aquecimento = init_aquecimento()
 
 # --- LOGIN ---
 if "password_correct" not in st.session_state: st.session_state["password_correct"] = False
@@ -98,8 +39,82 @@ if not st.session_state["password_correct"]:
             if pwd == st.secrets["acesso"]["senha_admin"]:
                 st.session_state["password_correct"] = True
                 st.rerun()
+    metricas.registrar("partida", "tela_login", (time.perf_counter() - inicio_execucao) * 1000)
+    st.stop()
+
+# --- CONEXÃO COM O BANCO ---
+try:
+    if aquecimento.pronto(): repo, cache, carteira, padroes, arquivo = aquecimento.resultado()
+    else:
+        with st.spinner("Conectando ao banco..."), metricas.medir("partida", "espera_apos_login"):
+            repo, cache, carteira, padroes, arquivo = aquecimento.resultado()
+except Exception as e:
+    init_aquecimento.clear()  # tenta de novo na próxima execução
+    st.error(f"Erro de Conexão: {e}")
     st.stop()
 
+from datetime import datetime
+from armazenamento import STATUS_ARQUIVADA, STATUS_CONCLUIDA
+from dados import linhas_alteradas
+from planilhas import ImportadorPrecos, adivinhar_colunas, cabecalho, ler_blocos
+from modelos import linhas_modelo
+from notas import completar, grade_vazia, ler_itens, ler_texto, linhas_nota, nota_lancada
+from vigia import INTERVALO_S
+
+# --- FUNÇÕES AUXILIARES ---
+def formatar_moeda(valor):
+    try: return f"R$ {float(valor):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    except: return "R$ 0,00"
+
+def cursores_pagina(prefixo, params):
+    """Pilha de cursores da paginação (o topo é a página atual); volta à 1ª página se os filtros mudam"""
+    if st.session_state.get(f"{prefixo}_params") != params:
+        st.session_state[f"{prefixo}_params"] = params
+        st.session_state[f"{prefixo}_cursores"] = [None]
+    return st.session_state[f"{prefixo}_cursores"]
+
+ORDENS_HISTORICO = {"Data (recentes)": ("data", True), "Data (antigas)": ("data", False),
+                    "Valor (maiores)": ("total", True), "Valor (menores)": ("total", False)}
+TAMANHO_PAGINA = 50
+
+@st.fragment(run_every="10s")
+def situacao_envio():
+    pend, env, falhas, erro = cache.fila.situacao()
+    if pend: st.warning(f"⏳ {pend} lançamento(s) aguardando envio" + (f"\n\nÚltimo erro: {erro}" if erro else ""))
+    elif not falhas: st.caption(f"✅ Lançamentos sincronizados ({env} nas últimas 24h)")
+    if falhas:
+        # Recusados pelo banco: fora do envio (o resto da fila segue) até reenviar ou descartar
+        st.error(f"❌ {falhas} lançamento(s) recusado(s) pelo banco")
+        with st.expander("Ver recusados"):
+            regs = cache.fila.falhas()
+            sel = st.dataframe([{"Tabela": r["tabela"], "Obra": r["id_obra"], "Tentativas": r["tentativas"], "Erro": r["erro"],
+                                 "Dados": str({k: v for k, v in r["linha"].items() if k != "chave_idem"})} for r in regs],
+                               hide_index=True, on_select="rerun", selection_mode="multi-row", key="falhas_envio")
+            seqs = [regs[i]["seq"] for i in sel.selection.rows if i < len(regs)]
+            c1, c2 = st.columns(2)
+            if c1.button("🔁 Reenviar", disabled=not seqs, key="falhas_reenviar"):
+                cache.fila.reenviar(seqs); st.rerun(scope="fragment")
+            if c2.button("🗑️ Descartar", disabled=not seqs, key="falhas_descartar"):
+                cache.descartar_pendentes(seqs); st.rerun()
+
+@st.fragment(run_every=f"{INTERVALO_S}s")
+def acompanhar_mudancas(id_obra):
+    # Roda sozinho a cada INTERVALO_S: só redesenha a página se o que ela mostra mudou no cache
+    if cache.versoes(id_obra) != st.session_state.get("versoes_vistas"): st.rerun()
+
+def ja_visto(id_obra):
+    # Logo após ler os dados, e depois das gravações desta sessão feitas dentro de fragmentos
+    # (essas já aparecem sem redesenhar a página toda)
+    st.session_state["versoes_vistas"] = cache.versoes(id_obra)
+
+def carregar_tudo():
+    with metricas.medir("fase", "carregar_tudo"):
+        return cache.sincronizar()
+
+def carregar_obra(id_obra):
+    with metricas.medir("fase", "carregar_obra"):
+        return cache.carregar_obra(id_obra)
+
 DB = carregar_tudo()
 
 # --- SIDEBAR ---
@@ -107,81 +122,158 @@ with st.sidebar:
     st.header("🏢 Obra Ativa")
     id_obra_atual = 0
     if not DB['obras'].empty:
-        opcoes = DB['obras'].apply(lambda x: f"{x['id']} - {x['nome']}", axis=1).tolist()
-        selecao = st.selectbox("Selecione a Obra:", opcoes)
-        id_obra_atual = int(selecao.split(" - ")[0])
-        row_o = DB['obras'][DB['obras']['id'] == id_obra_atual].iloc[0]
+        v_obras = cache.visao("obras")
+        id_obra_atual = int(st.selectbox("Selecione a Obra:", v_obras.ids(), format_func=v_obras.rotulo))
+        row_o = v_obras.linha(id_obra_atual)
         nome_obra = row_o['nome']
         orc_p = float(row_o.get('orcamento_pedreiro', 0))
         orc_c = float(row_o.get('orcamento_cliente', 0))
+        status_obra = row_o.get('status', "")
+        # Obra concluída sai das tabelas quentes para o arquivo morto (arquivo_morto.py)
+        if status_obra == STATUS_CONCLUIDA and st.button("🗄️ Arquivar Obra Concluída"):
+            with st.spinner("Arquivando..."), metricas.medir("fase", "arquivar"):
+                try: arquivo.arquivar(id_obra_atual)
+                except Exception as e: st.error(f"Não arquivada: {e}"); st.stop()
+            st.rerun()
+
+    situacao_envio()
 
     st.markdown("---")
     with st.expander("➕ Nova Obra"):
         n_nome = st.text_input("Nome da Obra")
         if st.button("Criar Obra"):
             if n_nome:
-                res = supabase.table("obras").insert({"nome": n_nome}).execute()
-                new_id = res.data[0]['id']
-                for item in ETAPAS_PADRAO:
-                    nome_completo = f"{item['pai']} | {item['sub']}"
-                    supabase.table("cronograma").insert({"id_obra": new_id, "etapa": nome_completo, "porcentagem": 0}).execute()
-                st.success("Obra e Cronograma Criados!"); st.cache_data.clear(); st.rerun()
+                crono = list(linhas_modelo(padroes.atual("simples")["etapas"], "plano")["cronograma"].values())
+                cache.criar_obra({"nome": n_nome}, crono)
+                st.success("Obra e Cronograma Criados!"); st.rerun()
 
 if id_obra_atual == 0:
     st.info("👈 Selecione uma obra na barra lateral para começar.")
+    ja_visto(0); acompanhar_mudancas(0)
+    st.stop()
+
+# Obra arquivada: as linhas vêm dos arquivos Parquet, baixadas só agora e só para leitura
+if status_obra == STATUS_ARQUIVADA:
+    st.title(f"🗄️ {nome_obra} (arquivada)")
+    res = arquivo.resumo(id_obra_atual) or {}
+    k1, k2, k3 = st.columns(3)
+    k1.metric("Gasto", f"R$ {res.get('gasto', 0):,.2f}")
+    k2.metric("Recebido", f"R$ {res.get('recebido', 0):,.2f}")
+    k3.metric("Orçado", f"R$ {res.get('orcado', 0):,.2f}")
+    with st.spinner("Abrindo o arquivo da obra..."), metricas.medir("fase", "carregar_arquivo"):
+        ARQ = arquivo.carregar(id_obra_atual)
+    st.dataframe(ARQ['custos'].sort_values(['data', 'id'], ascending=False)[['data', 'descricao', 'total', 'etapa']], use_container_width=True, hide_index=True,
+                 column_config={"data": st.column_config.DateColumn("Data", format="DD/MM/YYYY"), "total": st.column_config.NumberColumn("Valor", format="R$ %.2f")})
+    st.dataframe(ARQ['cronograma'][['etapa', 'status', 'porcentagem']], use_container_width=True, hide_index=True)
+    st.download_button("📥 Baixar Lançamentos (CSV)", ARQ['custos'].to_csv(index=False).encode("utf-8"), file_name=f"custos_obra_{id_obra_atual}.csv", mime="text/csv")
+    if st.button("♻️ Reabrir Obra"):
+        with st.spinner("Reabrindo..."): arquivo.desarquivar(id_obra_atual)
+        st.rerun()
+    ja_visto(0); acompanhar_mudancas(0)
     st.stop()
 
-# Filtros globais para a obra atual
-custos_f = DB['custos'][DB['custos']['id_obra'] == id_obra_atual]
-crono_f = DB['cronograma'][DB['cronograma']['id_obra'] == id_obra_atual]
-tarefas_f = DB['tarefas'][DB['tarefas']['id_obra'] == id_obra_atual]
+# Partição da obra atual (já filtrada no servidor)
+OBRA = carregar_obra(id_obra_atual)
+ja_visto(id_obra_atual)
+custos_f = OBRA['custos']
+crono_f = OBRA['cronograma']
+tarefas_f = OBRA['tarefas']
 
 # --- ABAS ---
-tabs = st.tabs(["📝 Lançar", "📅 Cronograma", "✅ Tarefas", "📊 Histórico", "📈 Dash", "💰 Pagamentos", "📦 Cadastro"])
+# A aba Performance mostra erros crus do banco: só com performance = true no [acesso] do secrets.toml
+MOSTRAR_PERFORMANCE = bool(st.secrets.get("acesso", {}).get("performance", False))
+tabs = st.tabs(["📝 Lançar", "📅 Cronograma", "✅ Tarefas", "📊 Histórico", "📈 Dash", "💰 Pagamentos", "📦 Cadastro", "🏢 Carteira"]
+               + (["⏱️ Performance"] if MOSTRAR_PERFORMANCE else []))
 
 # 1. ABA LANÇAR
 with tabs[0]:
     st.subheader(f"Lançar Custo - {nome_obra}")
+    # A busca fica fora do form para as sugestões mudarem enquanto se digita
+    v_mat = cache.visao("materiais")
+    termo = st.text_input("🔎 Buscar material", key="busca_mat") if len(v_mat.busca) else ""
+    l_pais = [e["etapa"] for e in padroes.atual("simples")["etapas"]]
     with st.form("form_lancar", clear_on_submit=True):
         c1, c2, c3 = st.columns(3)
-        m_lista = DB['materiais']['nome'].tolist()
-        desc = c1.selectbox("Material (do Cadastro)", m_lista) if m_lista else c1.text_input("Descrição do Item")
+        if len(v_mat.busca):
+            id_mat = c1.selectbox("Material (do Cadastro)", v_mat.busca.buscar(termo), format_func=lambda i: v_mat.valor(i, 'nome'))
+            desc = v_mat.valor(id_mat, 'nome', "")
+        else: desc = c1.text_input("Descrição do Item")
         valor = c2.number_input("Valor Unitário (R$)", min_value=0.0, format="%.2f", step=0.01)
         qtd = c3.number_input("Qtd", 1.0, step=0.1)
         
         c4, c5 = st.columns(2)
-        l_pais = sorted(list(set([item['pai'] for item in ETAPAS_PADRAO])))
         etapa_fin = c4.selectbox("Etapa de Gasto", l_pais + ["Mão de Obra"])
         data_input = c5.date_input("Data do Gasto", format="DD/MM/YYYY")
         
         if st.form_submit_button("Salvar Gasto"):
-            supabase.table("custos").insert({"id_obra": id_obra_atual, "descricao": desc, "valor": valor, "qtd": qtd, "total": valor*qtd, "etapa": etapa_fin, "data": str(data_input)}).execute()
-            st.success("Salvo!"); st.cache_data.clear(); st.rerun()
+            cache.enfileirar("custos", [{"id_obra": id_obra_atual, "descricao": desc, "valor": valor, "qtd": qtd, "total": valor*qtd, "etapa": etapa_fin, "data": str(data_input)}], id_obra=id_obra_atual)
+            st.success("Salvo!"); st.rerun()
+
+    # Nota fiscal inteira: itens digitados, colados ou do XML da NF-e, gravados de uma vez
+    with st.expander("🧾 Lançar Nota Fiscal (vários itens)"):
+        if "nota" not in st.session_state: st.session_state.nota = {"v": 0, "itens": grade_vazia(), "cab": {}}
+        nota = st.session_state.nota
+        arq = st.file_uploader("XML da NF-e ou planilha dos itens", type=["xml", "csv", "txt", "xlsx"], key=f"nota_arq_{nota['v']}")
+        colado = st.text_area("...ou cole as linhas (descrição, quantidade, unidade, valor)", key=f"nota_txt_{nota['v']}", height=100)
+        if st.button("Carregar Itens", disabled=not (arq or colado.strip())):
+            try:
+                itens, cab = ler_itens(arq, arq.name) if arq else ler_texto(colado)
+                st.session_state.nota = {"v": nota["v"] + 1, "itens": completar(itens, v_mat), "cab": cab}; st.rerun()
+            except Exception as e: st.error(f"Não foi possível ler os itens: {e}")
+        cab = nota["cab"]
+        if nota_lancada(custos_f, cab.get("chave")): st.warning("Esta NF-e já foi lançada nesta obra: os itens já gravados não serão repetidos.")
+        c1, c2, c3 = st.columns(3)
+        n_data = c1.date_input("Data da Nota", datetime.strptime(cab["data"], "%Y-%m-%d").date() if cab.get("data") else "today", format="DD/MM/YYYY", key=f"nota_data_{nota['v']}")
+        n_forn = c2.text_input("Fornecedor", cab.get("fornecedor") or "", key=f"nota_forn_{nota['v']}")
+        n_etapa = c3.selectbox("Etapa de Gasto", l_pais + ["Mão de Obra"], key=f"nota_etapa_{nota['v']}")
+        grade = st.data_editor(nota["itens"], num_rows="dynamic", hide_index=True, key=f"nota_grade_{nota['v']}",
+                               column_config={"descricao": "Descrição", "qtd": st.column_config.NumberColumn("Qtd", min_value=0.0),
+                                              "unidade": "Unidade", "valor": st.column_config.NumberColumn("Valor Unitário (R$)", min_value=0.0, format="%.2f")})
+        linhas = linhas_nota(completar(grade, v_mat), id_obra_atual, n_data, n_forn or None, n_etapa, classe=None, chave=cab.get("chave"))
+        if st.button(f"Salvar Nota ({len(linhas)} itens · R$ {sum(l['total'] for l in linhas):,.2f})", disabled=not linhas):
+            cache.enfileirar("custos", linhas, id_obra=id_obra_atual)
+            st.session_state.nota = {"v": nota["v"] + 1, "itens": grade_vazia(), "cab": {}}
+            st.toast(f"Nota salva: {len(linhas)} itens."); st.rerun()
 
 # 2. ABA CRONOGRAMA
+# Gravações nos callbacks dos botões: rodam antes do fragmento se redesenhar
+def salvar_etapa(id_obra, id_linha, pai, tem_sub):
+    n_txt = st.session_state[f"n_{id_linha}"]
+    nome_salvar = f"{pai} | {n_txt}" if tem_sub else n_txt
+    cache.atualizar("cronograma", id_linha, {"etapa": nome_salvar, "porcentagem": st.session_state[f"p_{id_linha}"]}, id_obra=id_obra)
+    ja_visto(id_obra)
+
+def excluir_etapa(id_obra, id_linha):
+    cache.excluir("cronograma", id_linha, id_obra=id_obra)
+    ja_visto(id_obra)
+
+@st.fragment
+def grupo_cronograma(id_obra, i, pai):
+    """Uma etapa-mãe com as sub-etapas: salvar ou excluir aqui redesenha só este grupo"""
+    subs = cache.visao("cronograma", id_obra).grupo(pai)
+    if subs.empty: return
+    with st.expander(f"📁 {pai}", expanded=False):
+        subs = subs.sort_values(by='sub')
+        for j, (_, row) in enumerate(subs.iterrows(), 1):
+            exibir_nome = row['sub'] if row['sub'] != "" else row['pai']
+            id_linha = int(row['id'])
+            with st.container(border=True):
+                c1, c2, c3, c4, c5 = st.columns([0.5, 3, 3, 1, 1])
+                c1.write(f"**{i}.{j}**")
+                c2.text_input("Nome", exibir_nome, key=f"n_{id_linha}", label_visibility="collapsed")
+                c3.slider("Progresso", 0, 100, int(row['porcentagem']), key=f"p_{id_linha}", label_visibility="collapsed")
+                c4.button("💾", key=f"s_{id_linha}", on_click=salvar_etapa, args=(id_obra, id_linha, pai, row['sub'] != ""))
+                c5.button("🗑️", key=f"d_{id_linha}", on_click=excluir_etapa, args=(id_obra, id_linha))
+
 with tabs[1]:
     st.subheader(f"📅 Cronograma de Execução")
     if not crono_f.empty:
-        crono_f['pai'] = crono_f['etapa'].apply(lambda x: x.split(' | ')[0] if ' | ' in x else x)
-        crono_f['sub'] = crono_f['etapa'].apply(lambda x: x.split(' | ')[1] if ' | ' in x else "")
-        pais = sorted(crono_f['pai'].unique())
-        for i, pai in enumerate(pais, 1):
-            with st.expander(f"📁 {pai}", expanded=False):
-                subs = crono_f[crono_f['pai'] == pai].sort_values(by='sub')
-                for j, (_, row) in enumerate(subs.iterrows(), 1):
-                    exibir_nome = row['sub'] if row['sub'] != "" else row['pai']
-                    with st.container(border=True):
-                        c1, c2, c3, c4, c5 = st.columns([0.5, 3, 3, 1, 1])
-                        c1.write(f"**{i}.{j}**")
-                        n_txt = c2.text_input("Nome", exibir_nome, key=f"n_{row['id']}", label_visibility="collapsed")
-                        n_prog = c3.slider("Progresso", 0, 100, int(row['porcentagem']), key=f"p_{row['id']}", label_visibility="collapsed")
-                        if c4.button("💾", key=f"s_{row['id']}"):
-                            nome_salvar = f"{pai} | {n_txt}" if row['sub'] != "" else n_txt
-                            supabase.table("cronograma").update({"etapa": nome_salvar, "porcentagem": n_prog}).eq("id", row['id']).execute()
-                            st.cache_data.clear(); st.rerun()
-                        if c5.button("🗑️", key=f"d_{row['id']}"):
-                            supabase.table("cronograma").delete().eq("id", row['id']).execute()
-                            st.cache_data.clear(); st.rerun()
+        for i, pai in enumerate(sorted(cache.visao("cronograma", id_obra_atual).grupos), 1):
+            grupo_cronograma(id_obra_atual, i, pai)
+    padrao = padroes.atual("simples")
+    if st.button(f"🔄 Atualizar para o Padrão v{padrao['versao']}", help="Renomeia e completa as etapas pelo padrão sem perder o progresso"):
+        r = padroes.aplicar("simples", [id_obra_atual], formato="plano")
+        st.success(f"{r['inserir']} etapa(s) nova(s), {r['atualizar']} renomeada(s), {r['excluir']} retirada(s)."); st.rerun()
 
 # 3. ABA TAREFAS
 with tabs[2]:
@@ -191,27 +283,46 @@ with tabs[2]:
         nt = c1.text_input("Nova Tarefa")
         rp = c2.text_input("Responsável")
         if st.form_submit_button("Adicionar"):
-            supabase.table("tarefas").insert({"id_obra": id_obra_atual, "descricao": nt, "responsavel": rp, "status": "Pendente"}).execute()
-            st.cache_data.clear(); st.rerun()
+            cache.inserir("tarefas", {"id_obra": id_obra_atual, "descricao": nt, "responsavel": rp, "status": "Pendente"}, id_obra=id_obra_atual)
+            st.rerun()
     if not tarefas_f.empty:
-        df_ed = st.data_editor(tarefas_f[['id', 'descricao', 'responsavel', 'status']], key="ed_tar", hide_index=True, use_container_width=True)
+        df_ed = st.data_editor(tarefas_f[['id', 'descricao', 'responsavel', 'status']].astype({'status': str}), key="ed_tar", hide_index=True, use_container_width=True)
         if st.button("Salvar Alterações Tarefas"):
-            for _, r in df_ed.iterrows():
-                supabase.table("tarefas").update({"descricao": r['descricao'], "responsavel": r['responsavel'], "status": r['status']}).eq("id", r['id']).execute()
-            st.cache_data.clear(); st.rerun()
+            n = cache.salvar_lote("tarefas", linhas_alteradas(tarefas_f, df_ed, ['descricao', 'responsavel', 'status']), id_obra=id_obra_atual)
+            st.success(f"Salvo! {n} tarefa(s) alterada(s)."); time.sleep(0.5); st.rerun()
 
 # 4. ABA HISTÓRICO
 with tabs[3]:
     st.subheader("📊 Histórico Completo")
-    st.dataframe(custos_f[['data', 'descricao', 'total', 'etapa']], use_container_width=True, 
+    # Só a página visível vem do banco, já filtrada e ordenada no servidor
+    f1, f2, f3 = st.columns(3)
+    periodo = f1.date_input("Período", value=(), format="DD/MM/YYYY", key="hist_periodo")
+    f_etapa = f2.selectbox("Etapa", ["Todas"] + sorted(cache.resumo(id_obra_atual).etapa), key="hist_etapa")
+    ordem = ORDENS_HISTORICO[f3.selectbox("Ordenar por", list(ORDENS_HISTORICO), key="hist_ordem")]
+    filtros = {}
+    if len(periodo) == 2: filtros.update(data_de=str(periodo[0]), data_ate=str(periodo[1]))
+    if f_etapa != "Todas": filtros["etapa"] = f_etapa
+    
+    cursores = cursores_pagina("hist", (id_obra_atual, tuple(sorted(filtros.items())), ordem))
+    try: pag, proximo = cache.pagina("custos", id_obra_atual, filtros, ordem, cursores[-1], TAMANHO_PAGINA)
+    except Exception as e:
+        # Falha do banco não derruba a aba: mostra o erro e volta à primeira página
+        st.error(f"❌ Erro ao buscar o histórico: {e}"); del cursores[1:]
+        pag, proximo = custos_f.iloc[:0], None
+    st.dataframe(pag[['data', 'descricao', 'total', 'etapa']], use_container_width=True, hide_index=True,
                  column_config={"total": st.column_config.NumberColumn("Total", format="R$ %.2f"), "data": st.column_config.DateColumn("Data", format="DD/MM/YYYY")})
+    n1, n2, n3 = st.columns([1, 1, 4])
+    if n1.button("⬅️ Anterior", disabled=len(cursores) == 1): cursores.pop(); st.rerun()
+    if n2.button("Próxima ➡️", disabled=proximo is None): cursores.append(proximo); st.rerun()
+    n3.caption(f"Página {len(cursores)}")
 
 # 5. ABA DASHBOARD
 with tabs[4]:
     st.subheader("📈 Resumo de Custos")
     if not custos_f.empty:
-        st.metric("Total Gasto", formatar_moeda(custos_f['total'].sum()))
-        st.bar_chart(custos_f.groupby('etapa')['total'].sum())
+        resumo = cache.resumo(id_obra_atual)
+        st.metric("Total Gasto", formatar_moeda(resumo.total()))
+        st.bar_chart(resumo.por_etapa())
 
 # 6. ABA PAGAMENTOS
 with tabs[5]:
@@ -220,8 +331,8 @@ with tabs[5]:
     nP = co1.number_input("Orçamento Pedreiro (R$)", value=orc_p, format="%.2f")
     nC = co2.number_input("Orçamento Cliente (R$)", value=orc_c, format="%.2f")
     if st.button("💾 Salvar Orçamentos Totais"):
-        supabase.table("obras").update({"orcamento_pedreiro": nP, "orcamento_cliente": nC}).eq("id", id_obra_atual).execute()
-        st.cache_data.clear(); st.rerun()
+        cache.atualizar("obras", id_obra_atual, {"orcamento_pedreiro": nP, "orcamento_cliente": nC})
+        st.rerun()
     
     with st.form("f_fin", clear_on_submit=True):
         st.write("➕ **Lançar Pagamento / Recebimento**")
@@ -231,15 +342,16 @@ with tabs[5]:
         dt_p = cp3.date_input("Data", format="DD/MM/YYYY")
         if st.form_submit_button("Confirmar"):
             cat = "Mão de Obra" if "Saída" in t else "Entrada Cliente"
-            supabase.table("custos").insert({"id_obra": id_obra_atual, "descricao": t, "valor": v, "total": v, "etapa": cat, "data": str(dt_p)}).execute()
-            st.cache_data.clear(); st.rerun()
+            cache.enfileirar("custos", [{"id_obra": id_obra_atual, "descricao": t, "valor": v, "total": v, "etapa": cat, "data": str(dt_p)}], id_obra=id_obra_atual)
+            st.rerun()
 
     p_mo = custos_f[custos_f['etapa'] == "Mão de Obra"]
     r_cl = custos_f[custos_f['etapa'] == "Entrada Cliente"]
     
     res1, res2 = st.columns(2)
-    res1.metric("Saldo Pedreiro", formatar_moeda(nP - p_mo['total'].sum()))
-    res2.metric("Saldo Cliente", formatar_moeda(nC - r_cl['total'].sum()))
+    resumo = cache.resumo(id_obra_atual)
+    res1.metric("Saldo Pedreiro", formatar_moeda(resumo.saldo_pedreiro(nP)))
+    res2.metric("Saldo Cliente", formatar_moeda(resumo.saldo_cliente(nC)))
 
     st.markdown("---")
     st.write("### 📜 Histórico de Lançamentos")
@@ -256,35 +368,103 @@ with tabs[5]:
 # 7. ABA CADASTRO
 with tabs[6]:
     st.subheader("📦 Cadastro de Materiais")
-    with st.expander("📥 Importar materiais do arquivo"):
-        if st.button("Importar 'Cadastro material.xlsx'"):
-            try:
-                df_imp = pd.read_csv('Cadastro material.xlsx - Planilha1.csv')
-                col_name = df_imp.columns[0]
-                lista_imp = df_imp[col_name].dropna().unique().tolist()
-                for item in lista_imp:
-                    supabase.table("materiais").upsert({"nome": str(item)}).execute()
-                st.success(f"Importados {len(lista_imp)} itens!")
-                st.cache_data.clear(); st.rerun()
-            except Exception as e:
-                st.error(f"Erro: {e}")
+    with st.expander("📥 Importar tabela de preços (CSV/XLSX)"):
+        arq = st.file_uploader("Planilha do fornecedor", type=["csv", "xlsx"], key="up_precos")
+        if arq is not None:
+            colunas = cabecalho(arq, arq.name)
+            palpite = adivinhar_colunas(colunas)
+            opcoes = [None] + colunas
+            mapa = {campo: st.selectbox(rotulo, opcoes, index=opcoes.index(palpite[campo]), format_func=lambda c: "— não importar —" if c is None else c, key=f"map_{campo}")
+                    for campo, rotulo in (("nome", "Coluna do nome"), ("unidade", "Coluna da unidade"), ("preco_ref", "Coluna do preço"))}
+            if st.button("Importar planilha", disabled=mapa["nome"] is None):
+                imp = ImportadorPrecos(cache)
+                barra = st.progress(0.0, text="Importando...")
+                try:
+                    for bloco, lido in ler_blocos(arq, arq.name):
+                        imp.aplicar(bloco, mapa)
+                        barra.progress(lido, text=f"{imp.linhas} linhas lidas")
+                    st.success(imp.resumo())
+                except Exception as e:
+                    # Os blocos anteriores já foram gravados; importar de novo só completa o que faltou
+                    st.error(f"Erro: {e} — até aqui: {imp.resumo()}")
     
     with st.form("add_manual", clear_on_submit=True):
         nm_mat = st.text_input("Novo Material")
         if st.form_submit_button("Cadastrar"):
-            supabase.table("materiais").insert({"nome": nm_mat}).execute()
-            st.cache_data.clear(); st.rerun()
+            cache.inserir("materiais", {"nome": nm_mat})
+            st.rerun()
             
     if not DB['materiais'].empty:
         df_edit_mat = st.data_editor(DB['materiais'][['id', 'nome']], key="ed_mat", num_rows="dynamic", hide_index=True, use_container_width=True)
         if st.button("Salvar Alterações no Cadastro"):
             ids_finais = df_edit_mat['id'].dropna().tolist()
             para_deletar = list(set(DB['materiais']['id'].tolist()) - set(ids_finais))
-            for d_id in para_deletar:
-                supabase.table("materiais").delete().eq("id", d_id).execute()
-            for _, r in df_edit_mat.iterrows():
-                if pd.notnull(r['id']):
-                    supabase.table("materiais").update({"nome": r['nome']}).eq("id", r['id']).execute()
-                else:
-                    supabase.table("materiais").insert({"nome": r['nome']}).execute()
-            st.success("Sincronizado!"); st.cache_data.clear(); st.rerun()
\ No newline at end of file
+            cache.excluir_lote("materiais", para_deletar)
+            cache.salvar_lote("materiais", linhas_alteradas(DB['materiais'], df_edit_mat, ['nome']))
+            novos = df_edit_mat[df_edit_mat['id'].isna() & df_edit_mat['nome'].notna()]
+            cache.inserir_lote("materiais", [{"nome": n} for n in novos['nome']])
+            st.success("Sincronizado!"); st.rerun()
+
+# 8. ABA CARTEIRA (TODAS AS OBRAS)
+with tabs[7]:
+    st.subheader("🏢 Carteira de Obras")
+    orc = carteira.orcado_realizado()
+    if orc.empty: st.info("Sem dados.")
+    else:
+        obras = DB['obras'].reindex(columns=['id', 'nome', 'orcamento_cliente']).set_index('id')
+        orc = orc.join(obras, on='id_obra').dropna(subset=['nome'])
+        orc['uso'] = (orc['gasto'] / orc['orcado'].where(orc['orcado'] > 0) * 100).fillna(0.0)
+        
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Obras", len(orc))
+        c2.metric("Gasto Total", f"R$ {orc['gasto'].sum():,.2f}")
+        c3.metric("Orçado (Etapas)", f"R$ {orc['orcado'].sum():,.2f}")
+        
+        st.markdown("### 📅 Gasto Mensal por Obra")
+        gm = carteira.gasto_mensal()
+        st.bar_chart(gm.assign(obra=gm['id_obra'].map(obras['nome'])).dropna(subset=['obra'])
+                     .pivot_table(index='mes', columns='obra', values='total', aggfunc='sum'))
+        
+        st.markdown("### 💰 Orçado x Realizado")
+        st.dataframe(orc[['nome', 'orcado', 'orcamento_cliente', 'gasto', 'recebido', 'uso']], hide_index=True, use_container_width=True,
+                     column_config={"nome": "Obra", "orcado": st.column_config.NumberColumn("Orçado (Etapas)", format="R$ %.2f"),
+                                    "orcamento_cliente": st.column_config.NumberColumn("Orçamento Cliente", format="R$ %.2f"),
+                                    "gasto": st.column_config.NumberColumn("Gasto", format="R$ %.2f"),
+                                    "recebido": st.column_config.NumberColumn("Recebido", format="R$ %.2f"),
+                                    "uso": st.column_config.ProgressColumn("% do Orçado", format="%.0f%%", min_value=0, max_value=100)})
+        
+        st.markdown("### 🧱 Top Materiais (Todas as Obras)")
+        st.dataframe(carteira.top_materiais(), hide_index=True, use_container_width=True,
+                     column_config={"descricao": "Material/Serviço", "total": st.column_config.NumberColumn("Total", format="R$ %.2f"), "obras": "Obras"})
+        st.caption(f"Cópia atualizada às {datetime.fromtimestamp(carteira.ultima_sync):%H:%M:%S} · consultas em {carteira.motor}")
+
+# 9. ABA PERFORMANCE
+if MOSTRAR_PERFORMANCE:
+    with tabs[8]:
+        st.subheader("⏱️ Performance")
+        st.caption("Chamadas ao banco, fases de carga e execuções do script desta instância do app.")
+        # Só monta a tabela quando pedido: as abas rodam todas a cada execução
+        if st.toggle("Mostrar medições", key="perf_mostrar"):
+            res = metricas.resumo()
+            if res.empty: st.info("Sem medições ainda.")
+            else:
+                st.dataframe(res, hide_index=True, use_container_width=True,
+                             column_config={c: st.column_config.NumberColumn(format="%.1f") for c in ["p50_ms", "p95_ms", "max_ms", "linhas_media", "kb_total"]})
+                execucoes = metricas.frame().query("tipo == 'execucao'").tail(200)
+                if not execucoes.empty:
+                    st.markdown("### ⏱️ Últimas execuções do script (ms)")
+                    st.line_chart(execucoes.reset_index(drop=True)["ms"])
+            c1, c2 = st.columns(2)
+            c1.download_button("⬇️ Exportar (JSON lines)", metricas.para_jsonl(), file_name="metricas.jsonl", mime="application/x-ndjson")
+            if c2.button("🧹 Limpar medições"): metricas.limpar(); st.rerun()
+            vg = cache.vigia
+            rodada = f"{datetime.fromtimestamp(vg.ultima_rodada):%H:%M:%S}" if vg.ultima_rodada else "—"
+            st.caption(f"Vigia do banco: {'Realtime + consulta' if vg.realtime else 'consulta'} · última rodada {rodada} · "
+                       f"{vg.linhas_recebidas} linha(s) de outros usuários" + (f" · erro: {vg.ultimo_erro}" if vg.ultimo_erro else ""))
+            if cache.erro_pacote:
+                st.caption(f"Carga da obra {'numa ida (pacote_obra)' if cache.usar_pacote else 'tabela por tabela'} · última falha do pacote: {cache.erro_pacote}")
+
+acompanhar_mudancas(id_obra_atual)
+
+# Tempo da execução completa (as que param antes, no login ou sem obra, não entram)
+metricas.registrar("execucao", "script", (time.perf_counter() - inicio_execucao) * 1000)
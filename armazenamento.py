@@ -0,0 +1,457 @@
+import os
+import sqlite3
+import threading
+
+# --- REPOSITÓRIOS ---
+# Interface comum de acesso ao banco usada pelo CacheTabelas. Todas as linhas entram e
+# saem como listas de dicts (o formato do response.data do Supabase).
+#   selecionar(tabela, id_obra=None, desde=None)   desde = (coluna, valor) -> linhas com coluna > valor;
+#       id_obra pode ser uma lista de ids (linhas de várias obras numa leitura)
+#   pagina(tabela, id_obra, filtros, ordem, cursor, limite) -> uma página ordenada por (coluna, id)
+#   inserir(tabela, linhas) / upsert(tabela, linhas) -> linhas gravadas
+#   atualizar(tabela, id_linha, campos) -> linhas gravadas
+#   inserir_idempotente(tabela, linhas) -> linhas novas (ignora chave_idem já gravada)
+#   excluir(tabela, ids)
+#   criar_obra(obra, cronograma, pontos) -> linha da obra
+#   reaplicar_padrao(id_obra, cronograma, pontos) / excluir_obra(id_obra)
+#   aplicar_lote(plano) numa transação: plano = {"excluir": {tabela: ids}, "atualizar": {tabela: linhas
+#       parciais com id e id_obra}, "inserir": {tabela: linhas}, "renomear": [{"id_obra", "de", "para"}]}
+#       (renomear troca a etapa dos custos da obra; ver modelos.plano_obra)
+#   arquivar_obra(id_obra, resumo) -> {"obra", "resumo"}: apaga as linhas da obra (conferindo as contagens
+#       n_<tabela> do resumo), grava o resumo em obras_arquivadas e marca a obra como arquivada
+#   desarquivar_obra(id_obra, tabelas) -> linha da obra: devolve as linhas ({tabela: linhas}) às tabelas
+#   guardar_arquivo(caminho, dados) / ler_arquivo(caminho) -> bytes ou None (arquivos das obras arquivadas)
+#   pacote_obra(id_obra, por_obra, globais) -> {tabela: linhas} numa ida só; por_obra/globais =
+#       {tabela: [colunas]} ([] = todas). None se o banco ainda não tem a função.
+TAMANHO_LOTE = 500  # linhas por requisição nas operações em lote
+LIMITE_LEITURA = 1000  # max-rows padrão do PostgREST
+TABELAS_DA_OBRA = ["custos", "pontos_criticos", "cronograma", "tarefas"]
+COLUNAS_ORDEM = {"data", "total", "descricao", "id"}  # colunas aceitas na ordenação das páginas
+STATUS_CONCLUIDA, STATUS_ARQUIVADA = "Concluída", "Arquivada"
+BUCKET_ARQUIVO = "arquivo-obras"  # Supabase Storage (supabase_funcoes.sql cria o bucket)
+
+
+def em_lotes(itens, tamanho=TAMANHO_LOTE):
+    for i in range(0, len(itens), tamanho):
+        yield itens[i:i + tamanho]
+
+
+def com_obra(linhas, id_obra):
+    return [{**l, "id_obra": int(id_obra)} for l in linhas]
+
+
+def checar_ordem(ordem):
+    coluna, desc = ordem
+    if coluna not in COLUNAS_ORDEM: raise ValueError(f"Ordenação não suportada: {coluna}")
+    return coluna, bool(desc)
+
+
+def abrir_repositorio(config):
+    """Escolhe o backend pela seção [armazenamento] do secrets.toml (padrão: supabase)"""
+    opcoes = dict(config.get("armazenamento", {}))
+    tipo = opcoes.get("tipo", "supabase")
+    if tipo == "sqlite":
+        return RepositorioSQLite(opcoes.get("caminho", "obras_local.db"))
+    if tipo == "supabase":
+        from supabase import create_client
+        return RepositorioSupabase(create_client(config["supabase"]["url"], config["supabase"]["key"]))
+    raise ValueError(f"Tipo de armazenamento desconhecido: {tipo}")
+
+
+class RepositorioSupabase:
+    def __init__(self, cliente):
+        self.cliente = cliente
+
+    def selecionar(self, tabela, id_obra=None, desde=None):
+        if isinstance(id_obra, (list, tuple, set)):
+            # Várias obras: filtro in_ em lotes de ids (a URL tem limite de tamanho)
+            return [l for lote in em_lotes(sorted({int(i) for i in id_obra})) for l in self._selecionar(tabela, lote, desde)]
+        return self._selecionar(tabela, id_obra, desde)
+
+    def _selecionar(self, tabela, id_obra, desde):
+        # O PostgREST corta cada resposta em LIMITE_LEITURA linhas: lê em faixas pela ordem do id
+        linhas = []
+        while True:
+            consulta = self.cliente.table(tabela).select("*")
+            if isinstance(id_obra, list): consulta = consulta.in_("id_obra", id_obra)
+            elif id_obra is not None:
+                consulta = consulta.eq("id_obra", int(id_obra))
+            if desde is not None:
+                consulta = consulta.gt(*desde)
+            lote = consulta.order("id").range(len(linhas), len(linhas) + LIMITE_LEITURA - 1).execute().data
+            linhas += lote
+            if len(lote) < LIMITE_LEITURA: return linhas
+
+    def _ids(self, tabela, **iguais):
+        """Só os ids das linhas com as colunas iguais aos valores dados (lidos em faixas)"""
+        ids = []
+        while True:
+            consulta = self.cliente.table(tabela).select("id")
+            for col, valor in iguais.items(): consulta = consulta.eq(col, valor)
+            lote = consulta.order("id").range(len(ids), len(ids) + LIMITE_LEITURA - 1).execute().data
+            ids += [l["id"] for l in lote]
+            if len(lote) < LIMITE_LEITURA: return ids
+
+    def pagina(self, tabela, id_obra, filtros=None, ordem=("data", True), cursor=None, limite=50):
+        """Paginação por chave: cursor = (valor da coluna, id) da última linha da página anterior.
+        filtros: data_de / data_ate (intervalo) e qualquer outra coluna por igualdade"""
+        coluna, desc = checar_ordem(ordem)
+        consulta = self.cliente.table(tabela).select("*").eq("id_obra", int(id_obra))
+        for col, valor in (filtros or {}).items():
+            if col == "data_de": consulta = consulta.gte("data", valor)
+            elif col == "data_ate": consulta = consulta.lte("data", valor)
+            else: consulta = consulta.eq(col, valor)
+        # Linhas sem valor (ex.: sem data) vêm sempre no fim, nos dois sentidos
+        if cursor is not None:
+            op = "lt" if desc else "gt"
+            valor, id_linha = cursor
+            if valor is None: consulta = consulta.is_(coluna, "null").filter("id", op, int(id_linha))
+            else:
+                valor = '"' + str(valor).replace('"', '\\"') + '"'
+                consulta = consulta.or_(f"{coluna}.{op}.{valor},and({coluna}.eq.{valor},id.{op}.{int(id_linha)}),{coluna}.is.null")
+        if coluna != "id": consulta = consulta.order(coluna, desc=desc, nullsfirst=False)
+        return consulta.order("id", desc=desc).limit(int(limite)).execute().data
+
+    def inserir(self, tabela, linhas):
+        criadas = []
+        for lote in em_lotes(list(linhas)):
+            criadas += self.cliente.table(tabela).insert(lote).execute().data
+        return criadas
+
+    def upsert(self, tabela, linhas):
+        gravadas = []
+        for lote in em_lotes(list(linhas)):
+            gravadas += self.cliente.table(tabela).upsert(lote).execute().data
+        return gravadas
+
+    def inserir_idempotente(self, tabela, linhas):
+        gravadas = []
+        for lote in em_lotes(list(linhas)):
+            gravadas += self.cliente.table(tabela).upsert(lote, on_conflict="chave_idem", ignore_duplicates=True).execute().data
+        return gravadas
+
+    def atualizar(self, tabela, id_linha, campos):
+        return self.cliente.table(tabela).update(campos).eq("id", int(id_linha)).execute().data
+
+    def excluir(self, tabela, ids):
+        for lote in em_lotes([int(i) for i in ids]):
+            self.cliente.table(tabela).delete().in_("id", lote).execute()
+
+    # Operações da obra inteira: usam as funções de supabase_funcoes.sql (uma transação,
+    # uma requisição). Se elas ainda não foram criadas no banco, caem para uma requisição
+    # com várias linhas por tabela.
+    def _rpc(self, funcao, params):
+        try:
+            return True, self.cliente.rpc(funcao, params).execute().data
+        except Exception as e:
+            if getattr(e, "code", None) == "PGRST202": return False, None  # função não existe
+            raise
+
+    def criar_obra(self, obra, cronograma=(), pontos=()):
+        ok, nova = self._rpc("criar_obra", {"p_obra": obra, "p_cronograma": list(cronograma), "p_pontos": list(pontos)})
+        if ok: return nova
+        nova = self.inserir("obras", [obra])[0]
+        try:
+            self.inserir("cronograma", com_obra(cronograma, nova['id']))
+            self.inserir("pontos_criticos", com_obra(pontos, nova['id']))
+        except Exception:
+            self.excluir_obra(nova['id'])  # não deixa obra pela metade
+            raise
+        return nova
+
+    def reaplicar_padrao(self, id_obra, cronograma=(), pontos=()):
+        ok, _ = self._rpc("reaplicar_padrao", {"p_id_obra": int(id_obra), "p_cronograma": list(cronograma), "p_pontos": list(pontos)})
+        if ok: return
+        # Sem transação: insere as linhas novas antes de apagar as antigas (pelos ids lidos
+        # antes), para uma falha no meio deixar linhas a mais e não uma obra sem cronograma
+        antigos = {tbl: self._ids(tbl, id_obra=int(id_obra)) for tbl in ("pontos_criticos", "cronograma")}
+        self.inserir("cronograma", com_obra(cronograma, id_obra))
+        self.inserir("pontos_criticos", com_obra(pontos, id_obra))
+        for tbl, ids in antigos.items(): self.excluir(tbl, ids)
+
+    def aplicar_lote(self, plano):
+        ok, _ = self._rpc("aplicar_lote", {"p_plano": plano})
+        if ok: return
+        for tbl, ids in plano.get("excluir", {}).items(): self.excluir(tbl, ids)
+        for tbl, linhas in plano.get("atualizar", {}).items(): self.upsert(tbl, linhas)
+        for tbl, linhas in plano.get("inserir", {}).items(): self.inserir(tbl, linhas)
+        # Lê os ids de cada etapa de origem antes de trocar qualquer nome: trocas em cadeia
+        # (A->B, B->C) e entre si (A<->B) não pegam as linhas já renomeadas
+        trocas = {(int(r["id_obra"]), r["de"]): r["para"] for r in plano.get("renomear", []) if r["de"] != r["para"]}
+        alvos = [(para, self._ids("custos", id_obra=id_obra, etapa=de)) for (id_obra, de), para in trocas.items()]
+        for para, ids in alvos:
+            for lote in em_lotes(ids): self.cliente.table("custos").update({"etapa": para}).in_("id", lote).execute()
+
+    def pacote_obra(self, id_obra, por_obra, globais=None):
+        # Uma resposta JSON (comprimida pelo gateway do Supabase) em vez de uma requisição por
+        # tabela; sem a função no banco o CacheTabelas volta a buscar tabela por tabela
+        ok, pacote = self._rpc("pacote_obra", {"p_id_obra": int(id_obra), "p_por_obra": por_obra, "p_globais": globais or {}})
+        return pacote if ok else None
+
+    def excluir_obra(self, id_obra):
+        ok, _ = self._rpc("excluir_obra", {"p_id_obra": int(id_obra)})
+        if ok: return
+        # A obra sai por último: se algo falhar no meio, basta repetir
+        for tbl in [*TABELAS_DA_OBRA, "obras_arquivadas"]:
+            self.cliente.table(tbl).delete().eq("id_obra", int(id_obra)).execute()
+        self.cliente.table("obras").delete().eq("id", int(id_obra)).execute()
+
+    def arquivar_obra(self, id_obra, resumo):
+        ok, res = self._rpc("arquivar_obra", {"p_id_obra": int(id_obra), "p_resumo": resumo})
+        if ok: return res
+        # Sem a função: o resumo entra antes, então uma falha no meio não perde a obra de vista
+        novo = self.inserir("obras_arquivadas", [{**resumo, "id_obra": int(id_obra)}])[0]
+        for tbl in TABELAS_DA_OBRA:
+            self.cliente.table(tbl).delete().eq("id_obra", int(id_obra)).execute()
+        obra = self.atualizar("obras", id_obra, {"status": STATUS_ARQUIVADA})[0]
+        return {"obra": obra, "resumo": novo}
+
+    def desarquivar_obra(self, id_obra, tabelas):
+        ok, obra = self._rpc("desarquivar_obra", {"p_id_obra": int(id_obra), "p_tabelas": tabelas})
+        if ok: return obra
+        for tbl, linhas in tabelas.items(): self.upsert(tbl, linhas)
+        self.cliente.table("obras_arquivadas").delete().eq("id_obra", int(id_obra)).execute()
+        return self.atualizar("obras", id_obra, {"status": STATUS_CONCLUIDA})[0]
+
+    def guardar_arquivo(self, caminho, dados):
+        self.cliente.storage.from_(BUCKET_ARQUIVO).upload(caminho, dados, {"content-type": "application/octet-stream", "upsert": "true"})
+
+    def ler_arquivo(self, caminho):
+        try:
+            return self.cliente.storage.from_(BUCKET_ARQUIVO).download(caminho)
+        except Exception as e:
+            if str(getattr(e, "status", "")) == "404": return None
+            raise
+
+
+# --- SQLITE LOCAL ---
+# Mesmo esquema das tabelas do Supabase. updated_at é mantido por gatilho para que a
+# sincronização incremental também enxergue alterações feitas por outros processos.
+ESQUEMA_SQLITE = {
+    "obras": "nome TEXT, endereco TEXT, status TEXT DEFAULT 'Ativa', orcamento_pedreiro REAL DEFAULT 0, orcamento_cliente REAL DEFAULT 0",
+    "custos": "id_obra INTEGER NOT NULL, data TEXT, descricao TEXT, qtd REAL, unidade TEXT, valor REAL, total REAL, classe TEXT, etapa TEXT, fornecedor TEXT, chave_idem TEXT",
+    "cronograma": "id_obra INTEGER NOT NULL, etapa TEXT, status TEXT DEFAULT 'Pendente', orcamento REAL DEFAULT 0, porcentagem INTEGER DEFAULT 0, chave_idem TEXT",
+    "pontos_criticos": "id_obra INTEGER NOT NULL, etapa_pai TEXT, descricao TEXT, feito TEXT DEFAULT 'FALSE'",
+    "tarefas": "id_obra INTEGER NOT NULL, descricao TEXT, responsavel TEXT, status TEXT DEFAULT 'Pendente'",
+    "materiais": "nome TEXT, unidade TEXT, preco_ref REAL DEFAULT 0",
+    "fornecedores": "nome TEXT, telefone TEXT",
+    "modelos": "nome TEXT NOT NULL, versao INTEGER NOT NULL, etapas TEXT",
+    "obras_arquivadas": "id_obra INTEGER NOT NULL UNIQUE, gasto REAL, recebido REAL, orcado REAL, n_custos INTEGER, "
+                        "n_cronograma INTEGER, n_pontos_criticos INTEGER, n_tarefas INTEGER, bytes INTEGER, arquivada_em TEXT",
+}
+# Colunas acrescentadas depois da primeira versão do arquivo (ALTER TABLE nos bancos antigos)
+COLUNAS_NOVAS_SQLITE = {"custos": [("chave_idem", "TEXT")], "cronograma": [("chave_idem", "TEXT")]}
+COLUNAS_SQLITE = {tbl: ["id", *(c.split()[0] for c in cols.split(", ")), "updated_at"] for tbl, cols in ESQUEMA_SQLITE.items()}
+AGORA_SQL = "strftime('%Y-%m-%dT%H:%M:%f', 'now')"
+
+
+class RepositorioSQLite:
+    def __init__(self, caminho):
+        self.pasta_arquivo = os.path.splitext(caminho)[0] + "_arquivo"  # arquivos das obras arquivadas
+        self.conn = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._criar_esquema()
+
+    def _criar_esquema(self):
+        with self.lock:
+            for tbl, cols in ESQUEMA_SQLITE.items():
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {tbl} (id INTEGER PRIMARY KEY AUTOINCREMENT, {cols}, "
+                                  f"updated_at TEXT DEFAULT ({AGORA_SQL}))")
+                self.conn.execute(f"CREATE TRIGGER IF NOT EXISTS {tbl}_updated_at AFTER UPDATE ON {tbl} "
+                                  f"WHEN NEW.updated_at IS OLD.updated_at BEGIN "
+                                  f"UPDATE {tbl} SET updated_at = {AGORA_SQL} WHERE id = NEW.id; END")
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {tbl}_updated_at_idx ON {tbl} (updated_at)")
+                if "id_obra" in cols:
+                    self.conn.execute(f"CREATE INDEX IF NOT EXISTS {tbl}_id_obra_idx ON {tbl} (id_obra, id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS custos_obra_data_idx ON custos (id_obra, data, id)")
+            for tbl, novas in COLUNAS_NOVAS_SQLITE.items():
+                existentes = {r["name"] for r in self.conn.execute(f"PRAGMA table_info({tbl})")}
+                for col, tipo in novas:
+                    if col not in existentes: self.conn.execute(f"ALTER TABLE {tbl} ADD COLUMN {col} {tipo}")
+            for tbl in ("custos", "cronograma"):
+                self.conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {tbl}_chave_idem_idx ON {tbl} (chave_idem)")
+            self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS modelos_nome_versao_idx ON modelos (nome, versao)")
+
+    def _transacao(self):
+        return Transacao(self)
+
+    def _buscar_ids(self, tabela, ids):
+        if not ids: return []
+        marcas = ",".join("?" * len(ids))
+        return [dict(r) for r in self.conn.execute(f"SELECT * FROM {tabela} WHERE id IN ({marcas})", ids)]
+
+    def selecionar(self, tabela, id_obra=None, desde=None):
+        sql, args = f"SELECT * FROM {tabela} WHERE 1=1", []
+        if isinstance(id_obra, (list, tuple, set)):
+            ids = sorted({int(i) for i in id_obra}) or [None]
+            sql += f" AND id_obra IN ({','.join('?' * len(ids))})"; args += ids
+        elif id_obra is not None:
+            sql += " AND id_obra = ?"; args.append(int(id_obra))
+        if desde is not None:
+            sql += f" AND {desde[0]} > ?"; args.append(desde[1])
+        with self.lock:
+            return [dict(r) for r in self.conn.execute(sql, args)]
+
+    def pagina(self, tabela, id_obra, filtros=None, ordem=("data", True), cursor=None, limite=50):
+        coluna, desc = checar_ordem(ordem)
+        sql, args = f"SELECT * FROM {tabela} WHERE id_obra = ?", [int(id_obra)]
+        for col, valor in (filtros or {}).items():
+            if col == "data_de": sql += " AND data >= ?"
+            elif col == "data_ate": sql += " AND data <= ?"
+            elif col.isidentifier(): sql += f" AND {col} = ?"
+            else: raise ValueError(f"Filtro inválido: {col}")
+            args.append(valor)
+        op, sentido = ("<", "DESC") if desc else (">", "ASC")
+        # NULL no fim nos dois sentidos; (NULL, id) < (?, ?) daria NULL, por isso o ramo próprio
+        if cursor is not None and cursor[0] is None:
+            sql += f" AND {coluna} IS NULL AND id {op} ?"; args.append(int(cursor[1]))
+        elif cursor is not None:
+            sql += f" AND ({coluna} IS NULL OR ({coluna}, id) {op} (?, ?))"; args += [cursor[0], int(cursor[1])]
+        sql += f" ORDER BY {coluna} {sentido} NULLS LAST, id {sentido} LIMIT ?"; args.append(int(limite))
+        with self.lock:
+            return [dict(r) for r in self.conn.execute(sql, args)]
+
+    def _projetar(self, tabela, colunas, onde="", args=()):
+        if tabela not in COLUNAS_SQLITE: raise ValueError(f"Tabela desconhecida: {tabela}")
+        cols = [c for c in colunas if c in COLUNAS_SQLITE[tabela]] or ["*"]
+        return [dict(r) for r in self.conn.execute(f"SELECT {', '.join(cols)} FROM {tabela} {onde} ORDER BY id", args)]
+
+    def pacote_obra(self, id_obra, por_obra, globais=None):
+        with self.lock:
+            self.conn.execute("BEGIN")  # todas as tabelas da mesma foto do banco
+            try:
+                pacote = {tbl: self._projetar(tbl, cols, "WHERE id_obra = ?", [int(id_obra)]) for tbl, cols in por_obra.items()}
+                pacote.update({tbl: self._projetar(tbl, cols) for tbl, cols in (globais or {}).items()})
+            finally:
+                self.conn.execute("COMMIT")
+        return pacote
+
+    def _inserir(self, tabela, linhas):
+        ids = []
+        for l in linhas:
+            cols = ", ".join(l)
+            cur = self.conn.execute(f"INSERT INTO {tabela} ({cols}) VALUES ({','.join('?' * len(l))})", list(l.values()))
+            ids.append(cur.lastrowid)
+        return self._buscar_ids(tabela, ids)
+
+    def inserir(self, tabela, linhas):
+        with self._transacao():
+            return self._inserir(tabela, list(linhas))
+
+    def upsert(self, tabela, linhas):
+        linhas = list(linhas)
+        with self._transacao():
+            for l in linhas:
+                cols = ", ".join(l)
+                sets = ", ".join(f"{c} = excluded.{c}" for c in l if c != "id")
+                self.conn.execute(f"INSERT INTO {tabela} ({cols}) VALUES ({','.join('?' * len(l))}) "
+                                  f"ON CONFLICT(id) DO UPDATE SET {sets}", list(l.values()))
+            return self._buscar_ids(tabela, [int(l["id"]) for l in linhas if l.get("id") is not None])
+
+    def inserir_idempotente(self, tabela, linhas):
+        linhas = list(linhas)
+        with self._transacao():
+            ids = []
+            for l in linhas:
+                cur = self.conn.execute(f"INSERT INTO {tabela} ({', '.join(l)}) VALUES ({','.join('?' * len(l))}) "
+                                        f"ON CONFLICT(chave_idem) DO NOTHING", list(l.values()))
+                if cur.rowcount: ids.append(cur.lastrowid)
+            return self._buscar_ids(tabela, ids)
+
+    def atualizar(self, tabela, id_linha, campos):
+        sets = ", ".join(f"{c} = ?" for c in campos)
+        with self._transacao():
+            self.conn.execute(f"UPDATE {tabela} SET {sets} WHERE id = ?", [*campos.values(), int(id_linha)])
+            return self._buscar_ids(tabela, [int(id_linha)])
+
+    def excluir(self, tabela, ids):
+        with self._transacao():
+            for lote in em_lotes([int(i) for i in ids]):
+                self.conn.execute(f"DELETE FROM {tabela} WHERE id IN ({','.join('?' * len(lote))})", lote)
+
+    def criar_obra(self, obra, cronograma=(), pontos=()):
+        with self._transacao():
+            nova = self._inserir("obras", [obra])[0]
+            self._inserir("cronograma", com_obra(cronograma, nova['id']))
+            self._inserir("pontos_criticos", com_obra(pontos, nova['id']))
+            return nova
+
+    def reaplicar_padrao(self, id_obra, cronograma=(), pontos=()):
+        with self._transacao():
+            for tbl in ("pontos_criticos", "cronograma"):
+                self.conn.execute(f"DELETE FROM {tbl} WHERE id_obra = ?", (int(id_obra),))
+            self._inserir("cronograma", com_obra(cronograma, id_obra))
+            self._inserir("pontos_criticos", com_obra(pontos, id_obra))
+
+    def aplicar_lote(self, plano):
+        with self._transacao():
+            for tbl, ids in plano.get("excluir", {}).items():
+                for lote in em_lotes([int(i) for i in ids]):
+                    self.conn.execute(f"DELETE FROM {tbl} WHERE id IN ({','.join('?' * len(lote))})", lote)
+            for tbl, linhas in plano.get("atualizar", {}).items():
+                for l in linhas:
+                    campos = {c: v for c, v in l.items() if c not in ("id", "id_obra")}
+                    self.conn.execute(f"UPDATE {tbl} SET {', '.join(f'{c} = ?' for c in campos)} WHERE id = ?", [*campos.values(), int(l["id"])])
+            for tbl, linhas in plano.get("inserir", {}).items(): self._inserir(tbl, linhas)
+            # Um UPDATE por obra com todas as trocas (CASE), para nomes que trocam entre si
+            por_obra = {}
+            for r in plano.get("renomear", []): por_obra.setdefault(int(r["id_obra"]), {})[r["de"]] = r["para"]
+            for id_obra, trocas in por_obra.items():
+                casos = " ".join("WHEN ? THEN ?" for _ in trocas)
+                self.conn.execute(f"UPDATE custos SET etapa = CASE etapa {casos} END WHERE id_obra = ? AND etapa IN ({','.join('?' * len(trocas))})",
+                                  [*(x for par in trocas.items() for x in par), id_obra, *trocas])
+
+    def excluir_obra(self, id_obra):
+        with self._transacao():
+            for tbl in [*TABELAS_DA_OBRA, "obras_arquivadas"]:
+                self.conn.execute(f"DELETE FROM {tbl} WHERE id_obra = ?", (int(id_obra),))
+            self.conn.execute("DELETE FROM obras WHERE id = ?", (int(id_obra),))
+
+    def arquivar_obra(self, id_obra, resumo):
+        with self._transacao():
+            for tbl in TABELAS_DA_OBRA:
+                apagadas = self.conn.execute(f"DELETE FROM {tbl} WHERE id_obra = ?", (int(id_obra),)).rowcount
+                # Linha gravada depois da cópia para o arquivo: desfaz tudo (ROLLBACK) em vez de perdê-la
+                if apagadas != resumo[f"n_{tbl}"]:
+                    raise ValueError(f"{tbl} mudou durante o arquivamento ({apagadas} linhas, {resumo[f'n_{tbl}']} no arquivo)")
+            novo = self._inserir("obras_arquivadas", [{**resumo, "id_obra": int(id_obra)}])[0]
+            self.conn.execute("UPDATE obras SET status = ? WHERE id = ?", (STATUS_ARQUIVADA, int(id_obra)))
+            return {"obra": self._buscar_ids("obras", [int(id_obra)])[0], "resumo": novo}
+
+    def desarquivar_obra(self, id_obra, tabelas):
+        with self._transacao():
+            for tbl, linhas in tabelas.items(): self._inserir(tbl, linhas)
+            self.conn.execute("DELETE FROM obras_arquivadas WHERE id_obra = ?", (int(id_obra),))
+            self.conn.execute("UPDATE obras SET status = ? WHERE id = ?", (STATUS_CONCLUIDA, int(id_obra)))
+            return self._buscar_ids("obras", [int(id_obra)])[0]
+
+    def guardar_arquivo(self, caminho, dados):
+        destino = os.path.join(self.pasta_arquivo, caminho)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        with open(destino + ".tmp", "wb") as f: f.write(dados)
+        os.replace(destino + ".tmp", destino)
+
+    def ler_arquivo(self, caminho):
+        destino = os.path.join(self.pasta_arquivo, caminho)
+        if not os.path.exists(destino): return None
+        with open(destino, "rb") as f: return f.read()
+
+
+class Transacao:
+    """BEGIN/COMMIT com o lock da conexão; ROLLBACK se der erro no meio"""
+
+    def __init__(self, repo):
+        self.repo = repo
+
+    def __enter__(self):
+        self.repo.lock.acquire()
+        self.repo.conn.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, tipo, erro, tb):
+        try:
+            self.repo.conn.execute("ROLLBACK" if tipo else "COMMIT")
+        finally:
+            self.repo.lock.release()
@@ -0,0 +1,115 @@
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from agregados import ETAPA_ENTRADA_CLIENTE
+from armazenamento import STATUS_ARQUIVADA, STATUS_CONCLUIDA, TABELAS_DA_OBRA
+from esquema import para_banco, tipar
+
+# --- ARQUIVO MORTO (OBRAS CONCLUÍDAS) ---
+# Obra concluída não recebe mais lançamentos, mas continuava nas tabelas quentes: cada
+# consulta, índice e rodada do vigia passava pelas linhas dela. Arquivar copia custos,
+# cronograma, checklist e tarefas da obra para um Parquet por tabela (Supabase Storage ou
+# uma pasta ao lado do .db), confere a cópia lendo de volta e só então, numa transação,
+# apaga as linhas e grava o resumo da obra (totais e contagens) em obras_arquivadas. A obra
+# continua na lista com o status "Arquivada"; ao ser selecionada os arquivos são baixados
+# (só nessa hora) e mostrados somente para leitura. A carteira (carteira.py) soma as obras
+# arquivadas a partir dos mesmos arquivos, então os painéis de todas as obras não mudam.
+MAX_OBRAS_EM_MEMORIA = 4  # obras arquivadas abertas guardadas no processo
+COMPRESSAO = "zstd"
+
+
+def caminho(id_obra, tabela):
+    return f"obras/{int(id_obra)}/{tabela}.parquet"
+
+
+class ArquivoMorto:
+    def __init__(self, repo, cache):
+        self.repo = repo
+        self.cache = cache  # CacheTabelas (dados.py)
+        self.abertas = OrderedDict()  # id_obra -> {tabela: frame}, da menos para a mais recente
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=len(TABELAS_DA_OBRA), thread_name_prefix="arquivo")
+
+    def ids(self):
+        """Obras arquivadas (pelas linhas de resumo)"""
+        df = self.cache.frame("obras_arquivadas")
+        return [] if df.empty else [int(i) for i in df["id_obra"]]
+
+    def resumo(self, id_obra):
+        df = self.cache.frame("obras_arquivadas")
+        linha = df[df["id_obra"] == int(id_obra)] if not df.empty else df
+        return None if linha.empty else linha.iloc[0].to_dict()
+
+    # --- ARQUIVAR ---
+    def arquivar(self, id_obra):
+        """Move as linhas da obra concluída para o arquivo; devolve o resumo gravado"""
+        id_obra = int(id_obra)
+        obra = self.cache.visao("obras")
+        if obra.valor(id_obra, "status", "") != STATUS_CONCLUIDA: raise ValueError("só obras concluídas são arquivadas")
+        if self.cache.fila is not None and any(self.cache.fila.pendentes(t, id_obra) for t in TABELAS_DA_OBRA):
+            raise ValueError("a obra tem lançamentos aguardando envio")
+        frames = {t: tipar(t, pd.DataFrame(self.repo.selecionar(t, id_obra))) for t in TABELAS_DA_OBRA}
+        tamanho = 0
+        for tbl, df in frames.items():
+            buf = io.BytesIO()
+            df.to_parquet(buf, index=False, compression=COMPRESSAO)
+            self.repo.guardar_arquivo(caminho(id_obra, tbl), buf.getvalue())
+            # Confere o que ficou guardado antes de apagar qualquer coisa do banco
+            volta = self.repo.ler_arquivo(caminho(id_obra, tbl))
+            if volta is None or len(pd.read_parquet(io.BytesIO(volta))) != len(df):
+                raise IOError(f"cópia de {tbl} da obra {id_obra} não confere")
+            tamanho += len(volta)
+        c = frames["custos"]
+        entrada = c["etapa"].astype("string").fillna("").eq(ETAPA_ENTRADA_CLIENTE) if not c.empty else pd.Series(dtype=bool)
+        resumo = {"gasto": float(c.loc[~entrada, "total"].sum()), "recebido": float(c.loc[entrada, "total"].sum()),
+                  "orcado": float(frames["cronograma"]["orcamento"].sum()), "bytes": tamanho,
+                  "arquivada_em": datetime.now().isoformat(timespec="seconds"),
+                  **{f"n_{t}": len(df) for t, df in frames.items()}}
+        # Banco: apaga as linhas conferindo as contagens (gravou algo depois da cópia, desfaz tudo)
+        self.cache.arquivar_obra(id_obra, resumo)
+        with self._lock: self.abertas[id_obra] = frames
+        return resumo
+
+    def arquivar_concluidas(self):
+        """Arquiva todas as obras concluídas; devolve {id_obra: erro} das que ficaram"""
+        df = self.cache.frame("obras")
+        ids = [] if df.empty else df.loc[df["status"].astype("string") == STATUS_CONCLUIDA, "id"].tolist()
+        erros = {}
+        for id_obra in ids:
+            try: self.arquivar(id_obra)
+            except Exception as e: erros[int(id_obra)] = str(e)
+        return erros
+
+    # --- LEITURA ---
+    def ler(self, id_obra, tabela):
+        """Frame tipado de uma tabela da obra arquivada (vazio se não houver arquivo)"""
+        dados = self.repo.ler_arquivo(caminho(id_obra, tabela))
+        return tipar(tabela, pd.read_parquet(io.BytesIO(dados)) if dados else pd.DataFrame())
+
+    def carregar(self, id_obra):
+        """Tabelas da obra arquivada, baixadas em paralelo na primeira vez e guardadas em memória"""
+        id_obra = int(id_obra)
+        with self._lock:
+            if id_obra in self.abertas:
+                self.abertas.move_to_end(id_obra)
+                return self.abertas[id_obra]
+        frames = dict(zip(TABELAS_DA_OBRA, self._pool.map(lambda t: self.ler(id_obra, t), TABELAS_DA_OBRA)))
+        with self._lock:
+            self.abertas[id_obra] = frames
+            while len(self.abertas) > MAX_OBRAS_EM_MEMORIA: self.abertas.popitem(last=False)
+        return frames
+
+    # --- REABRIR ---
+    def desarquivar(self, id_obra):
+        """Devolve as linhas da obra às tabelas (com os mesmos ids) e a obra volta a concluída"""
+        id_obra = int(id_obra)
+        if self.cache.visao("obras").valor(id_obra, "status", "") != STATUS_ARQUIVADA: raise ValueError("a obra não está arquivada")
+        frames = self.carregar(id_obra)
+        tabelas = {t: para_banco(t, df.drop(columns=["updated_at"], errors="ignore")) for t, df in frames.items() if not df.empty}
+        self.cache.desarquivar_obra(id_obra, tabelas)
+        with self._lock: self.abertas.pop(id_obra, None)
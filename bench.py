@@ -0,0 +1,180 @@
+"""Benchmark do app contra o servidor falso do Supabase (servidor_falso.py).
+
+Uso:
+    python bench.py                                   # 20 obras, 50 mil custos, latência 0 e 40 ms
+    python bench.py --obras 200 --custos 500000 --latencia 0,40,120
+    python bench.py --banco grande.db --app app_cloud.py --saida resultado.json
+
+Gera os dados (gerar_dados.py) se o banco não existir, sobe o servidor falso numa thread e
+roda o app pelo streamlit.testing (AppTest) com o cliente Supabase de verdade apontado para
+ele. Cada cenário mede o tempo de parede e, no servidor, as idas e voltas e os bytes. Para
+comparar versões, rode com --saida antes e depois da mudança.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from gerar_dados import gerar
+from servidor_falso import ServidorFalso
+
+ESPERA_FILA_S = 15  # tempo máximo para o lançamento sair da fila de escrita
+ITENS_NOTA = 40  # itens da nota fiscal colada no cenário lancar_nota
+# Onde cada app tem a busca de material, o botão de lançar e um editor em lote para salvar
+TELAS = {
+    "app.py": {"busca": "busca_mat_", "lancar": "💾 Salvar Lançamento", "editor": "editor_crono",
+               "colunas": ["id", "etapa", "orcamento"], "editar": ("orcamento", lambda v: float(v) + 100),
+               "salvar": "💾 Salvar Alterações nas Etapas"},
+    "app_cloud.py": {"busca": "busca_mat", "lancar": "Salvar Gasto", "editor": "ed_tar",
+                     "colunas": ["id", "descricao", "responsavel", "status"],
+                     "editar": ("responsavel", lambda v: "Equipe B" if v == "Equipe A" else "Equipe A"),
+                     "salvar": "Salvar Alterações Tarefas"},
+}
+
+
+class Bancada:
+    """Um app rodando no AppTest contra o servidor falso"""
+
+    def __init__(self, app, servidor, pasta):
+        self.app, self.servidor, self.pasta = app, servidor, pasta
+        self.tela = TELAS[os.path.basename(app)]
+
+    def nova_sessao(self):
+        from streamlit.testing.v1 import AppTest
+        at = AppTest.from_file(self.app, default_timeout=120)
+        at.secrets["acesso"] = {"senha_admin": "bench"}
+        at.secrets["supabase"] = {"url": self.servidor.url, "key": "aaa.bbb.ccc"}
+        at.secrets["armazenamento"] = {"tipo": "supabase", "fila": os.path.join(self.pasta, "fila.db"),
+                                       "carteira": os.path.join(self.pasta, "carteira")}
+        at.session_state["password_correct"] = True
+        return at
+
+    def medir(self, nome, acao):
+        """Roda acao() e devolve o resultado do cenário"""
+        self.servidor.contador.zerar()
+        inicio = time.perf_counter()
+        at = acao()
+        ms = (time.perf_counter() - inicio) * 1000
+        total = self.servidor.contador.total()
+        erros = [str(e.value) for e in at.exception] if at is not None else []
+        return {"cenario": nome, "ms": round(ms, 1), "requisicoes": total["requisicoes"],
+                "kb_enviados": round(total["bytes_enviados"] / 1024, 1), "kb_recebidos": round(total["bytes_recebidos"] / 1024, 1),
+                "rotas": self.servidor.contador.por_rota(), "erros": erros}
+
+    def esperar_rota(self, rota, minimo=1):
+        fim = time.monotonic() + ESPERA_FILA_S
+        while time.monotonic() < fim:
+            if self.servidor.contador.por_rota().get(rota, {}).get("requisicoes", 0) >= minimo: return True
+            time.sleep(0.02)
+        return False
+
+
+def cenarios(b):
+    """Sequência de cenários; cada um parte do estado deixado pelo anterior"""
+    import streamlit as st
+    res, at = [], None
+
+    def carga_fria():
+        nonlocal at
+        st.cache_resource.clear(); st.cache_data.clear()
+        shutil.rmtree(os.path.join(b.pasta, "carteira"), ignore_errors=True)
+        at = b.nova_sessao(); at.run()
+        return at
+    res.append(b.medir("carga_fria", carga_fria))
+
+    def carga_quente():
+        nonlocal at
+        at = b.nova_sessao(); at.run()
+        return at
+    res.append(b.medir("carga_quente (nova sessão)", carga_quente))
+
+    def trocar_obra():
+        obras = at.sidebar.selectbox[0]
+        ids = [int(o.split(" - ")[0]) for o in obras.options]  # rótulos "id - nome"
+        obras.set_value(next((i for i in ids if i != obras.value), obras.value)).run()
+        return at
+    res.append(b.medir("trocar_obra", trocar_obra))
+
+    def rerun():
+        at.run()
+        return at
+    res.append(b.medir("rerun (dashboards e carteira)", rerun))
+
+    def lancar_custo():
+        busca = next(w for w in at.text_input if w.key and w.key.startswith(b.tela["busca"]))
+        busca.set_value("cimento").run()
+        next(w for w in at.button if w.label == b.tela["lancar"]).click().run()
+        if not b.esperar_rota("POST custos"): raise RuntimeError("o lançamento não saiu da fila de escrita")
+        return at
+    res.append(b.medir("lancar_custo (até sair da fila)", lancar_custo))
+
+    def lancar_nota():
+        itens = "\n".join(f"Item da nota {i}\t{i % 5 + 1}\tun\t{10 + i},50" for i in range(ITENS_NOTA))
+        next(w for w in at.text_area if w.key and w.key.startswith("nota_txt_")).set_value(itens).run()
+        next(w for w in at.button if w.label.endswith("Carregar Itens")).click().run()
+        next(w for w in at.button if "Salvar Nota" in w.label).click().run()
+        if not b.esperar_rota("POST custos"): raise RuntimeError("a nota não saiu da fila de escrita")
+        return at
+    res.append(b.medir(f"lancar_nota ({ITENS_NOTA} itens, fila)", lancar_nota))
+
+    def salvar_editores():
+        # O AppTest não edita o st.data_editor: as edições entram pelo estado do widget, no
+        # formato que o navegador envia (posição da linha -> colunas alteradas)
+        df = next(w for w in at.dataframe if list(w.value.columns) == b.tela["colunas"]).value
+        coluna, editar = b.tela["editar"]
+        at.session_state[b.tela["editor"]] = {"edited_rows": {i: {coluna: editar(v)} for i, v in enumerate(df[coluna])},
+                                              "added_rows": [], "deleted_rows": []}
+        next(w for w in at.button if w.label == b.tela["salvar"]).click().run()
+        return at
+    res.append(b.medir(f"salvar_editores ({b.tela['editor']})", salvar_editores))
+    return res
+
+
+def imprimir(resultados, latencia):
+    print(f"\n=== latência {latencia:g} ms ===")
+    print(f"{'cenário':<34}{'ms':>10}{'idas':>7}{'kB env':>10}{'kB rec':>10}")
+    for r in resultados:
+        print(f"{r['cenario']:<34}{r['ms']:>10.1f}{r['requisicoes']:>7}{r['kb_enviados']:>10.1f}{r['kb_recebidos']:>10.1f}"
+              + (f"  ERRO: {r['erros'][0][:80]}" if r["erros"] else ""))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark do app contra o servidor falso do Supabase")
+    ap.add_argument("--app", default="app.py")
+    ap.add_argument("--banco", help="banco já gerado (padrão: um temporário com --obras/--custos)")
+    ap.add_argument("--obras", type=int, default=20)
+    ap.add_argument("--custos", type=int, default=50_000)
+    ap.add_argument("--latencia", default="0,40", help="ms por requisição, separados por vírgula")
+    ap.add_argument("--detalhe", action="store_true", help="mostra idas e voltas por rota")
+    ap.add_argument("--saida", help="grava os resultados em JSON")
+    args = ap.parse_args()
+    from streamlit import config, logger
+    config.set_option("logger.level", "error"); logger.set_log_level("error")  # sem os avisos a cada execução do app
+
+    app = args.app if os.path.exists(args.app) else os.path.join(os.path.dirname(os.path.abspath(__file__)), args.app)
+    pasta = tempfile.mkdtemp(prefix="bench_obras_")
+    banco = args.banco or os.path.join(pasta, "bench.db")
+    if not os.path.exists(banco):
+        t0 = time.perf_counter()
+        contagem = gerar(banco, args.obras, args.custos)
+        print(f"Dados gerados em {time.perf_counter() - t0:.1f}s: " + ", ".join(f"{n} {t}" for t, n in contagem.items()))
+
+    todos = {}
+    try:
+        with ServidorFalso(banco) as srv:
+            for lat in (float(x) for x in args.latencia.split(",")):
+                srv.latencia = lat
+                sessao = os.path.join(pasta, f"lat_{lat:g}")
+                os.makedirs(sessao, exist_ok=True)
+                resultados = cenarios(Bancada(os.path.abspath(app), srv, sessao))
+                imprimir(resultados, lat)
+                if args.detalhe:
+                    for r in resultados:
+                        print(f"  {r['cenario']}: " + ", ".join(f"{k} x{v['requisicoes']}" for k, v in sorted(r["rotas"].items())))
+                todos[f"{lat:g}"] = resultados
+    finally:
+        if args.saida:
+            with open(args.saida, "w", encoding="utf-8") as f: json.dump(todos, f, indent=1, ensure_ascii=False)
+        if not args.banco: shutil.rmtree(pasta, ignore_errors=True)
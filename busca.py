@@ -0,0 +1,67 @@
+import bisect
+import difflib
+import heapq
+import re
+import unicodedata
+
+# --- BUSCA NO CADASTRO DE MATERIAIS ---
+# Índice em memória montado uma vez por versão do cadastro (visao.py). Cada palavra da
+# consulta casa com o início de alguma palavra do nome ("cim 50" acha "Cimento CP-II 50kg"),
+# sem diferenciar acentos e maiúsculas. Palavra sem nenhum prefixo no cadastro é trocada
+# pelas mais parecidas do vocabulário (difflib), para pegar erros de digitação.
+SUGESTOES = 50
+SEMELHANCA_MIN = 0.75
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e só letras/números separados por espaço"""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    return " ".join(re.findall(r"[a-z0-9]+", texto))
+
+
+class IndiceBusca:
+    def __init__(self, ids, nomes):
+        self.ids = list(ids)
+        self.norm = [normalizar(n) for n in nomes]
+        # (palavra, posição) em ordem: as palavras com um prefixo ficam numa faixa contínua
+        pares = sorted((p, i) for i, n in enumerate(self.norm) for p in set(n.split()))
+        self.palavras = [p for p, _ in pares]
+        self.posicoes = [i for _, i in pares]
+        self.vocabulario = sorted(set(self.palavras))
+        self.ordem = sorted(range(len(self.ids)), key=self.norm.__getitem__)
+        self.por_nome = dict(zip(self.norm, self.ids))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def exato(self, nome):
+        """id do material com esse nome (sem diferenciar acentos/maiúsculas/pontuação), ou None"""
+        return self.por_nome.get(normalizar(nome))
+
+    def _com_prefixo(self, prefixo):
+        ini = bisect.bisect_left(self.palavras, prefixo)
+        fim = bisect.bisect_left(self.palavras, prefixo + "\uffff")
+        return set(self.posicoes[ini:fim])
+
+    def _aproximado(self, palavra):
+        # Só compara com palavras de mesma inicial e tamanho parecido (erro de digitação raramente
+        # está na primeira letra), o que mantém o difflib rápido em cadastros grandes
+        ini = bisect.bisect_left(self.vocabulario, palavra[0])
+        fim = bisect.bisect_left(self.vocabulario, palavra[0] + "\uffff")
+        candidatas = [p for p in self.vocabulario[ini:fim] if abs(len(p) - len(palavra)) <= 2]
+        parecidas = difflib.get_close_matches(palavra, candidatas, n=3, cutoff=SEMELHANCA_MIN)
+        return set().union(*(self._com_prefixo(p) for p in parecidas))
+
+    def buscar(self, consulta, limite=SUGESTOES):
+        """ids dos melhores resultados: primeiro os que começam pela consulta, depois os mais curtos"""
+        termos = normalizar(consulta).split()
+        if not termos: return [self.ids[i] for i in self.ordem[:limite]]
+        achados = None
+        for t in termos:
+            pos = self._com_prefixo(t) or self._aproximado(t)
+            achados = pos if achados is None else achados & pos
+            if not achados: return []
+        inteira = " ".join(termos)
+        melhores = heapq.nsmallest(limite, achados, key=lambda i: (not self.norm[i].startswith(inteira), len(self.norm[i]), self.norm[i]))
+        return [self.ids[i] for i in melhores]
@@ -0,0 +1,207 @@
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+from agregados import ETAPA_ENTRADA_CLIENTE, ETAPA_MAO_DE_OBRA
+from dados import marca_com_margem, marca_d_agua, mesclar, so_mudadas
+
+# --- CARTEIRA (TODAS AS OBRAS) ---
+# Cópia colunar (Parquet) de custos e cronograma de todas as obras, atualizada de forma
+# incremental com a mesma marca d'água do cache (dados.py) e reconstruída de hora em hora,
+# que é quando os apagamentos aparecem. As consultas rodam no DuckDB quando ele está
+# instalado (direto sobre os frames em memória, via Arrow) e em pandas quando não está;
+# o resultado fica guardado até a cópia mudar. As obras arquivadas (arquivo_morto.py) saem
+# das tabelas do banco: as linhas delas entram na cópia uma vez, lidas dos arquivos, e ficam
+# num Parquet à parte (arquivo_<tabela>.parquet) que a reconstrução não apaga.
+# A atualização roda numa thread própria (iniciar): a reconstrução leva segundos e não pode
+# parar a página de quem abriu o painel; as telas só leem o snapshot da versão atual.
+COLUNAS_CARTEIRA = {
+    "custos": {"id": "int64", "id_obra": "int64", "data": "datetime64[ns]", "mes": "string", "descricao": "string",
+               "total": "float64", "etapa": "string", "updated_at": "string"},
+    "cronograma": {"id": "int64", "id_obra": "int64", "orcamento": "float64", "updated_at": "string"},
+}
+ATUALIZAR_S = 30
+RECONSTRUIR_S = 3600
+
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError:
+        return None
+    return duckdb
+
+
+def _projetar(tabela, df):
+    """Só as colunas usadas nos painéis, com tipos fixos (o Parquet guarda o esquema)"""
+    tipos = COLUNAS_CARTEIRA[tabela]
+    df = df.reindex(columns=list(tipos))
+    if "data" in tipos:
+        df["data"] = pd.to_datetime(df["data"], format="ISO8601", errors="coerce")
+        df["mes"] = df["data"].dt.strftime("%Y-%m")  # calculado uma vez aqui, não a cada consulta
+    for col in ("total", "orcamento"):
+        if col in tipos: df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+    return df.astype(tipos)
+
+
+class CarteiraObras:
+    """Snapshot de custos e cronograma de todas as obras para os painéis da carteira"""
+
+    def __init__(self, repo, pasta="carteira", arquivo=None):
+        self.repo = repo
+        self.pasta = pasta
+        self.arquivo = arquivo  # ArquivoMorto (arquivo_morto.py), para as obras arquivadas
+        os.makedirs(pasta, exist_ok=True)
+        self.vivas = {tbl: self._ler(tbl) for tbl in COLUNAS_CARTEIRA}
+        self.arquivadas = {tbl: self._ler(f"arquivo_{tbl}", tbl) for tbl in COLUNAS_CARTEIRA}
+        arq = os.path.join(pasta, "estado.json")
+        self.estado = json.load(open(arq, encoding="utf-8")) if os.path.exists(arq) else {}
+        self.frames = self._juntar(self.vivas, self.arquivadas)
+        self.versao = 0
+        self.ultima_sync = 0.0
+        self.motor = "DuckDB" if _duckdb() else "pandas"
+        self.lock = threading.Lock()
+        self._memo = {}
+        self._con = None  # conexão DuckDB com os frames da versão atual já registrados
+        self._lock_con = threading.Lock()
+
+    def iniciar(self):
+        """Mantém a cópia atualizada em segundo plano (a cada ATUALIZAR_S)"""
+        threading.Thread(target=self._trabalhar, name="carteira", daemon=True).start()
+
+    def _trabalhar(self):
+        while True:
+            time.sleep(ATUALIZAR_S)
+            try: self.atualizar()
+            except Exception: pass  # a cópia anterior continua valendo; tenta na próxima volta
+
+    def _arquivo(self, tabela):
+        return os.path.join(self.pasta, f"{tabela}.parquet")
+
+    def _ler(self, nome, tabela=None):
+        if os.path.exists(self._arquivo(nome)): return pd.read_parquet(self._arquivo(nome))
+        return _projetar(tabela or nome, pd.DataFrame())
+
+    def _juntar(self, vivas, arquivadas):
+        """O que os painéis consultam: linhas do banco (menos as de obras já arquivadas, que só
+        somem da cópia na reconstrução) mais as dos arquivos"""
+        ids = self.estado.get("arquivadas", [])
+        if not ids: return dict(vivas)
+        return {tbl: pd.concat([vivas[tbl][~vivas[tbl]["id_obra"].isin(ids)], arquivadas[tbl]], ignore_index=True) for tbl in vivas}
+
+    def _acompanhar_arquivo(self, arquivadas):
+        """Traz dos arquivos as obras arquivadas desde a última vez e tira as reabertas;
+        devolve os ids arquivados, ou None se nada mudou"""
+        ids = set(self.arquivo.ids())
+        antes = set(self.estado.get("arquivadas", []))
+        if ids == antes: return None
+        for tbl in COLUNAS_CARTEIRA:
+            df = arquivadas[tbl][arquivadas[tbl]["id_obra"].isin(ids & antes)]
+            novas = [_projetar(tbl, self.arquivo.ler(i, tbl)) for i in sorted(ids - antes)]
+            arquivadas[tbl] = pd.concat([df, *novas], ignore_index=True).astype(COLUNAS_CARTEIRA[tbl])
+            self._gravar(f"arquivo_{tbl}", arquivadas[tbl])
+        return sorted(ids)
+
+    def _gravar(self, tabela, df):
+        tmp = self._arquivo(tabela) + ".tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, self._arquivo(tabela))
+
+    def atualizar(self, forcar=False):
+        """Busca só o que mudou desde a última marca; devolve True se a cópia mudou"""
+        with self.lock:
+            agora = time.time()
+            if not forcar and agora - self.ultima_sync < ATUALIZAR_S: return False
+            completo = forcar or agora - self.estado.get("ultimo_completo", 0) > RECONSTRUIR_S
+            frames, arquivadas, mudou, ids = dict(self.vivas), dict(self.arquivadas), False, None
+            try:
+                if self.arquivo is not None: ids = self._acompanhar_arquivo(arquivadas)
+                for tbl in COLUNAS_CARTEIRA:
+                    marca = None if completo else marca_d_agua(frames[tbl])
+                    novos = _projetar(tbl, pd.DataFrame(self.repo.selecionar(tbl, None, marca_com_margem(marca))))
+                    if marca is not None:
+                        novos = so_mudadas(frames[tbl], novos, marca[0])  # repetidas da margem
+                        if novos.empty: continue
+                        novos = mesclar(frames[tbl], novos)
+                    elif not completo and novos.empty and frames[tbl].empty: continue  # tabela ainda vazia
+                    frames[tbl] = novos
+                    self._gravar(tbl, novos)
+                    mudou = True
+            except Exception:
+                # Fica com a cópia anterior e tenta de novo na próxima janela
+                self.ultima_sync = agora
+                return False
+            self.ultima_sync = agora
+            if ids is not None: self.estado["arquivadas"], mudou = ids, True
+            if completo: self.estado["ultimo_completo"] = agora
+            if completo or mudou:
+                with open(os.path.join(self.pasta, "estado.json"), "w", encoding="utf-8") as f: json.dump(self.estado, f)
+            if mudou:
+                self.vivas, self.arquivadas = frames, arquivadas
+                self.frames = self._juntar(frames, arquivadas)  # troca o dicionário inteiro: consultas em andamento não veem meio-termo
+                self.versao += 1
+            return mudou
+
+    def _consultar(self, nome, sql, params, em_pandas):
+        chave = (nome, self.versao)
+        if chave in self._memo: return self._memo[chave]
+        versao, frames = self.versao, self.frames
+        duckdb = _duckdb()
+        if duckdb is not None:
+            with self._lock_con:
+                if self._con is None or self._con[0] != versao:
+                    if self._con is not None: self._con[1].close()
+                    con = duckdb.connect()
+                    for tbl, df in frames.items(): con.register(tbl, pa.Table.from_pandas(df, preserve_index=False))
+                    self._con = (versao, con)
+                res = self._con[1].execute(sql, params).df()
+        else:
+            res = em_pandas(frames)
+        self._memo = {k: v for k, v in self._memo.items() if k[1] == self.versao}
+        self._memo[chave] = res
+        return res
+
+    # --- CONSULTAS ---
+    def gasto_mensal(self):
+        """id_obra, mes (AAAA-MM), total gasto (sem as entradas do cliente)"""
+        def em_pandas(f):
+            c = f["custos"][~f["custos"]["etapa"].fillna("").eq(ETAPA_ENTRADA_CLIENTE) & f["custos"]["mes"].notna()]
+            return c.groupby(["id_obra", "mes"])["total"].sum().reset_index()
+        return self._consultar("gasto_mensal", """
+            SELECT id_obra, mes, SUM(total) AS total FROM custos
+            WHERE etapa IS DISTINCT FROM ? AND mes IS NOT NULL GROUP BY 1, 2 ORDER BY 1, 2""",
+            [ETAPA_ENTRADA_CLIENTE], em_pandas)
+
+    def orcado_realizado(self):
+        """Por obra: orçamento das etapas, gasto e recebido do cliente"""
+        def em_pandas(f):
+            c, cr = f["custos"], f["cronograma"]
+            entrada = c["etapa"].fillna("").eq(ETAPA_ENTRADA_CLIENTE)
+            g = pd.concat({"gasto": c[~entrada].groupby("id_obra")["total"].sum(),
+                           "recebido": c[entrada].groupby("id_obra")["total"].sum(),
+                           "orcado": cr.groupby("id_obra")["orcamento"].sum()}, axis=1)
+            return g.fillna(0.0).rename_axis("id_obra").reset_index()
+        return self._consultar("orcado_realizado", """
+            WITH g AS (SELECT id_obra, SUM(total) FILTER (WHERE etapa IS DISTINCT FROM ?) AS gasto,
+                              SUM(total) FILTER (WHERE etapa = ?) AS recebido FROM custos GROUP BY 1),
+                 o AS (SELECT id_obra, SUM(orcamento) AS orcado FROM cronograma GROUP BY 1)
+            SELECT COALESCE(g.id_obra, o.id_obra) AS id_obra, COALESCE(g.gasto, 0) AS gasto,
+                   COALESCE(g.recebido, 0) AS recebido, COALESCE(o.orcado, 0) AS orcado
+            FROM g FULL OUTER JOIN o ON g.id_obra = o.id_obra ORDER BY 1""",
+            [ETAPA_ENTRADA_CLIENTE, ETAPA_ENTRADA_CLIENTE], em_pandas)
+
+    def top_materiais(self, top=15):
+        """Materiais/serviços com maior gasto somando todas as obras"""
+        fora = [ETAPA_ENTRADA_CLIENTE, ETAPA_MAO_DE_OBRA]
+        def em_pandas(f):
+            c = f["custos"][~f["custos"]["etapa"].isin(fora)]
+            g = c.groupby("descricao").agg(total=("total", "sum"), obras=("id_obra", "nunique"))
+            return g.sort_values("total", ascending=False).head(top).reset_index()
+        return self._consultar(f"top_materiais_{top}", f"""
+            SELECT descricao, SUM(total) AS total, COUNT(DISTINCT id_obra) AS obras FROM custos
+            WHERE etapa IS NULL OR etapa NOT IN (?, ?) GROUP BY 1 ORDER BY 2 DESC LIMIT {int(top)}""",
+            fora, em_pandas)
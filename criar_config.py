@@ -8,6 +8,11 @@ senha_admin = "1234"
 [supabase]
 url = "COLE_SUA_URL_DO_SUPABASE_AQUI"
 key = "COLE_SUA_KEY_ANON_PUBLIC_AQUI"
+
+# Banco usado pelo app: "supabase" (padrão) ou "sqlite" (arquivo local, sem internet)
+[armazenamento]
+tipo = "supabase"
+caminho = "obras_local.db"
 """
 
 # 1. Cria a pasta .streamlit (se não existir)
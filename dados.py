@@ -0,0 +1,494 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from agregados import ResumoCustos
+from esquema import ESQUEMA, para_banco, tipar
+from visao import VISOES, Visao
+
+# Os frames em cache são compartilhados e nunca alterados no lugar; com copy-on-write (padrão
+# no pandas 3) quem derivar um frame deles e mexer nele ganha a própria cópia
+if int(pd.__version__.split(".")[0]) < 3: pd.set_option("mode.copy_on_write", True)
+
+# --- SINCRONIZAÇÃO DAS TABELAS ---
+# O cache é dividido em partições: uma por tabela global (obras, materiais...) e uma por
+# (tabela, id_obra) para as tabelas da obra, buscadas já filtradas no servidor.
+# Depois da primeira carga, cada partição busca só as linhas novas/alteradas desde a
+# última marca (updated_at quando a tabela tem, senão o maior id). Apagamentos feitos
+# por outros usuários só aparecem na ressincronização completa periódica.
+# A marca por updated_at volta MARGEM_MARCA_S na busca: no Postgres now() é a hora do início
+# da transação, então uma linha gravada numa transação demorada chega depois de outras com
+# hora maior. As linhas repetidas da margem são descartadas por (id, updated_at).
+# As cargas completas da tela de uma obra vêm juntas, numa ida ao banco (repo.pacote_obra),
+# só com as colunas do esquema (esquema.py).
+RESYNC_COMPLETO_S = 300
+PAUSA_PACOTE_S = 60  # depois de uma falha passageira do pacote_obra, tabela por tabela até lá
+MARGEM_MARCA_S = 30
+MAX_OBRAS_EM_CACHE = 20
+MAX_PAGINAS_EM_CACHE = 64
+
+
+def mesclar(df, novos, chave="id"):
+    """Junta as linhas novas no frame em cache (a versão mais recente vence)"""
+    if df.empty: return novos.reset_index(drop=True)
+    if novos.empty: return df
+    juntos = pd.concat([df, novos], ignore_index=True)
+    return juntos.drop_duplicates(subset=chave, keep="last").reset_index(drop=True)
+
+
+def aplicar_linhas(df, novos, chave="id"):
+    """Atualiza no frame as linhas que já existem (só as colunas enviadas) e acrescenta as novas"""
+    if df.empty or chave not in df.columns: return novos.reset_index(drop=True)
+    if novos.empty: return df
+    # Objeto novo: o recebido é o frame da partição, que outras sessões podem estar lendo.
+    # Com copy-on-write só as colunas escritas abaixo são copiadas de fato
+    df = df.copy(deep=False)
+    pos = pd.Series(df.index, index=df[chave])
+    ja = novos[chave].isin(pos.index)
+    if ja.any():
+        alvo = pos[novos.loc[ja, chave]].values
+        for col in novos.columns.drop(chave):
+            if col not in df.columns: df[col] = None
+            # category/bool não aceitam valor novo no lugar: a coluna volta ao tipo certo no tipar()
+            elif df[col].dtype != novos[col].dtype: df[col] = df[col].astype(object)
+            df.loc[alvo, col] = novos.loc[ja, col].values
+    return pd.concat([df, novos[~ja]], ignore_index=True)
+
+
+def linhas_alteradas(original, editado, colunas, chave="id"):
+    """Linhas completas (já com as edições) que mudaram em alguma das colunas do st.data_editor"""
+    base = original.set_index(chave)
+    ed = editado.dropna(subset=[chave]).set_index(chave)
+    ed.index = ed.index.astype(base.index.dtype)
+    ed = ed.loc[ed.index.intersection(base.index), colunas]
+    antes = base.loc[ed.index, colunas]
+    mudou = ~((antes == ed) | (antes.isna() & ed.isna())).all(axis=1)
+    novas = base.loc[mudou[mudou].index]
+    novas[colunas] = ed.loc[novas.index]
+    return novas.reset_index()
+
+
+def marca_d_agua(df):
+    """Coluna e valor a partir dos quais buscar alterações"""
+    if df.empty: return None
+    for col in ("updated_at", "id"):
+        if col in df.columns and df[col].notna().any():
+            return col, df[col].max()
+    return None
+
+
+def marca_com_margem(marca):
+    """Marca pronta para a busca: updated_at recuado MARGEM_MARCA_S, id como inteiro"""
+    if marca is None: return None
+    col, valor = marca
+    if col == "updated_at": return col, (pd.Timestamp(valor) - pd.Timedelta(seconds=MARGEM_MARCA_S)).isoformat()
+    return col, int(valor)
+
+
+def so_mudadas(df, novos, col):
+    """Linhas de novos que o frame não tem com o mesmo valor de marca (repetidas da margem)"""
+    if df.empty or novos.empty or "id" not in df.columns or col not in df.columns: return novos
+    vista = novos["id"].map(df.set_index("id")[col])
+    return novos[vista.isna() | (vista != novos[col]).fillna(True).astype(bool)]
+
+
+class Particao:
+    def __init__(self, frame):
+        self.frame = frame
+        self.suja = True
+        self.ultima_sync = 0.0
+        self.ultimo_completo = 0.0
+        self.resumo = None  # totais pré-calculados (agregados.py), quando a tabela tem
+        self.versao = 0  # muda a cada troca de frame
+        self.visao = None  # (versao, Visao) montada para a tela (visao.py)
+        self.lock = threading.Lock()
+
+
+class CacheTabelas:
+    """Frames em cache compartilhados pelo processo, atualizados em paralelo e de forma incremental"""
+
+    def __init__(self, repo, globais, por_obra=(), preparar=None, ttl=2, resumos=None, visoes=None):
+        self.repo = repo  # RepositorioSupabase ou RepositorioSQLite (armazenamento.py)
+        self.globais = list(globais)
+        self.por_obra = list(por_obra)
+        self.preparar = preparar or tipar  # tipos compactos por tabela (esquema.py)
+        self.ttl = ttl
+        self.resumos = {"custos": ResumoCustos} if resumos is None else resumos
+        self.visoes = VISOES if visoes is None else visoes
+        self.fila = None  # FilaEscrita (fila.py), para lançamentos feitos offline
+        self.vigia = None  # Vigia (vigia.py), que traz as mudanças do banco em segundo plano
+        self.particoes = {}
+        self.obras = OrderedDict()  # id_obra em uso, do menos para o mais recente
+        self.paginas = OrderedDict()  # páginas do histórico já buscadas, pela versão da partição
+        self.marcas = {}  # tabela -> (coluna, valor) até onde o vigia já buscou
+        self.usar_pacote = hasattr(repo, "pacote_obra")  # desligado se o banco não tiver a função
+        self.erro_pacote = None  # última falha do pacote_obra (aba Performance)
+        self._pacote_pausado_ate = 0.0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=len(self.globais) + len(self.por_obra), thread_name_prefix="carga")
+
+    def _particao(self, chave):
+        with self._lock:
+            part = self.particoes.get(chave)
+            if part is None:
+                part = self.particoes[chave] = Particao(self.preparar(chave[0], pd.DataFrame()))
+            id_obra = chave[1]
+            if id_obra is not None:
+                self.obras[id_obra] = True
+                self.obras.move_to_end(id_obra)
+                while len(self.obras) > MAX_OBRAS_EM_CACHE:
+                    velha, _ = self.obras.popitem(last=False)
+                    for tbl in self.por_obra: self.particoes.pop((tbl, velha), None)
+            return part
+
+    def _buscar(self, tabela, id_obra, marca):
+        return pd.DataFrame(self.repo.selecionar(tabela, id_obra, marca_com_margem(marca)))
+
+    def _atualizar(self, chave, forcar):
+        tbl, id_obra = chave
+        part = self._particao(chave)
+        with part.lock:
+            agora = time.monotonic()
+            # Com o vigia rodando as mudanças chegam por ele: a tela só busca na primeira carga
+            # e na ressincronização completa periódica (que é quando os apagamentos aparecem)
+            ttl = self.ttl if self.vigia is None else RESYNC_COMPLETO_S
+            if not forcar and not part.suja and agora - part.ultima_sync < ttl:
+                return part.frame
+            marca = None if self._completa(part, agora, forcar) else marca_d_agua(part.frame)
+            try:
+                novos = self.preparar(tbl, self._buscar(tbl, id_obra, marca))
+            except Exception:
+                # Mantém o que já está em cache e tenta de novo na próxima execução
+                part.suja = True
+                return part.frame
+            if marca is None:
+                self._completar(part, tbl, id_obra, novos, agora)
+                return part.frame
+            novos = so_mudadas(part.frame, novos, marca[0])
+            if not novos.empty:
+                self._trocar(part, tbl, mesclar(part.frame, novos), afetados=set(novos["id"]))
+            part.suja = False
+            part.ultima_sync = agora
+            return part.frame
+
+    def _completa(self, part, agora, forcar):
+        """A partição precisa de carga completa (nova, suja ou na hora da ressincronização)?"""
+        return forcar or part.suja or agora - part.ultimo_completo > RESYNC_COMPLETO_S
+
+    def _completar(self, part, tbl, id_obra, novos, agora):
+        """Aplica uma carga completa já tipada (com part.lock na mão)"""
+        if self.fila is not None: novos = self._com_pendentes(tbl, id_obra, novos)
+        # Recarga que não mudou nada mantém a versão: as sessões não são redesenhadas à toa
+        if part.suja or not part.frame.equals(novos): self._trocar(part, tbl, novos)
+        part.suja = False
+        part.ultima_sync = part.ultimo_completo = agora
+
+    def _carregar_pacote(self, id_obra, forcar):
+        """Cargas completas da obra (e das globais que também precisarem) numa ida ao banco;
+        devolve True se o pacote veio"""
+        chaves = [(t, id_obra) for t in self.por_obra] + [(t, None) for t in self.globais]
+        parts = {c: self._particao(c) for c in chaves}
+        if not any(self._completa(parts[(t, id_obra)], time.monotonic(), forcar) for t in self.por_obra): return False
+        trancadas = []
+        try:
+            for c in sorted(parts, key=str):  # sempre na mesma ordem: duas sessões não se travam
+                parts[c].lock.acquire(); trancadas.append(c)
+            agora = time.monotonic()
+            faltam = [c for c in chaves if self._completa(parts[c], agora, forcar)]  # outra sessão pode ter carregado
+            if not any(obra is not None for _, obra in faltam): return False
+            colunas = lambda obra: {t: list(ESQUEMA.get(t, [])) for t, o in faltam if o == obra}
+            try:
+                pacote = self.repo.pacote_obra(id_obra, colunas(id_obra), colunas(None))
+            except Exception as e:
+                # Erro do próprio banco (coluna, permissão, função: códigos 42xxx e PGRST) não
+                # passa repetindo: desliga o pacote. Os demais (rede, tempo esgotado) pausam por
+                # PAUSA_PACOTE_S. Nos dois casos a carga segue tabela por tabela
+                self.erro_pacote = repr(e)
+                codigo = str(getattr(e, "code", "") or "")
+                if codigo.startswith(("42", "PGRST")): self.usar_pacote = False
+                else: self._pacote_pausado_ate = time.monotonic() + PAUSA_PACOTE_S
+                return False
+            if pacote is None:
+                self.usar_pacote = False
+                return False
+            self.erro_pacote = None
+            for tbl, obra in faltam:
+                self._completar(parts[(tbl, obra)], tbl, obra, self.preparar(tbl, pd.DataFrame(pacote.get(tbl, []))), agora)
+            return True
+        finally:
+            for c in trancadas: parts[c].lock.release()
+
+    def _carregar(self, chaves, forcar):
+        futuros = {chave[0]: self._pool.submit(self._atualizar, chave, forcar) for chave in chaves}
+        return {tbl: fut.result() for tbl, fut in futuros.items()}
+
+    # --- ESCRITA ---
+    # Cada escrita vai ao banco e corrige só a partição afetada, sem recarregar nada.
+    # O frame é trocado (nunca alterado), então quem já leu o anterior não é afetado.
+    def _trocar(self, part, tabela, novo, afetados=None):
+        """Troca o frame da partição mantendo o resumo: refeito numa carga completa,
+        corrigido só com as linhas afetadas (ids) nas demais alterações"""
+        novo = self.preparar(tabela, novo)  # junções podem ter desfeito category/bool
+        resumo = self.resumos.get(tabela)
+        if resumo is not None:
+            if afetados is None or part.resumo is None:
+                part.resumo = resumo.de_frame(novo)
+            elif afetados:
+                velho = part.frame
+                saem = velho[velho["id"].isin(afetados)] if "id" in velho.columns else None
+                part.resumo = part.resumo.com(novo[novo["id"].isin(afetados)], saem)
+        part.frame = novo
+        part.versao += 1
+
+    def _aplicar(self, tabela, id_obra, novos=None, removidos=None, completos=True):
+        part = self.particoes.get((tabela, None if id_obra is None else int(id_obra)))
+        if part is None: return
+        with part.lock:
+            df, afetados = part.frame, set(removidos or [])
+            if removidos and not df.empty:
+                df = df[~df["id"].isin(removidos)].reset_index(drop=True)
+            if novos:
+                novos = pd.DataFrame(novos)
+                df = aplicar_linhas(df, self.preparar(tabela, novos) if completos else novos)
+                afetados |= set(novos["id"])
+            self._trocar(part, tabela, df, afetados)
+
+    def inserir(self, tabela, linhas, id_obra=None):
+        """Insere no banco e acrescenta as linhas devolvidas na partição"""
+        criadas = self.repo.inserir(tabela, [linhas] if isinstance(linhas, dict) else linhas)
+        self._aplicar(tabela, id_obra, novos=criadas)
+        return criadas
+
+    def atualizar(self, tabela, id_linha, campos, id_obra=None):
+        """Atualiza uma linha no banco e no frame em cache"""
+        gravadas = self.repo.atualizar(tabela, id_linha, campos)
+        if gravadas: self._aplicar(tabela, id_obra, novos=gravadas)
+        else: self._aplicar(tabela, id_obra, novos=[{"id": int(id_linha), **campos}], completos=False)
+        return gravadas
+
+    def excluir(self, tabela, id_linha, id_obra=None):
+        self.excluir_lote(tabela, [id_linha], id_obra)
+
+    def inserir_lote(self, tabela, linhas, id_obra=None):
+        """Insere muitas linhas de uma vez (em requisições de até TAMANHO_LOTE)"""
+        return self.inserir(tabela, list(linhas), id_obra)
+
+    def salvar_lote(self, tabela, linhas, id_obra=None):
+        """Grava linhas já existentes num upsert em lote; devolve quantas foram enviadas"""
+        if linhas.empty: return 0
+        # Linhas completas: o upsert precisa dos campos obrigatórios mesmo quando só atualiza
+        regs = para_banco(tabela, linhas.drop(columns=["updated_at"], errors="ignore"))
+        gravadas = self.repo.upsert(tabela, regs)
+        self._aplicar(tabela, id_obra, novos=gravadas or regs, completos=bool(gravadas))
+        return len(regs)
+
+    def excluir_lote(self, tabela, ids, id_obra=None):
+        """Apaga várias linhas com filtros in_("id", ...) em vez de um delete por linha"""
+        ids = [int(i) for i in ids]
+        if ids: self.repo.excluir(tabela, ids)
+        self._aplicar(tabela, id_obra, removidos=ids)
+        return len(ids)
+
+    # --- OPERAÇÕES DA OBRA INTEIRA ---
+    # Cada backend faz numa transação só (funções do supabase_funcoes.sql ou BEGIN/COMMIT no SQLite)
+    def criar_obra(self, obra, cronograma=(), pontos=()):
+        """Cria a obra com cronograma e checklist; devolve a linha da obra"""
+        nova = self.repo.criar_obra(obra, cronograma, pontos)
+        self._aplicar("obras", None, novos=[nova])
+        return nova
+
+    def reaplicar_padrao(self, id_obra, cronograma=(), pontos=()):
+        """Troca cronograma e checklist da obra pelos do padrão"""
+        self.repo.reaplicar_padrao(id_obra, cronograma, pontos)
+        self.invalidar("cronograma", "pontos_criticos", id_obra=int(id_obra))
+
+    def aplicar_lote(self, plano, obras, renomeadas=()):
+        """Grava o plano de reaplicação de um padrão (modelos.plano_obra, várias obras) numa ida
+        ao banco e marca para recarga as partições das obras tocadas"""
+        self.repo.aplicar_lote({op: plano[op] for op in ("excluir", "atualizar", "inserir", "renomear")})
+        tabelas = {*plano["excluir"], *plano["atualizar"], *plano["inserir"]}
+        for id_obra in obras: self.invalidar(*tabelas, id_obra=int(id_obra))
+        for id_obra in renomeadas: self.invalidar("custos", id_obra=int(id_obra))
+
+    def excluir_obra(self, id_obra):
+        """Apaga a obra e todas as linhas dela (custos, cronograma, checklist e tarefas)"""
+        self.repo.excluir_obra(id_obra)
+        self._aplicar("obras", None, removidos=[int(id_obra)])
+        self.descartar_obra(id_obra)
+
+    def arquivar_obra(self, id_obra, resumo):
+        """Tira as linhas da obra das tabelas (já copiadas pelo arquivo_morto.py) e grava o resumo"""
+        res = self.repo.arquivar_obra(id_obra, resumo)
+        self._aplicar("obras", None, novos=[res["obra"]])
+        self._aplicar("obras_arquivadas", None, novos=[res["resumo"]])
+        self.descartar_obra(id_obra)
+        return res
+
+    def desarquivar_obra(self, id_obra, tabelas):
+        """Devolve as linhas da obra arquivada ({tabela: linhas}) às tabelas"""
+        obra = self.repo.desarquivar_obra(id_obra, tabelas)
+        self._aplicar("obras", None, novos=[obra])
+        df = self.frame("obras_arquivadas")
+        if not df.empty: self._aplicar("obras_arquivadas", None, removidos=df.loc[df["id_obra"] == int(id_obra), "id"].tolist())
+        self.descartar_obra(id_obra)
+        return obra
+
+    # --- FILA OFFLINE ---
+    def usar_fila(self, fila):
+        self.fila = fila
+        fila.ao_enviar = self.confirmar_envio
+
+    def _com_pendentes(self, tabela, id_obra, df):
+        pend = self.fila.pendentes(tabela, id_obra)
+        if not pend: return df
+        pend = self.preparar(tabela, pd.DataFrame(pend))
+        if "chave_idem" in df.columns:
+            pend = pend[~pend["chave_idem"].isin(df["chave_idem"])]
+        return aplicar_linhas(df, pend)
+
+    def enfileirar(self, tabela, linhas, id_obra=None):
+        """Grava no diário local e mostra na hora (id provisório negativo); o envio é em segundo plano"""
+        provisorias = self.fila.enfileirar(tabela, linhas, id_obra, acordar=False)
+        self._aplicar(tabela, id_obra, novos=provisorias)
+        self.fila.acordar()  # só depois das provisórias estarem no cache, para o envio poder trocá-las
+        return provisorias
+
+    def descartar_pendentes(self, seqs):
+        """Tira do diário lançamentos com falha e as linhas provisórias deles do cache"""
+        for (tabela, id_obra), ids in self.fila.descartar(seqs).items():
+            self._aplicar(tabela, id_obra, removidos=ids)
+
+    def confirmar_envio(self, tabela, id_obra, chaves, gravadas):
+        """Troca as linhas provisórias pelas que o banco devolveu"""
+        part = self.particoes.get((tabela, id_obra))
+        if part is None: return
+        with part.lock:
+            df, afetados = part.frame, set()
+            if "chave_idem" in df.columns:
+                provisorias = df["chave_idem"].isin(chaves) & (df["id"] < 0)
+                afetados |= set(df.loc[provisorias, "id"])
+                df = df[~provisorias].reset_index(drop=True)
+            if gravadas:
+                df = aplicar_linhas(df, self.preparar(tabela, pd.DataFrame(gravadas)))
+                afetados |= {g["id"] for g in gravadas}
+            self._trocar(part, tabela, df, afetados)
+            # Reenvio de linhas que o banco já tinha: ele não as devolve, então recarrega a partição
+            if len(gravadas) < len(chaves): part.suja = True
+
+    def resumo(self, id_obra, tabela="custos"):
+        """Totais pré-calculados da partição (ex.: ResumoCustos da obra)"""
+        part = self._particao((tabela, int(id_obra)))
+        with part.lock:
+            if part.resumo is None: part.resumo = self.resumos[tabela].de_frame(part.frame)
+            return part.resumo
+
+    # --- PÁGINAS ---
+    def pagina(self, tabela, id_obra, filtros=None, ordem=("data", True), cursor=None, limite=50):
+        """Uma página buscada no banco já filtrada e ordenada (paginação por chave).
+        Devolve (frame, cursor da próxima página ou None). A página fica guardada até a
+        partição da obra mudar, então as execuções seguintes não voltam ao banco."""
+        part = self._particao((tabela, int(id_obra)))
+        chave = (tabela, int(id_obra), tuple(sorted((filtros or {}).items())), tuple(ordem), cursor, limite, part.versao)
+        with self._lock:
+            if chave in self.paginas:
+                self.paginas.move_to_end(chave)
+                return self.paginas[chave]
+        linhas = self.repo.pagina(tabela, id_obra, filtros, ordem, cursor, limite + 1)
+        proximo = (linhas[limite - 1][ordem[0]], linhas[limite - 1]["id"]) if len(linhas) > limite else None
+        resultado = (self.preparar(tabela, pd.DataFrame(linhas[:limite])), proximo)
+        with self._lock:
+            self.paginas[chave] = resultado
+            while len(self.paginas) > MAX_PAGINAS_EM_CACHE: self.paginas.popitem(last=False)
+        return resultado
+
+    def descartar_obra(self, id_obra):
+        """Tira do cache as partições de uma obra apagada"""
+        with self._lock:
+            self.obras.pop(int(id_obra), None)
+            for tbl in self.por_obra: self.particoes.pop((tbl, int(id_obra)), None)
+
+    def invalidar(self, *tabelas, id_obra=None):
+        """Força a recarga completa das partições indicadas (todas, se nada for passado)"""
+        with self._lock:
+            for (tbl, obra), part in self.particoes.items():
+                if tabelas and tbl not in tabelas: continue
+                if id_obra is not None and obra != id_obra: continue
+                part.suja = True
+
+    def visao(self, tabela, id_obra=None):
+        """Visão do frame atual (colunas derivadas e índice por id), refeita só quando ele muda"""
+        part = self._particao((tabela, None if id_obra is None else int(id_obra)))
+        with part.lock:
+            if part.visao is None or part.visao[0] != part.versao:
+                part.visao = (part.versao, self.visoes.get(tabela, Visao)(part.frame))
+            return part.visao[1]
+
+    def frame(self, tabela, id_obra=None):
+        """Frame em cache como está, sem ir ao banco (para fragmentos que rodam sozinhos)"""
+        return self._particao((tabela, None if id_obra is None else int(id_obra))).frame
+
+    # --- MUDANÇAS DE OUTROS USUÁRIOS ---
+    # Chamado pelo vigia (vigia.py), uma thread para o processo todo: cada tabela é consultada
+    # uma vez por rodada, com as linhas de todas as obras em cache juntas, e cada partição
+    # recebe só as linhas dela. A carga no banco não cresce com o número de sessões.
+    def acompanhar(self):
+        """Uma rodada: busca o que mudou desde a última e aplica nas partições; devolve quantas linhas chegaram"""
+        with self._lock:
+            por_tabela = {}
+            for (tbl, obra), part in self.particoes.items():
+                if not part.suja: por_tabela.setdefault(tbl, {})[obra] = part
+        futuros = [self._pool.submit(self._acompanhar_tabela, tbl, parts) for tbl, parts in por_tabela.items()]
+        return sum(f.result() for f in futuros)
+
+    def _acompanhar_tabela(self, tbl, parts):
+        marcas = [m for m in (marca_d_agua(p.frame) for p in parts.values()) if m is not None]
+        if tbl not in self.marcas:
+            if not marcas: return 0  # nada carregado ainda: a primeira carga da tela traz tudo
+            col = marcas[0][0]
+            self.marcas[tbl] = (col, min(v for c, v in marcas if c == col))
+        col, valor = self.marcas[tbl]
+        novos = self._buscar(tbl, None, (col, valor))
+        if novos.empty: return 0
+        self.marcas[tbl] = (col, max(valor, novos[col].max()))
+        novos = self.preparar(tbl, novos)
+        if None in parts: grupos = {None: novos}
+        else: grupos = {int(obra): linhas for obra, linhas in novos.groupby("id_obra", sort=False)}
+        aplicadas = 0
+        for obra, linhas in grupos.items():
+            part = parts.get(obra)
+            if part is None: continue  # obra que nenhuma sessão abriu
+            with part.lock:
+                linhas = so_mudadas(part.frame, linhas, col)  # já vistas na carga da partição ou na margem
+                if not linhas.empty: self._trocar(part, tbl, mesclar(part.frame, linhas), afetados=set(linhas["id"]))
+                aplicadas += len(linhas)
+        return aplicadas
+
+    def remover(self, tabela, ids):
+        """Tira as linhas apagadas por outro usuário das partições da tabela (aviso do Realtime)"""
+        ids = {int(i) for i in ids}
+        with self._lock:
+            parts = [p for (tbl, _), p in self.particoes.items() if tbl == tabela]
+        for part in parts:
+            with part.lock:
+                fora = part.frame["id"].isin(ids) if "id" in part.frame.columns else None
+                if fora is not None and fora.any():
+                    self._trocar(part, tabela, part.frame[~fora].reset_index(drop=True), afetados=ids)
+
+    def versoes(self, id_obra=None):
+        """Versões das partições que a tela mostra (globais e as da obra): mudou, redesenha"""
+        chaves = [(t, None) for t in self.globais] + ([(t, int(id_obra)) for t in self.por_obra] if id_obra else [])
+        with self._lock:
+            return tuple(self.particoes[c].versao if c in self.particoes else -1 for c in chaves)
+
+    def sincronizar(self, forcar=False):
+        """Tabelas globais (obras, materiais, fornecedores...)"""
+        return self._carregar([(t, None) for t in self.globais], forcar)
+
+    def carregar_obra(self, id_obra, forcar=False):
+        """Tabelas da obra, buscadas só com as linhas dela"""
+        usar = self.usar_pacote and time.monotonic() >= self._pacote_pausado_ate
+        if usar and self._carregar_pacote(int(id_obra), forcar): forcar = False
+        return self._carregar([(t, int(id_obra)) for t in self.por_obra], forcar)
@@ -0,0 +1,73 @@
+import pandas as pd
+
+# --- TIPOS DAS TABELAS EM CACHE ---
+# O banco devolve tudo como JSON (textos, números e "TRUE"/"FALSE"). Cada partição do cache
+# (dados.py) passa por tipar() uma vez, ao ser trocada: ids em int32, dinheiro em float64,
+# data em datetime, feito em bool e as colunas de poucos valores repetidos (etapa, status,
+# unidade...) em category. Os frames ficam compartilhados pelas sessões (st.cache_resource)
+# e nunca são alterados no lugar (copy-on-write do pandas), então as telas usam direto, sem
+# .copy() e sem converter de novo. Na volta ao banco, para_banco() desfaz os tipos.
+ID, INTEIRO, DINHEIRO, DATA, BOOL, CATEGORIA, TEXTO = "id", "inteiro", "dinheiro", "data", "bool", "categoria", "texto"
+
+ESQUEMA = {
+    "obras": {"id": ID, "nome": TEXTO, "endereco": TEXTO, "status": CATEGORIA,
+              "orcamento_pedreiro": DINHEIRO, "orcamento_cliente": DINHEIRO, "updated_at": TEXTO},
+    "custos": {"id": ID, "id_obra": ID, "data": DATA, "descricao": TEXTO, "qtd": DINHEIRO, "unidade": CATEGORIA,
+               "valor": DINHEIRO, "total": DINHEIRO, "classe": CATEGORIA, "etapa": CATEGORIA, "fornecedor": CATEGORIA,
+               "chave_idem": TEXTO, "updated_at": TEXTO},
+    # etapa do cronograma é única por obra e renomeada no editor: fica como texto
+    "cronograma": {"id": ID, "id_obra": ID, "etapa": TEXTO, "status": CATEGORIA, "orcamento": DINHEIRO,
+                   "porcentagem": INTEIRO, "chave_idem": TEXTO, "updated_at": TEXTO},
+    "pontos_criticos": {"id": ID, "id_obra": ID, "etapa_pai": CATEGORIA, "descricao": TEXTO, "feito": BOOL, "updated_at": TEXTO},
+    "tarefas": {"id": ID, "id_obra": ID, "descricao": TEXTO, "responsavel": TEXTO, "status": CATEGORIA, "updated_at": TEXTO},
+    "materiais": {"id": ID, "nome": TEXTO, "unidade": CATEGORIA, "preco_ref": DINHEIRO, "updated_at": TEXTO},
+    "fornecedores": {"id": ID, "nome": TEXTO, "telefone": TEXTO, "updated_at": TEXTO},
+    # etapas = JSON da versão do padrão (modelos.py)
+    "modelos": {"id": ID, "nome": TEXTO, "versao": INTEIRO, "etapas": TEXTO, "updated_at": TEXTO},
+    # uma linha por obra arquivada (arquivo_morto.py): os totais que os painéis mostram sem abrir o arquivo
+    "obras_arquivadas": {"id": ID, "id_obra": ID, "gasto": DINHEIRO, "recebido": DINHEIRO, "orcado": DINHEIRO,
+                         "n_custos": INTEIRO, "n_cronograma": INTEIRO, "n_pontos_criticos": INTEIRO, "n_tarefas": INTEIRO,
+                         "bytes": INTEIRO, "arquivada_em": TEXTO, "updated_at": TEXTO},
+}
+
+
+def _ja_tipada(serie, tipo):
+    d = serie.dtype
+    if tipo == CATEGORIA: return isinstance(d, pd.CategoricalDtype)
+    if tipo == DATA: return pd.api.types.is_datetime64_any_dtype(d)
+    return d == {ID: "int32", INTEIRO: "int32", DINHEIRO: "float64", BOOL: "bool"}.get(tipo)
+
+
+def _converter(serie, tipo):
+    if tipo == INTEIRO: return pd.to_numeric(serie, errors="coerce").fillna(0).astype("int32")
+    if tipo == ID:
+        num = pd.to_numeric(serie, errors="coerce")
+        return num.astype("int32") if num.notna().all() else num.astype("Int32")  # Int32 só se faltar id
+    if tipo == DINHEIRO: return pd.to_numeric(serie, errors="coerce").fillna(0.0).astype("float64")
+    if tipo == DATA: return pd.to_datetime(serie, format="ISO8601", errors="coerce")
+    if tipo == BOOL: return serie.astype(object).map(lambda v: v is True or str(v).upper() == "TRUE").astype(bool)
+    return serie.astype(object).astype("category")
+
+
+def tipar(tabela, df):
+    """Frame com as colunas do esquema da tabela (as que faltam entram vazias) nos tipos compactos.
+    Colunas já no tipo certo não são tocadas, então aplicar de novo é barato."""
+    esquema = ESQUEMA.get(tabela)
+    if esquema is None: return df
+    if any(c not in df.columns for c in esquema):
+        df = df.reindex(columns=[*esquema, *(c for c in df.columns if c not in esquema)])
+    novas = {c: _converter(df[c], t) for c, t in esquema.items() if t != TEXTO and not _ja_tipada(df[c], t)}
+    return df.assign(**novas) if novas else df
+
+
+def para_banco(tabela, df):
+    """Registros para a API a partir de um frame tipado: feito volta a "TRUE"/"FALSE" e data a AAAA-MM-DD"""
+    esquema = ESQUEMA.get(tabela, {})
+    volta = {}
+    for c in df.columns:
+        tipo = esquema.get(c)
+        if tipo == BOOL and pd.api.types.is_bool_dtype(df[c]): volta[c] = df[c].map({True: "TRUE", False: "FALSE"})
+        elif tipo == DATA and pd.api.types.is_datetime64_any_dtype(df[c]): volta[c] = df[c].dt.strftime("%Y-%m-%d")
+    df = df.assign(**volta) if volta else df
+    regs = df.astype(object).where(df.notna(), None).to_dict("records")
+    return [{k: (v.isoformat() if hasattr(v, "isoformat") else v.item() if hasattr(v, "item") else v) for k, v in r.items()} for r in regs]
@@ -0,0 +1,156 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+# --- FILA DE ESCRITA OFFLINE ---
+# Os lançamentos são gravados primeiro num diário SQLite local (WAL) e confirmados na hora.
+# Uma thread envia o diário ao banco em lotes, com novas tentativas e chave de idempotência
+# (chave_idem): se um lote for reenviado depois de uma falha no meio, o banco ignora as
+# linhas que já recebeu. Linha que o banco recusa (dado inválido, coluna que não existe)
+# passa a ir sozinha depois de TENTATIVAS_LOTE falhas e, depois de MAX_TENTATIVAS, fica
+# marcada como falha: sai do envio, para o resto da fila andar, e aparece na tela para ser
+# reenviada ou descartada. Falta de rede não conta tentativa.
+LOTE_ENVIO = 200
+TENTATIVAS_LOTE = 3
+MAX_TENTATIVAS = 8
+ESPERA_MAX_S = 60
+GUARDAR_ENVIADOS_S = 7 * 24 * 3600
+
+
+def transitoria(e):
+    """Erro de rede ou banco ocupado: a linha não tem culpa, só tenta de novo mais tarde"""
+    if isinstance(e, sqlite3.OperationalError): return "locked" in str(e) or "busy" in str(e)
+    return isinstance(e, OSError) or type(e).__module__.split(".")[0] in ("httpx", "httpcore")
+
+
+class FilaEscrita:
+    def __init__(self, repo, caminho="fila_escrita.db", ao_enviar=None):
+        self.repo = repo
+        self.ao_enviar = ao_enviar  # ao_enviar(tabela, id_obra, chaves, linhas_gravadas)
+        self.conn = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS diario (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT, chave TEXT UNIQUE, tabela TEXT, id_obra INTEGER,
+            linha TEXT, criado_em REAL, tentativas INTEGER DEFAULT 0, erro TEXT, enviado_em REAL)""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS diario_pendentes ON diario (enviado_em, seq)")
+        self.ultimo_erro = None
+        self._acordar = threading.Event()
+
+    def iniciar(self):
+        """Começa o envio em segundo plano"""
+        threading.Thread(target=self._trabalhar, name="fila-escrita", daemon=True).start()
+
+    def enfileirar(self, tabela, linhas, id_obra=None, acordar=True):
+        """Grava as linhas no diário e devolve já com id provisório (negativo) e chave_idem"""
+        gravadas = []
+        with self.lock:
+            self.conn.execute("BEGIN")
+            for l in linhas:
+                l = {**l, "chave_idem": l.get("chave_idem") or uuid.uuid4().hex}
+                cur = self.conn.execute("INSERT INTO diario (chave, tabela, id_obra, linha, criado_em) VALUES (?,?,?,?,?)",
+                                        (l["chave_idem"], tabela, id_obra, json.dumps(l), time.time()))
+                gravadas.append({**l, "id": -cur.lastrowid})
+            self.conn.execute("COMMIT")
+        if acordar: self.acordar()
+        return gravadas
+
+    def acordar(self):
+        self._acordar.set()
+
+    def pendentes(self, tabela=None, id_obra=None):
+        """Linhas ainda não enviadas (com o id provisório), para mostrar junto do que já está no banco"""
+        sql, args = "SELECT seq, linha FROM diario WHERE enviado_em IS NULL", []
+        if tabela is not None:
+            sql += " AND tabela = ?"; args.append(tabela)
+        if id_obra is not None:
+            sql += " AND id_obra = ?"; args.append(int(id_obra))
+        with self.lock:
+            return [{**json.loads(r["linha"]), "id": -r["seq"]} for r in self.conn.execute(sql + " ORDER BY seq", args)]
+
+    def situacao(self):
+        """(pendentes, enviados nas últimas 24h, com falha, último erro)"""
+        with self.lock:
+            pend, falhas = self.conn.execute("SELECT SUM(tentativas < ?), SUM(tentativas >= ?) FROM diario "
+                                             "WHERE enviado_em IS NULL", (MAX_TENTATIVAS, MAX_TENTATIVAS)).fetchone()
+            env = self.conn.execute("SELECT COUNT(*) FROM diario WHERE enviado_em > ?", (time.time() - 86400,)).fetchone()[0]
+        return pend or 0, env, falhas or 0, self.ultimo_erro
+
+    def falhas(self):
+        """Linhas que o banco recusou MAX_TENTATIVAS vezes (fora do envio até reenviar ou descartar)"""
+        with self.lock:
+            regs = self.conn.execute("SELECT seq, tabela, id_obra, linha, criado_em, tentativas, erro FROM diario "
+                                     "WHERE enviado_em IS NULL AND tentativas >= ? ORDER BY seq", (MAX_TENTATIVAS,)).fetchall()
+        return [{**dict(r), "linha": json.loads(r["linha"])} for r in regs]
+
+    def reenviar(self, seqs):
+        """Volta as linhas com falha para a fila, com as tentativas zeradas"""
+        with self.lock:
+            self.conn.executemany("UPDATE diario SET tentativas = 0, erro = NULL WHERE seq = ? AND enviado_em IS NULL",
+                                  [(int(s),) for s in seqs])
+        self.acordar()
+
+    def descartar(self, seqs):
+        """Apaga do diário linhas ainda não enviadas; devolve {(tabela, id_obra): [ids provisórios]}"""
+        grupos = {}
+        with self.lock:
+            self.conn.execute("BEGIN")
+            for s in seqs:
+                r = self.conn.execute("DELETE FROM diario WHERE seq = ? AND enviado_em IS NULL RETURNING tabela, id_obra",
+                                      (int(s),)).fetchone()
+                if r: grupos.setdefault((r["tabela"], r["id_obra"]), []).append(-int(s))
+            self.conn.execute("COMMIT")
+        return grupos
+
+    def enviar(self):
+        """Envia um lote do diário; devolve quantas linhas foram confirmadas pelo banco"""
+        with self.lock:
+            regs = self.conn.execute("SELECT seq, chave, tabela, id_obra, linha, tentativas FROM diario "
+                                     "WHERE enviado_em IS NULL AND tentativas < ? ORDER BY seq LIMIT ?",
+                                     (MAX_TENTATIVAS, LOTE_ENVIO)).fetchall()
+        grupos = {}
+        for r in regs:
+            # Linha que já derrubou o lote algumas vezes vai sozinha: só ela fica para trás
+            sozinha = r["seq"] if r["tentativas"] >= TENTATIVAS_LOTE else None
+            grupos.setdefault((r["tabela"], r["id_obra"], sozinha), []).append(r)
+        enviados, recusa = 0, None
+        for (tabela, id_obra, _), itens in grupos.items():
+            try:
+                gravadas = self.repo.inserir_idempotente(tabela, [json.loads(r["linha"]) for r in itens])
+            except Exception as e:
+                self.ultimo_erro = str(e)
+                if transitoria(e): raise
+                with self.lock:
+                    self.conn.executemany("UPDATE diario SET tentativas = tentativas + 1, erro = ? WHERE seq = ?",
+                                          [(str(e), r["seq"]) for r in itens])
+                recusa = e  # segue com os outros grupos; a espera vem no fim
+                continue
+            with self.lock:
+                self.conn.executemany("UPDATE diario SET enviado_em = ?, erro = NULL WHERE seq = ?",
+                                      [(time.time(), r["seq"]) for r in itens])
+            if self.ao_enviar: self.ao_enviar(tabela, id_obra, [r["chave"] for r in itens], gravadas)
+            enviados += len(itens)
+        if recusa is not None: raise recusa
+        self.ultimo_erro = None
+        return enviados
+
+    def _limpar(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM diario WHERE enviado_em < ?", (time.time() - GUARDAR_ENVIADOS_S,))
+
+    def _trabalhar(self):
+        espera = 1
+        while True:
+            try:
+                while self.enviar(): pass
+                self._limpar()
+                espera = 1
+                self._acordar.wait(30)
+            except Exception:
+                # Sem rede ou banco fora do ar: tenta de novo com espera crescente
+                self._acordar.wait(espera)
+                espera = min(espera * 2, ESPERA_MAX_S)
+            self._acordar.clear()
@@ -0,0 +1,169 @@
+"""Gera um banco SQLite com dados sintéticos de obras para o benchmark (servidor_falso.py, bench.py).
+
+Uso:
+    python gerar_dados.py bench.db --obras 50 --custos 200000
+    python gerar_dados.py grande.db --obras 500 --custos 1000000 --materiais 20000
+
+Cada obra recebe o cronograma e o checklist do TEMPLATE_ETAPAS com o avanço coerente com a
+idade da obra, lançamentos de material espalhados pelas etapas já iniciadas, pagamentos de
+mão de obra e entradas do cliente. O tamanho das obras segue uma cauda longa (poucas obras
+grandes, muitas pequenas), como na carteira real. Mesma semente, mesmos dados.
+"""
+import argparse
+import os
+import time
+from datetime import date
+
+import numpy as np
+
+from agregados import ETAPA_ENTRADA_CLIENTE, ETAPA_MAO_DE_OBRA
+from armazenamento import RepositorioSQLite
+from modelos import TEMPLATE_ETAPAS, linhas_padrao
+
+MAX_OBRAS = 500
+MAX_CUSTOS = 1_000_000
+BLOCO = 50_000  # linhas por executemany
+
+# (material, unidade, preço de referência)
+MATERIAIS_BASE = [
+    ("Cimento CP-II 50kg", "saco", 38.0), ("Areia Média", "m³", 140.0), ("Brita 1", "m³", 150.0),
+    ("Tijolo Cerâmico 8 Furos", "milheiro", 950.0), ("Bloco de Concreto 14x19x39", "un", 4.2),
+    ("Vergalhão CA-50 10mm", "barra", 52.0), ("Vergalhão CA-60 5mm", "barra", 18.0), ("Arame Recozido", "kg", 16.0),
+    ("Cal Hidratada 20kg", "saco", 22.0), ("Argamassa AC-II 20kg", "saco", 28.0), ("Tábua de Pinus 30cm", "m", 14.0),
+    ("Prego 17x27", "kg", 19.0), ("Tubo PVC Esgoto 100mm", "barra", 89.0), ("Tubo PVC Soldável 25mm", "barra", 24.0),
+    ("Conexão PVC Joelho 25mm", "un", 1.8), ("Eletroduto Corrugado 3/4", "rolo", 65.0), ("Cabo Flexível 2,5mm", "rolo", 210.0),
+    ("Cabo Flexível 6mm", "rolo", 480.0), ("Caixa de Luz 4x2", "un", 2.5), ("Disjuntor 20A", "un", 18.0),
+    ("Impermeabilizante Asfáltico 18L", "balde", 260.0), ("Manta Asfáltica 3mm", "rolo", 310.0),
+    ("Telha Cerâmica Colonial", "milheiro", 1900.0), ("Calha Galvanizada", "m", 55.0), ("Madeira Caibro 5x6", "m", 12.0),
+    ("Gesso em Pó 40kg", "saco", 35.0), ("Porcelanato 60x60", "m²", 79.0), ("Piso Cerâmico 45x45", "m²", 39.0),
+    ("Rejunte Flexível 1kg", "kg", 9.0), ("Vaso Sanitário com Caixa Acoplada", "un", 520.0), ("Torneira Metal Cromada", "un", 95.0),
+    ("Porta de Madeira 80cm", "un", 380.0), ("Janela de Alumínio 120x100", "un", 690.0), ("Tinta Acrílica Fosca 18L", "lata", 320.0),
+    ("Massa Corrida 25kg", "saco", 48.0), ("Selador Acrílico 18L", "lata", 180.0), ("Lixa 120", "un", 1.5),
+    ("Tomada 10A", "un", 9.0), ("Luminária LED Plafon", "un", 42.0), ("Caixa d'Água 1000L", "un", 560.0),
+]
+VARIACOES = ["", " Votoran", " Tigre", " Amanco", " Quartzolit", " Gerdau", " Suvinil", " Coral", " Portobello", " Eliane",
+             " Deca", " Pial", " Premium", " Econômico", " Linha Pro"]
+FORNECEDORES = ["Casa do Construtor", "Depósito São José", "Materiais Boa Vista", "Leroy Merlin", "Telhanorte",
+                "Madeireira Ipê", "Elétrica Central", "Hidráulica Silva", "Ferragens Paulista", "Cerâmica Real",
+                "Vidraçaria Cristal", "Tintas Arco-Íris", "Areial Rio Grande", "Concreteira Forte", "Serralheria Aço Bom"]
+NOMES_OBRA = ["Residencial", "Casa", "Sobrado", "Edifício", "Reforma", "Galpão", "Condomínio"]
+SOBRENOMES = ["Silva", "Souza", "Oliveira", "Pereira", "Costa", "Rodrigues", "Almeida", "Nascimento", "Lima", "Araújo",
+              "Fernandes", "Carvalho", "Gomes", "Martins", "Rocha", "Ribeiro", "Barbosa", "Cardoso", "Teixeira", "Moreira"]
+RUAS = ["Rua das Flores", "Av. Brasil", "Rua XV de Novembro", "Rua São João", "Av. Paulista", "Rua do Comércio",
+        "Rua Sete de Setembro", "Av. das Palmeiras", "Rua Bela Vista", "Rua Santos Dumont"]
+
+
+def _inserir(repo, tabela, colunas, linhas):
+    sql = f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({','.join('?' * len(colunas))})"
+    with repo._transacao():
+        for i in range(0, len(linhas), BLOCO):
+            repo.conn.executemany(sql, linhas[i:i + BLOCO])
+
+
+def catalogo(n):
+    """n materiais: os da base e, se faltar, variações de marca/linha deles"""
+    itens = [(nome + var, un, round(preco * (1 + 0.07 * j), 2))
+             for j, var in enumerate(VARIACOES) for nome, un, preco in MATERIAIS_BASE]
+    k = 2
+    while len(itens) < n:
+        itens += [(f"{nome} Tipo {k}", un, round(preco * (0.9 + 0.02 * k), 2)) for nome, un, preco in MATERIAIS_BASE]
+        k += 1
+    return itens[:n]
+
+
+def gerar(caminho, n_obras=20, n_custos=50_000, n_materiais=600, semente=42, hoje=None):
+    """Cria (ou completa) o banco em `caminho`; devolve a contagem de linhas por tabela"""
+    if not 1 <= n_obras <= MAX_OBRAS: raise ValueError(f"obras deve estar entre 1 e {MAX_OBRAS}")
+    if not 0 <= n_custos <= MAX_CUSTOS: raise ValueError(f"custos deve estar entre 0 e {MAX_CUSTOS}")
+    rng = np.random.default_rng(semente)
+    hoje = hoje or date.today()
+    repo = RepositorioSQLite(caminho)
+
+    mats = catalogo(n_materiais)
+    _inserir(repo, "materiais", ["nome", "unidade", "preco_ref"], mats)
+    _inserir(repo, "fornecedores", ["nome", "telefone"],
+             [(f, f"(11) 9{rng.integers(1000, 9999)}-{rng.integers(1000, 9999)}") for f in FORNECEDORES])
+
+    # Obras: idade (dias desde o início) e avanço; as mais antigas tendem a estar concluídas
+    orc_total = sum(o for _, o, _ in TEMPLATE_ETAPAS)
+    idade = rng.integers(15, 720, n_obras)
+    avanco = np.clip(idade / rng.uniform(300, 600, n_obras), 0, 1)
+    concluida = avanco >= 1
+    orc_cliente = np.round(orc_total * rng.uniform(1.2, 1.7, n_obras), -2)
+    orc_pedreiro = np.round(orc_total * rng.uniform(0.3, 0.5, n_obras), -2)
+    obras = [(f"{rng.choice(NOMES_OBRA)} {rng.choice(SOBRENOMES)} {i + 1}", f"{rng.choice(RUAS)}, {rng.integers(10, 3000)}",
+              "Concluída" if concluida[i] else "Ativa", float(orc_pedreiro[i]), float(orc_cliente[i])) for i in range(n_obras)]
+    with repo.lock:
+        inicio_id = (repo.conn.execute("SELECT COALESCE(MAX(id), 0) FROM obras").fetchone()[0]) + 1
+    _inserir(repo, "obras", ["nome", "endereco", "status", "orcamento_pedreiro", "orcamento_cliente"], obras)
+    ids = np.arange(inicio_id, inicio_id + n_obras)
+
+    # Cronograma e checklist: etapas antes do avanço concluídas, a do avanço pela metade
+    crono, pontos = linhas_padrao()
+    n_etapas = len(crono)
+    linhas_crono, linhas_pontos = [], []
+    for i, id_obra in enumerate(ids):
+        feitas = avanco[i] * n_etapas
+        for j, c in enumerate(crono):
+            pct = 100 if j + 1 <= feitas else int((feitas - j) * 100) if j < feitas else 0
+            status = "Concluído" if pct == 100 else "Em Andamento" if pct else "Pendente"
+            linhas_crono.append((int(id_obra), c["etapa"], status, c["orcamento"], pct))
+        pcts = {c["etapa"]: l[4] for c, l in zip(crono, linhas_crono[-n_etapas:])}
+        linhas_pontos += [(int(id_obra), p["etapa_pai"], p["descricao"], "TRUE" if rng.random() * 100 < pcts[p["etapa_pai"]] else "FALSE")
+                          for p in pontos]
+    _inserir(repo, "cronograma", ["id_obra", "etapa", "status", "orcamento", "porcentagem"], linhas_crono)
+    _inserir(repo, "pontos_criticos", ["id_obra", "etapa_pai", "descricao", "feito"], linhas_pontos)
+    _inserir(repo, "tarefas", ["id_obra", "descricao", "responsavel", "status"],
+             [(int(o), f"Conferir {rng.choice(MATERIAIS_BASE)[0].lower()}", str(rng.choice(SOBRENOMES)),
+               "Concluída" if rng.random() < avanco[i] else "Pendente") for i, o in enumerate(ids) for _ in range(rng.integers(2, 12))])
+
+    # Custos: cauda longa por obra (lognormal), datas dentro da vida da obra; a etapa
+    # acompanha a data (começo da obra = primeiras etapas). ~8% pagamentos e ~4% entradas.
+    if n_custos:
+        peso = rng.lognormal(0, 1, n_obras) * (0.2 + avanco)
+        obra_de = rng.choice(n_obras, n_custos, p=peso / peso.sum())
+        frac = rng.random(n_custos) ** 0.8
+        dias_atras = (idade[obra_de] * (1 - frac)).astype(int)
+        datas = np.datetime64(hoje) - dias_atras.astype("timedelta64[D]")
+        etapa_idx = np.minimum((frac * avanco[obra_de] * n_etapas).astype(int), n_etapas - 1)
+        nomes_etapa = np.array([c["etapa"] for c in crono] + [ETAPA_MAO_DE_OBRA, ETAPA_ENTRADA_CLIENTE], dtype=object)
+        tipo = rng.random(n_custos)
+        etapa_idx = np.where(tipo < 0.08, n_etapas, np.where(tipo < 0.12, n_etapas + 1, etapa_idx))
+        mat_idx = rng.integers(0, len(mats), n_custos)
+        precos = np.array([m[2] for m in mats])[mat_idx] * rng.uniform(0.9, 1.15, n_custos)
+        qtd = np.maximum(1, np.round(rng.lognormal(1.5, 1, n_custos)))
+        pagamento = rng.choice([500, 1000, 1500, 2000, 3000, 5000], n_custos).astype(float)
+        material = etapa_idx < n_etapas
+        valor = np.round(np.where(material, precos, pagamento), 2)
+        qtd = np.where(material, qtd, 1)
+        forn = rng.integers(0, len(FORNECEDORES), n_custos)
+        nomes_mat = [m[0] for m in mats]
+        unidades = [m[1] for m in mats]
+        datas_txt = datas.astype(str)
+        linhas = [(int(ids[obra_de[k]]), datas_txt[k],
+                   nomes_mat[mat_idx[k]] if material[k] else ("Saída (Pedreiro)" if etapa_idx[k] == n_etapas else "Entrada (Cliente)"),
+                   float(qtd[k]), unidades[mat_idx[k]] if material[k] else "un", float(valor[k]), round(float(valor[k] * qtd[k]), 2),
+                   "Material" if material[k] else None, nomes_etapa[etapa_idx[k]], FORNECEDORES[forn[k]] if material[k] else None)
+                  for k in range(n_custos)]
+        _inserir(repo, "custos", ["id_obra", "data", "descricao", "qtd", "unidade", "valor", "total", "classe", "etapa", "fornecedor"], linhas)
+
+    with repo.lock:
+        return {t: repo.conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                for t in ("obras", "custos", "cronograma", "pontos_criticos", "tarefas", "materiais", "fornecedores")}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Gera dados sintéticos de obras num banco SQLite")
+    ap.add_argument("banco")
+    ap.add_argument("--obras", type=int, default=20)
+    ap.add_argument("--custos", type=int, default=50_000)
+    ap.add_argument("--materiais", type=int, default=600)
+    ap.add_argument("--semente", type=int, default=42)
+    ap.add_argument("--substituir", action="store_true", help="apaga o banco antes de gerar")
+    args = ap.parse_args()
+    if args.substituir:
+        for sufixo in ("", "-wal", "-shm"):
+            if os.path.exists(args.banco + sufixo): os.remove(args.banco + sufixo)
+    t0 = time.perf_counter()
+    contagem = gerar(args.banco, args.obras, args.custos, args.materiais, args.semente)
+    print(f"{args.banco}: " + ", ".join(f"{n} {t}" for t, n in contagem.items()) + f" em {time.perf_counter() - t0:.1f}s")
@@ -0,0 +1,170 @@
+"""Importa os bancos SQLite antigos (gestao_obras_v*.db, dados_obra.db) para o banco atual.
+
+Uso:
+    python importar_legado.py gestao_obras_v16.db gestao_obras_v15.db ...
+    python importar_legado.py --todos
+
+O banco de destino é o mesmo do app (seção [armazenamento] do .streamlit/secrets.toml).
+As linhas são lidas em blocos pela ordem do rowid e gravadas em lote; o progresso fica em
+importacao_legado.json, então rodar de novo continua de onde parou. Os PDFs guardados
+dentro da tabela obras vão para arquivos em anexos/obra_<id>/.
+Datas no formato antigo (DD/MM/AAAA, das versões v6 a v8) são gravadas como AAAA-MM-DD.
+Cada arquivo é importado como está: as versões vN costumam repetir o histórico da anterior,
+então para uma mesma obra importe só o arquivo mais recente.
+"""
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import time
+import tomllib
+from datetime import datetime
+
+from armazenamento import abrir_repositorio
+
+BLOCO = 2000
+ARQ_PROGRESSO = "importacao_legado.json"
+PASTA_ANEXOS = "anexos"
+
+# Coluna antiga -> coluna atual (as que não aparecem aqui, como dias_estimados, são descartadas)
+MAPA_COLUNAS = {
+    "custos": {"data": "data", "item": "descricao", "qtd": "qtd", "unidade": "unidade", "valor_un": "valor",
+               "total": "total", "classe": "classe", "etapa": "etapa"},
+    "cronograma": {"etapa": "etapa", "status": "status", "porcentagem": "porcentagem"},
+}
+
+
+def colunas(conn, tabela):
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({tabela})")]
+
+
+def data_iso(valor):
+    """AAAA-MM-DD a partir da data antiga (DD/MM/AAAA ou já ISO); None se não for uma data"""
+    texto = str(valor or "").strip()
+    for formato in ("%Y-%m-%d", "%d/%m/%Y"):
+        try: return datetime.strptime(texto[:10], formato).strftime("%Y-%m-%d")
+        except ValueError: pass
+    return None
+
+
+def normalizar_status(status):
+    return {"ATIVA": "Ativa", "CONCLUIDA": "Concluída", "CONCLUÍDA": "Concluída"}.get(str(status).upper(), status or "Ativa")
+
+
+class Importador:
+    def __init__(self, repo, progresso=ARQ_PROGRESSO, anexos=PASTA_ANEXOS):
+        self.repo = repo
+        self.arq_progresso = progresso
+        self.anexos = anexos
+        self.progresso = json.load(open(progresso, encoding="utf-8")) if os.path.exists(progresso) else {}
+        self.obras = {o["nome"]: o["id"] for o in repo.selecionar("obras")}
+
+    def _salvar_progresso(self):
+        tmp = self.arq_progresso + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f: json.dump(self.progresso, f, indent=1)
+        os.replace(tmp, self.arq_progresso)
+
+    def id_obra(self, nome, status=None):
+        """id da obra no destino, criando-a se ainda não existir"""
+        if nome not in self.obras:
+            nova = self.repo.inserir("obras", [{"nome": nome, "status": normalizar_status(status)}])[0]
+            self.obras[nome] = nova["id"]
+        return self.obras[nome]
+
+    def importar_obras(self, conn, arquivo):
+        if "obras" not in {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}:
+            return
+        cols = colunas(conn, "obras")
+        tem_status, tem_pdf = "status" in cols, "pdf_blob" in cols
+        sql = f"SELECT rowid, nome{', status' if tem_status else ''}{', pdf_nome' if tem_pdf else ''} FROM obras ORDER BY rowid"
+        for r in conn.execute(sql).fetchall():
+            id_obra = self.id_obra(r[1], r[2] if tem_status else None)
+            if tem_pdf: self._extrair_pdf(conn, r[0], id_obra, r[-1])
+
+    def _extrair_pdf(self, conn, rowid, id_obra, pdf_nome):
+        """Copia o PDF da linha para um arquivo, em pedaços, sem carregar o blob inteiro"""
+        if conn.execute("SELECT pdf_blob IS NULL FROM obras WHERE rowid = ?", (rowid,)).fetchone()[0]:
+            return
+        pasta = os.path.join(self.anexos, f"obra_{id_obra}")
+        destino = os.path.join(pasta, os.path.basename(pdf_nome or f"projeto_{rowid}.pdf"))
+        if os.path.exists(destino): return
+        os.makedirs(pasta, exist_ok=True)
+        with conn.blobopen("obras", "pdf_blob", rowid, readonly=True) as blob, open(destino + ".tmp", "wb") as f:
+            while pedaco := blob.read(1 << 16):
+                f.write(pedaco)
+        os.replace(destino + ".tmp", destino)
+        print(f"  📎 {destino}")
+
+    def importar_tabela(self, conn, arquivo, tabela, obra_padrao):
+        cols = colunas(conn, tabela)
+        if not cols: return 0
+        mapa = {velha: nova for velha, nova in MAPA_COLUNAS[tabela].items() if velha in cols}
+        tem_obra = "obra_nome" in cols
+        chave = f"{os.path.basename(arquivo)}:{tabela}"
+        ultimo = self.progresso.get(chave, 0)
+        sql = (f"SELECT rowid{', obra_nome' if tem_obra else ''}, {', '.join(mapa)} FROM {tabela} "
+               f"WHERE rowid > ? ORDER BY rowid LIMIT ?")
+        total, sem_data, inicio = 0, 0, time.perf_counter()
+        while True:
+            bloco = conn.execute(sql, (ultimo, BLOCO)).fetchall()
+            if not bloco: break
+            linhas = []
+            for r in bloco:
+                valores = list(r[2:] if tem_obra else r[1:])
+                linha = {nova: v for nova, v in zip(mapa.values(), valores)}
+                linha["id_obra"] = self.id_obra(r[1] if tem_obra and r[1] else obra_padrao)
+                if "data" in linha:
+                    iso = data_iso(linha["data"])
+                    if iso is None and linha["data"]: sem_data += 1
+                    linha["data"] = iso
+                # Chave determinística: reimportar o mesmo bloco (parada entre o insert e o
+                # progresso gravado) não duplica linhas
+                linha["chave_idem"] = f"legado:{chave}:{r[0]}"
+                linhas.append(linha)
+            self.repo.inserir_idempotente(tabela, linhas)
+            ultimo = bloco[-1][0]
+            self.progresso[chave] = ultimo
+            self._salvar_progresso()
+            total += len(bloco)
+            print(f"  {tabela}: {total} linhas ({total / (time.perf_counter() - inicio):,.0f} linhas/s)")
+        if sem_data: print(f"  ⚠️ {tabela}: {sem_data} linha(s) com data não reconhecida, gravadas sem data")
+        return total
+
+    def importar(self, arquivo):
+        print(f"📂 {arquivo}")
+        inicio = time.perf_counter()
+        conn = sqlite3.connect(f"file:{arquivo}?mode=ro", uri=True)
+        try:
+            obra_padrao = os.path.splitext(os.path.basename(arquivo))[0]  # bancos sem tabela de obras
+            self.importar_obras(conn, arquivo)
+            n = sum(self.importar_tabela(conn, arquivo, t, obra_padrao) for t in MAPA_COLUNAS)
+        finally:
+            conn.close()
+        seg = time.perf_counter() - inicio
+        print(f"✅ {arquivo}: {n} linhas em {seg:.1f}s ({n / seg if seg else 0:,.0f} linhas/s)")
+        return n
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("arquivos", nargs="*")
+    p.add_argument("--todos", action="store_true", help="importa gestao_obras_v*.db e dados_obra.db da pasta atual")
+    p.add_argument("--secrets", default=os.path.join(".streamlit", "secrets.toml"))
+    args = p.parse_args()
+
+    arquivos = args.arquivos or []
+    if args.todos:
+        arquivos += sorted(glob.glob("gestao_obras_v*.db")) + glob.glob("dados_obra.db")
+    if not arquivos: p.error("informe os arquivos ou --todos")
+
+    with open(args.secrets, "rb") as f:
+        repo = abrir_repositorio(tomllib.load(f))
+    imp = Importador(repo)
+    inicio = time.perf_counter()
+    total = sum(imp.importar(a) for a in arquivos)
+    print(f"🏁 {total} linhas importadas em {time.perf_counter() - inicio:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
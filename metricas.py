@@ -0,0 +1,111 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# --- MÉTRICAS DE DESEMPENHO ---
+# Cada chamada ao banco (RepositorioMedido), fase de carga e execução do script vira um
+# registro {ts, tipo, nome, tabela, linhas, bytes, ms, erro}. Os últimos MAX_REGISTROS ficam
+# em memória para a aba Performance; com um arquivo configurado, também vão para ele em
+# JSON lines, para comparar versões em produção. O pandas só é importado ao montar as tabelas,
+# para o app poder medir a partida antes de carregá-lo (partida.py).
+MAX_REGISTROS = 20000
+AMOSTRA_LINHAS = 32  # linhas serializadas para estimar o tamanho de uma lista maior
+
+
+class Metricas:
+    def __init__(self, arquivo=None):
+        self.registros = deque(maxlen=MAX_REGISTROS)
+        self.lock = threading.Lock()
+        self.arquivo = open(arquivo, "a", encoding="utf-8", buffering=1) if arquivo else None
+
+    def registrar(self, tipo, nome, ms, tabela=None, linhas=None, bytes=None, erro=None):
+        reg = {"ts": time.time(), "tipo": tipo, "nome": nome, "tabela": tabela, "linhas": linhas,
+               "bytes": bytes, "ms": round(ms, 3), "erro": erro}
+        with self.lock:
+            self.registros.append(reg)
+            if self.arquivo: self.arquivo.write(json.dumps(reg, ensure_ascii=False) + "\n")
+
+    @contextmanager
+    def medir(self, tipo, nome, **campos):
+        """with metricas.medir("fase", "carregar_tudo"): ..."""
+        inicio, erro = time.perf_counter(), None
+        try:
+            yield
+        except Exception as e:
+            erro = repr(e)
+            raise
+        finally:
+            self.registrar(tipo, nome, (time.perf_counter() - inicio) * 1000, erro=erro, **campos)
+
+    def frame(self):
+        import pandas as pd
+        with self.lock:
+            return pd.DataFrame(list(self.registros), columns=["ts", "tipo", "nome", "tabela", "linhas", "bytes", "ms", "erro"])
+
+    def resumo(self):
+        """p50/p95 por tipo, operação e tabela"""
+        import pandas as pd
+        df = self.frame()
+        if df.empty: return df
+        df["tabela"] = df["tabela"].fillna("-")
+        g = df.groupby(["tipo", "nome", "tabela"])
+        res = pd.DataFrame({"chamadas": g.size(), "p50_ms": g["ms"].median(), "p95_ms": g["ms"].quantile(0.95),
+                            "max_ms": g["ms"].max(), "linhas_media": g["linhas"].mean(), "kb_total": g["bytes"].sum() / 1024,
+                            "erros": g["erro"].count()})
+        return res.reset_index().sort_values("p95_ms", ascending=False)
+
+    def para_jsonl(self):
+        with self.lock:
+            return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in self.registros)
+
+    def limpar(self):
+        with self.lock: self.registros.clear()
+
+
+def _tamanho(dados):
+    """Bytes do JSON; listas longas são estimadas por uma amostra espaçada de AMOSTRA_LINHAS
+    linhas (serializar tudo só para medir dobraria o custo da chamada medida)"""
+    try:
+        if isinstance(dados, dict) and dados and all(isinstance(v, list) for v in dados.values()):
+            return sum(_tamanho(v) or 0 for v in dados.values())  # pacote {tabela: linhas}
+        if isinstance(dados, list) and len(dados) > AMOSTRA_LINHAS:
+            passo = len(dados) / AMOSTRA_LINHAS
+            amostra = json.dumps([dados[int(i * passo)] for i in range(AMOSTRA_LINHAS)], default=str)
+            return round(len(amostra) * len(dados) / AMOSTRA_LINHAS)
+        return len(json.dumps(dados, default=str))
+    except (TypeError, ValueError): return None
+
+
+class RepositorioMedido:
+    """Envolve um repositório (armazenamento.py) e registra cada chamada: tabela, operação,
+    linhas, bytes (JSON enviado/recebido, estimado por amostra nas listas longas) e latência, inclusive das que falham"""
+
+    def __init__(self, repo, metricas):
+        self.repo = repo
+        self.metricas = metricas
+
+    def __getattr__(self, nome):
+        metodo = getattr(self.repo, nome)
+        if not callable(metodo): return metodo
+
+        def medido(*args, **kwargs):
+            tabela = args[0] if args and isinstance(args[0], str) else kwargs.get("tabela")
+            inicio, erro, res = time.perf_counter(), None, None
+            try:
+                res = metodo(*args, **kwargs)
+                return res
+            except Exception as e:
+                erro = repr(e)
+                raise
+            finally:
+                ms = (time.perf_counter() - inicio) * 1000
+                # Leituras: o que voltou; escritas: as linhas enviadas; pacotes: {tabela: linhas}
+                enviados = next((a for a in args[1:] if isinstance(a, list)), None)
+                pacote = isinstance(res, dict) and all(isinstance(v, list) for v in res.values())
+                dados = res if isinstance(res, list) or pacote else enviados
+                self.metricas.registrar("banco", nome, ms, tabela=tabela, erro=erro,
+                                        linhas=sum(map(len, res.values())) if pacote else len(dados) if isinstance(dados, list) else None,
+                                        bytes=_tamanho(dados) if dados is not None else None)
+        return medido
@@ -0,0 +1,242 @@
+import json
+
+from armazenamento import STATUS_ARQUIVADA
+from busca import normalizar
+
+# --- PADRÕES CONSTRUTIVOS VERSIONADOS ---
+# Cada padrão (nome) tem versões guardadas na tabela modelos do banco, uma linha por versão
+# com as etapas em JSON. As versões escritas aqui (VERSOES_EMBUTIDAS) são publicadas na
+# primeira partida que não as encontrar no banco; uma versão nova entra acrescentando-a
+# na lista. Etapas e itens do checklist têm uma chave estável: é por ela que a versão nova
+# reconhece, nas obras já criadas, a etapa ou o item que só mudou de nome.
+#   etapas = [{"chave", "etapa", "orcamento", "itens": [{"chave", "descricao"}]}]
+
+# Planilha original (com a numeração repetida "3." e "4." e os nomes como estavam)
+_PADRAO_V1 = [
+    ("preliminares", "1. Planejamento e Preliminares", 5000.0, [
+        "Projetos e Aprovações", "Limpeza do Terreno", "Ligação Provisória (Água/Luz)", "Barracão e Tapumes"
+    ]),
+    ("infraestrutura", "2. Infraestrutura (Fundação)", 15000.0, [
+        "Gabarito e Marcação", "Escavação", "Concretagem Sapatas/Estacas", "Vigas Baldrame",
+        "Impermeabilização", "Passagem de tubulação de esgoto", "Passagem de tubulação de alimentação de energia"
+    ]),
+    ("estrutura", "3. Supraestrutura (Estrutura)", 25000.0, [
+        "Pilares", "Vigas", "Lajes", "Escadas"
+    ]),
+    ("supra_alvenaria", "3. Supraestrutura e Alvenaria", 20000.0, [
+        "Marcação dasParedes", "Locação Caixinhas (conferencia de altura e alinhamento)",
+        "Conferencia dos pontos hidráulicos e esgoto (altura dos mesmos)", "Impermeabilização das 3 fiadas",
+        "Embuço", "Impermeabilização dos Banheiros"
+    ]),
+    ("alvenaria", "4. Alvenaria e Vedação", 12000.0, [
+        "Levantamento de Paredes", "Vergas e Contravergas", "Chapisco e Emboço"
+    ]),
+    ("cobertura", "4. Cobertura", 10000.0, [
+        "Montagem da Lage", "Passagem e Conferencia dos Conduites", "Estrutura Telhado", "Telhamento", "Calhas e Rufos"
+    ]),
+    ("conferencia_instalacoes", "5. Instalações", 10000.0, [
+        "Conferir medidas de saida de esgoto do vaso", "Ralo dentro e fora do boxe",
+        "Conferir medida do desnível para o chuveiro", "Conferir novamente pontos de esgoto e aguá das pias(alturas)"
+    ]),
+    ("instalacoes", "6. Instalações", 15000.0, [
+        "Tubulação Água/Esgoto", "Eletrodutos e Caixinhas", "Fiação e Cabos", "Tubulação Gás/Ar"
+    ]),
+    ("acabamentos", "7. Acabamentos", 30000.0, [
+        "Contrapiso", "Reboco/Gesso", "Revestimentos (Piso/Parede)", "Louças e Metais",
+        "Esquadrias (Portas/Janelas)", "Conferir alinhamento dos pisos",
+        "Conferir alinhamento dos pisos nas varandas em todos os cantos", "Conferir largura do desnível dos banheiros"
+    ]),
+    ("area_externa", "8. Área Externa e Finalização", 5000.0, [
+        "Muros e Calçadas", "Pintura Interna/Externa", "Elétrica Final (Tomadas/Luz)", "Limpeza Pós-Obra"
+    ])
+]
+
+# Versão simplificada (etapa | sub-etapa, sem orçamento) usada pelo app_cloud.py
+_SIMPLES_V1 = [
+    ("preliminares", "1. Planejamento e Preliminares", 0.0, [
+        "Projetos e Aprovações", "Limpeza do Terreno", "Ligação Provisória (Água/Luz)", "Barracão e Tapumes"
+    ]),
+    ("infraestrutura", "2. Infraestrutura (Fundação)", 0.0, [
+        "Gabarito e Marcação", "Escavação", "Concretagem Sapatas/Estacas", "Vigas Baldrame", "Impermeabilização",
+        "Passagem de tubulação de esgoto", "Passagem de tubulação de alimentação de energia"
+    ]),
+    ("estrutura", "3. Supraestrutura (Estrutura)", 0.0, ["Pilares", "Vigas", "Lajes", "Escadas"]),
+    ("supra_alvenaria", "3. Supraestrutura e Alvenaria", 0.0, [
+        "Marcação das Paredes", "Levantamento de Paredes", "Impermeabilização das 3 fiadas", "Locação Caixinhas"
+    ]),
+    ("alvenaria", "4. Alvenaria e Vedação", 0.0, ["Vergas e Contravergas", "Chapisco e Emboço"]),
+    ("cobertura", "5. Cobertura", 0.0, ["Estrutura Telhado", "Telhamento"]),
+    ("instalacoes", "6. Instalações", 0.0, ["Tubulação Água/Esgoto"]),
+    ("acabamentos", "7. Acabamentos", 0.0, ["Revestimentos (Piso/Parede)"]),
+    ("area_externa", "8. Área Externa e Finalização", 0.0, ["Pintura Interna/Externa"])
+]
+
+
+def _versao(etapas):
+    """Forma guardada no banco; a chave do item é o texto normalizado da versão em que entrou"""
+    return [{"chave": c, "etapa": e, "orcamento": float(o),
+             "itens": [{"chave": normalizar(i), "descricao": i} for i in itens]}
+            for c, e, o, itens in etapas]
+
+
+def _renomear(etapas, nomes=None, itens=None):
+    """Mesma versão com etapas ({chave: nome}) e itens ({chave: texto}) renomeados"""
+    nomes, itens = nomes or {}, itens or {}
+    return [{**e, "etapa": nomes.get(e["chave"], e["etapa"]),
+             "itens": [{**i, "descricao": itens.get(i["chave"], i["descricao"])} for i in e["itens"]]} for e in etapas]
+
+
+# v2: numeração corrigida (sem etapas com o mesmo número) e erros de digitação dos itens
+_PADRAO_V2 = _renomear(_versao(_PADRAO_V1), {
+    "supra_alvenaria": "4. Supraestrutura e Alvenaria", "alvenaria": "5. Alvenaria e Vedação", "cobertura": "6. Cobertura",
+    "conferencia_instalacoes": "7. Conferência das Instalações", "instalacoes": "8. Instalações",
+    "acabamentos": "9. Acabamentos", "area_externa": "10. Área Externa e Finalização",
+}, {
+    "marcacao dasparedes": "Marcação das Paredes", "montagem da lage": "Montagem da Laje",
+    "conferir novamente pontos de esgoto e agua das pias alturas": "Conferir novamente pontos de esgoto e água das pias (alturas)",
+})
+_SIMPLES_V2 = _renomear(_versao(_SIMPLES_V1), {
+    "supra_alvenaria": "4. Supraestrutura e Alvenaria", "alvenaria": "5. Alvenaria e Vedação", "cobertura": "6. Cobertura",
+    "instalacoes": "7. Instalações", "acabamentos": "8. Acabamentos", "area_externa": "9. Área Externa e Finalização",
+})
+
+VERSOES_EMBUTIDAS = {
+    "padrao": [_versao(_PADRAO_V1), _PADRAO_V2],
+    "simples": [_versao(_SIMPLES_V1), _SIMPLES_V2],
+}
+
+# Etapas (nome, orçamento, sub-etapas) da versão mais nova do padrão, para o gerador de dados
+# do benchmark (gerar_dados.py) montar obras com a mesma estrutura
+TEMPLATE_ETAPAS = [(e["etapa"], e["orcamento"], [i["descricao"] for i in e["itens"]]) for e in VERSOES_EMBUTIDAS["padrao"][-1]]
+
+
+# --- LINHAS DAS OBRAS ---
+# Como um padrão vira linhas no banco:
+#   checklist (app.py): uma linha de cronograma por etapa e os itens em pontos_criticos
+#   plano (app_cloud.py): uma linha de cronograma por item, "etapa | item"
+# NOMES são as colunas que identificam a linha na obra; PROGRESSO diz se ela já tem avanço
+# (essas nunca são apagadas numa reaplicação).
+NOMES = {"cronograma": ("etapa",), "pontos_criticos": ("etapa_pai", "descricao")}
+PROGRESSO = {"cronograma": lambda l: float(l.get("porcentagem") or 0) > 0,
+             "pontos_criticos": lambda l: l.get("feito") is True or str(l.get("feito")).upper() == "TRUE"}
+SEPARADOR_PLANO = " | "
+
+
+def linhas_modelo(etapas, formato="checklist"):
+    """{tabela: {chave: linha}} que o padrão cria numa obra (sem id_obra)"""
+    if formato == "plano":
+        return {"cronograma": {(e["chave"], i["chave"]): {"etapa": f"{e['etapa']}{SEPARADOR_PLANO}{i['descricao']}", "porcentagem": 0}
+                               for e in etapas for i in e["itens"]}}
+    return {"cronograma": {e["chave"]: {"etapa": e["etapa"], "status": "Pendente", "orcamento": float(e["orcamento"]), "porcentagem": 0}
+                           for e in etapas},
+            "pontos_criticos": {(e["chave"], i["chave"]): {"etapa_pai": e["etapa"], "descricao": i["descricao"], "feito": "FALSE"}
+                                for e in etapas for i in e["itens"]}}
+
+
+def linhas_padrao(etapas=None):
+    """Linhas de cronograma e checklist do padrão (sem id_obra); sem etapas, a versão embutida mais nova"""
+    linhas = linhas_modelo(etapas or VERSOES_EMBUTIDAS["padrao"][-1])
+    return list(linhas["cronograma"].values()), list(linhas["pontos_criticos"].values())
+
+
+def _etapa_da_linha(tabela, nome):
+    """Nome da etapa (o que os lançamentos de custo guardam) a partir das colunas NOMES da linha"""
+    return nome[0].split(SEPARADOR_PLANO)[0] if tabela == "cronograma" else None
+
+
+def plano_obra(id_obra, atuais, versoes, formato="checklist"):
+    """Diferença entre as linhas da obra (atuais = {tabela: [linhas]}) e a última das versões.
+
+    Cada linha é reconhecida pelo nome que teve em qualquer versão. Reconhecida e ainda no
+    padrão: só é renomeada, se mudou (porcentagem, feito e orçamento ficam). Fora do padrão:
+    sai se não tiver progresso. Criada à mão: não é tocada. O que falta no padrão entra.
+    Devolve {"inserir", "atualizar", "excluir": {tabela: ...}, "renomear": [...], "mantidas": n}."""
+    historico = {}
+    for etapas in versoes:  # a versão mais nova vence se dois nomes coincidirem
+        for tbl, linhas in linhas_modelo(etapas, formato).items():
+            for chave, l in linhas.items(): historico.setdefault(tbl, {})[tuple(l[c] for c in NOMES[tbl])] = chave
+    plano = {"inserir": {}, "atualizar": {}, "excluir": {}, "renomear": [], "mantidas": 0}
+    etapas_renomeadas = {}
+    for tbl, esperadas in linhas_modelo(versoes[-1], formato).items():
+        vistas = set()
+        for l in atuais.get(tbl, []):
+            nome = tuple(str(l[c]) for c in NOMES[tbl])
+            chave = historico.get(tbl, {}).get(nome)
+            if chave is None or chave in vistas: continue
+            vistas.add(chave)
+            if chave in esperadas:
+                novo = tuple(esperadas[chave][c] for c in NOMES[tbl])
+                if novo == nome: continue
+                plano["atualizar"].setdefault(tbl, []).append({"id": int(l["id"]), "id_obra": int(id_obra), **dict(zip(NOMES[tbl], novo))})
+                antes, depois = _etapa_da_linha(tbl, nome), _etapa_da_linha(tbl, novo)
+                if antes != depois: etapas_renomeadas[antes] = depois
+            elif PROGRESSO[tbl](l): plano["mantidas"] += 1
+            else: plano["excluir"].setdefault(tbl, []).append(int(l["id"]))
+        novas = [{"id_obra": int(id_obra), **l} for chave, l in esperadas.items() if chave not in vistas]
+        if novas: plano["inserir"][tbl] = novas
+    # Os lançamentos guardam o nome da etapa: acompanham a renomeação
+    plano["renomear"] = [{"id_obra": int(id_obra), "de": de, "para": para} for de, para in etapas_renomeadas.items()]
+    return plano
+
+
+def juntar_planos(planos):
+    """Um plano só para gravar numa ida ao banco (CacheTabelas.aplicar_lote)"""
+    total = {"inserir": {}, "atualizar": {}, "excluir": {}, "renomear": [], "mantidas": 0}
+    for p in planos:
+        for op in ("inserir", "atualizar", "excluir"):
+            for tbl, itens in p[op].items(): total[op].setdefault(tbl, []).extend(itens)
+        total["renomear"] += p["renomear"]
+        total["mantidas"] += p["mantidas"]
+    return total
+
+
+class Modelos:
+    """Padrões da tabela modelos, pela visão em cache (visao.visao_modelos, lida uma vez por
+    versão da partição). Sem nada no banco valem as VERSOES_EMBUTIDAS."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def versoes(self, nome):
+        """[{"versao", "etapas"}] do padrão, da mais antiga para a mais nova"""
+        no_banco = getattr(self.cache.visao("modelos"), "versoes", {}).get(nome)
+        return no_banco or [{"versao": n + 1, "etapas": e} for n, e in enumerate(VERSOES_EMBUTIDAS.get(nome, []))]
+
+    def atual(self, nome):
+        return self.versoes(nome)[-1]
+
+    def publicar(self, nome, etapas):
+        """Grava uma versão nova do padrão; devolve o número dela"""
+        no_banco = self.cache.visao("modelos").versoes.get(nome, [])
+        versao = (no_banco[-1]["versao"] if no_banco else 0) + 1
+        self.cache.inserir("modelos", {"nome": nome, "versao": versao, "etapas": json.dumps(etapas, ensure_ascii=False)})
+        return versao
+
+    def publicar_embutidas(self):
+        """Publica as VERSOES_EMBUTIDAS que o banco ainda não tem (na partida)"""
+        for nome, embutidas in VERSOES_EMBUTIDAS.items():
+            for etapas in embutidas[len(self.cache.visao("modelos").versoes.get(nome, [])):]:
+                self.publicar(nome, etapas)
+
+    def aplicar(self, nome, ids_obras, formato="checklist"):
+        """Leva as obras para a versão atual do padrão numa gravação só; devolve o resumo"""
+        versoes = [v["etapas"] for v in self.versoes(nome)]
+        tabelas = list(NOMES) if formato == "checklist" else ["cronograma"]
+        obras = self.cache.frame("obras")
+        arquivadas = set() if obras.empty else set(obras.loc[obras["status"].astype("string") == STATUS_ARQUIVADA, "id"])
+        ids_obras = [int(i) for i in ids_obras if int(i) not in arquivadas]  # as linhas delas estão no arquivo morto
+        if len(ids_obras) == 1:
+            atuais = {ids_obras[0]: {t: f.to_dict("records") for t, f in self.cache.carregar_obra(ids_obras[0]).items() if t in tabelas}}
+        else:
+            # Muitas obras: uma leitura de cada tabela só com as linhas delas, separada por obra aqui
+            atuais = {i: {t: [] for t in tabelas} for i in ids_obras}
+            for t in tabelas:
+                for l in self.cache.repo.selecionar(t, ids_obras) if ids_obras else []:
+                    if int(l["id_obra"]) in atuais: atuais[int(l["id_obra"])][t].append(l)
+        planos = {i: plano_obra(i, atuais[i], versoes, formato) for i in ids_obras}
+        mudaram = [i for i, p in planos.items() if p["inserir"] or p["atualizar"] or p["excluir"]]
+        plano = juntar_planos(planos[i] for i in mudaram)
+        if mudaram: self.cache.aplicar_lote(plano, mudaram, {r["id_obra"] for r in plano["renomear"]})
+        conta = lambda op: sum(map(len, plano[op].values()))
+        return {"obras": len(mudaram), "inserir": conta("inserir"), "atualizar": conta("atualizar"),
+                "excluir": conta("excluir"), "mantidas": plano["mantidas"]}
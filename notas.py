@@ -0,0 +1,115 @@
+import io
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+from busca import normalizar
+from planilhas import adivinhar_colunas, converter_precos, ler_blocos
+
+# --- LANÇAMENTO DE NOTA FISCAL ---
+# A nota entra inteira numa grade de itens (descrição, quantidade, unidade, valor unitário)
+# que compartilham data, fornecedor e etapa. Os itens são digitados, colados do Excel (ou
+# CSV) ou lidos do XML da NF-e; os que casam com o cadastro de materiais pelo nome
+# normalizado recebem a unidade e o preço de referência que faltarem. Ao salvar, a nota vai
+# toda para a fila de escrita (CacheTabelas.enfileirar): uma transação no diário local e um
+# insert com todas as linhas no envio.
+COLUNAS_NOTA = ["descricao", "qtd", "unidade", "valor"]
+# Coluna da grade -> começos de nome de coluna; valor antes de unidade para "Unitário" não virar unidade
+PALPITES_NOTA = {"descricao": ("descricao", "produto", "material", "item", "nome", "xprod"),
+                 "qtd": ("qtd", "qtde", "quant", "qcom"),
+                 "valor": ("valor unit", "vl unit", "vuncom", "unitario", "preco", "valor"),
+                 "unidade": ("unidade", "unid", "und", "un", "ucom")}
+
+
+def grade_vazia():
+    return pd.DataFrame({"descricao": pd.Series(dtype="string"), "qtd": pd.Series(dtype="float64"),
+                         "unidade": pd.Series(dtype="string"), "valor": pd.Series(dtype="float64")})
+
+
+def acrescentar(itens, descricao, qtd, unidade, valor):
+    """Grade com mais um item no fim"""
+    novo = pd.DataFrame({"descricao": [descricao], "qtd": [qtd], "unidade": [unidade], "valor": [valor]}).astype(grade_vazia().dtypes)
+    return pd.concat([itens, novo], ignore_index=True) if not itens.empty else novo
+
+
+def _tag(no):
+    return no.tag.rsplit("}", 1)[-1]  # sem o namespace do portal da NF-e
+
+
+def _texto(no, nome):
+    achado = None if no is None else next((e for e in no.iter() if _tag(e) == nome), None)
+    return achado.text.strip() if achado is not None and achado.text else None
+
+
+def ler_nfe(arquivo):
+    """(itens, cabeçalho) do XML da NF-e (nfeProc ou só NFe); cabeçalho = chave, número, fornecedor e data"""
+    inf = next((e for e in ET.parse(arquivo).getroot().iter() if _tag(e) == "infNFe"), None)
+    if inf is None: raise ValueError("o XML não é de uma NF-e (sem infNFe)")
+    ide = next((e for e in inf if _tag(e) == "ide"), None)
+    emit = next((e for e in inf if _tag(e) == "emit"), None)
+    itens = [{"descricao": _texto(d, "xProd"), "qtd": _texto(d, "qCom"), "unidade": _texto(d, "uCom"), "valor": _texto(d, "vUnCom")}
+             for d in inf if _tag(d) == "det"]
+    data = _texto(ide, "dhEmi") or _texto(ide, "dEmi")
+    cab = {"chave": (inf.get("Id") or "").removeprefix("NFe") or None, "numero": _texto(ide, "nNF"),
+           "fornecedor": _texto(emit, "xFant") or _texto(emit, "xNome"), "data": data[:10] if data else None}
+    return pd.DataFrame(itens, columns=COLUNAS_NOTA, dtype="string"), cab
+
+
+def ler_itens(arquivo, nome_arquivo):
+    """(itens, cabeçalho) de um XML de NF-e ou de uma planilha (CSV/Excel) com os itens da nota.
+    Planilha sem cabeçalho reconhecível é lida na ordem da grade: descrição, quantidade, unidade, valor."""
+    if nome_arquivo.lower().endswith(".xml"): itens, cab = ler_nfe(arquivo)
+    else:
+        df = pd.concat([b for b, _ in ler_blocos(arquivo, nome_arquivo)], ignore_index=True)
+        mapa = adivinhar_colunas(list(df.columns), PALPITES_NOTA)
+        if mapa["descricao"] is None:
+            primeira = [pd.NA if c.startswith("Unnamed:") else c for c in df.columns]  # células vazias do "cabeçalho"
+            df = pd.concat([pd.DataFrame([primeira], columns=df.columns, dtype="string"), df], ignore_index=True)
+            mapa = dict(zip(COLUNAS_NOTA, df.columns))
+        itens = pd.DataFrame({c: df[mapa[c]] if mapa.get(c) is not None else pd.NA for c in COLUNAS_NOTA}, index=df.index)
+        cab = {}
+    itens = itens.assign(descricao=itens["descricao"].astype("string").str.strip(), unidade=itens["unidade"].astype("string").str.strip(),
+                         qtd=converter_precos(itens["qtd"]).astype("float64"), valor=converter_precos(itens["valor"]).astype("float64"))
+    return itens[itens["descricao"].fillna("") != ""].reset_index(drop=True), cab
+
+
+def ler_texto(texto):
+    """Itens colados (linhas copiadas do Excel vêm separadas por tabulação)"""
+    return ler_itens(io.BytesIO(texto.encode("utf-8")), "colado.csv")
+
+
+def completar(itens, v_mat):
+    """Unidade e valor do cadastro (visão de materiais) nos itens que casam pelo nome e vieram sem eles"""
+    if itens.empty or not len(v_mat.busca): return itens
+    ids = itens["descricao"].map(lambda d: v_mat.busca.exato(d) if isinstance(d, str) else None)
+    valor = pd.to_numeric(itens["valor"], errors="coerce")
+    unidade = itens["unidade"].astype("string")
+    sem_valor = valor.isna() | (valor <= 0)
+    sem_unidade = unidade.isna() | (unidade.str.strip() == "")
+    return itens.assign(valor=valor.where(~sem_valor, ids.map(lambda i: v_mat.valor(i, "preco_ref")).astype("float64")),
+                        unidade=unidade.where(~sem_unidade, ids.map(lambda i: v_mat.valor(i, "unidade")).astype("string")))
+
+
+def linhas_nota(itens, id_obra, data, fornecedor, etapa, classe="Material", chave=None):
+    """Lançamentos (custos) dos itens preenchidos; sem quantidade vale 1.
+    Com a chave da NF-e cada item leva uma chave_idem própria: lançar o mesmo XML de novo não duplica."""
+    linhas, vistos = [], {}
+    for l in itens.to_dict("records"):
+        desc = str(l["descricao"]).strip() if pd.notna(l["descricao"]) else ""
+        if not desc: continue
+        qtd = float(l["qtd"]) if pd.notna(l["qtd"]) else 1.0
+        valor = float(l["valor"]) if pd.notna(l["valor"]) else 0.0
+        linha = {"id_obra": int(id_obra), "data": str(data), "descricao": desc, "qtd": qtd,
+                 "unidade": str(l["unidade"]) if pd.notna(l["unidade"]) and str(l["unidade"]).strip() else "un",
+                 "valor": valor, "total": round(qtd * valor, 2), "classe": classe, "etapa": etapa, "fornecedor": fornecedor}
+        if chave:
+            n = vistos[normalizar(desc)] = vistos.get(normalizar(desc), 0) + 1  # itens repetidos na mesma nota
+            linha["chave_idem"] = f"nfe-{chave}-{normalizar(desc)}-{n}"
+        linhas.append(linha)
+    return linhas
+
+
+def nota_lancada(custos, chave):
+    """A NF-e com essa chave já tem itens nos custos da obra?"""
+    if not chave or custos.empty or "chave_idem" not in custos.columns: return False
+    return bool(custos["chave_idem"].astype("string").str.startswith(f"nfe-{chave}-").fillna(False).any())
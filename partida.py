@@ -0,0 +1,182 @@
+"""Partida rápida do app: a tela de login sai só com o Streamlit carregado.
+
+Na primeira execução do processo (inclusive quando o Streamlit Cloud acorda o contêiner),
+o app começa um Aquecimento numa thread e desenha o login na hora; enquanto a senha é
+digitada, a thread importa pandas/pyarrow/supabase, abre a conexão, monta o cache e faz a
+primeira carga das tabelas globais. Depois do login o app só pega o resultado pronto.
+
+Os tempos vão para a aba Performance (tipo "partida"). Para acompanhar o orçamento fora do
+app, em processos novos a cada medida:
+    python partida.py                       # app.py, 5 partidas
+    python partida.py --app app_cloud.py --vezes 10 --saida partida.json
+Sai com código 1 se a mediana passar de ORCAMENTO_LOGIN_MS ou ORCAMENTO_PRONTO_MS.
+"""
+import threading
+import time
+
+# Orçamento (ms) da primeira execução do script num processo novo até a tela de login, e da
+# execução do "Entrar" (DIGITACAO_S depois) até a página da obra desenhada
+ORCAMENTO_LOGIN_MS = 250
+ORCAMENTO_PRONTO_MS = 2500
+DIGITACAO_S = 3  # tempo típico para digitar a senha, em que o aquecimento trabalha
+PESADOS = ["pandas", "numpy", "pyarrow", "supabase", "duckdb", "openpyxl"]
+
+
+class Aquecimento:
+    """Roda preparar(*args) numa thread; resultado() espera e devolve (ou levanta o erro)"""
+
+    def __init__(self, preparar, *args):
+        self.inicio = time.perf_counter()
+        self.ms = None
+        self._resultado = self._erro = None
+        self._pronto = threading.Event()
+        threading.Thread(target=self._rodar, args=(preparar, *args), name="aquecimento", daemon=True).start()
+
+    def _rodar(self, preparar, *args):
+        try: self._resultado = preparar(*args)
+        except Exception as e: self._erro = e
+        finally:
+            self.ms = (time.perf_counter() - self.inicio) * 1000
+            self._pronto.set()
+
+    def pronto(self):
+        return self._pronto.is_set()
+
+    def resultado(self):
+        self._pronto.wait()
+        if self._erro is not None: raise self._erro
+        return self._resultado
+
+
+def montar(segredos, metricas, globais, por_obra):
+    """Roda na thread de aquecimento (sem st.*): conexão, cache com fila e vigia, carteira,
+    primeira carga das tabelas globais e os imports da primeira página.
+    Devolve (repo, cache, carteira, modelos, arquivo)."""
+    with metricas.medir("partida", "imports"):
+        from armazenamento import abrir_repositorio
+        from arquivo_morto import ArquivoMorto
+        from carteira import CarteiraObras
+        from dados import CacheTabelas
+        from fila import FilaEscrita
+        from metricas import RepositorioMedido
+        from modelos import Modelos
+        from vigia import Vigia
+    opcoes = segredos.get("armazenamento", {})
+    with metricas.medir("partida", "conexao"):
+        repo = RepositorioMedido(abrir_repositorio(segredos), metricas)
+    cache = CacheTabelas(repo, globais, por_obra, ttl=2)
+    # Lançamentos de custo vão para o diário local e são enviados em segundo plano
+    fila = FilaEscrita(repo, opcoes.get("fila", "fila_escrita.db"))
+    cache.usar_fila(fila)
+    # Uma thread traz as mudanças de outros usuários para todas as sessões (vigia.py)
+    vigia = Vigia(cache)
+    # Obras concluídas arquivadas em Parquet (arquivo_morto.py), lidas só quando abertas
+    arquivo = ArquivoMorto(repo, cache)
+    # Cópia colunar de todas as obras (com as arquivadas) para os painéis da carteira (carteira.py)
+    carteira = CarteiraObras(repo, opcoes.get("carteira", "carteira"), arquivo)
+    with metricas.medir("partida", "primeira_carga"):
+        cache.sincronizar()
+    # Padrões construtivos: as versões novas escritas no código entram no banco na primeira partida
+    modelos = Modelos(cache)
+    try: modelos.publicar_embutidas()
+    except Exception: pass  # sem a tabela modelos (supabase_funcoes.sql) valem as embutidas
+    # O resto da primeira página: cópia da carteira, gráficos (altair) e a importação de planilhas e notas
+    with metricas.medir("partida", "carteira"):
+        carteira.atualizar()
+    with metricas.medir("partida", "imports_pagina"):
+        import altair
+        import notas
+        import planilhas
+    # As threads só começam com tudo pronto: se algo acima falhar o app monta de novo na próxima
+    # execução, e threads de uma montagem abandonada continuariam rodando (e se somando)
+    fila.iniciar()
+    vigia.iniciar()
+    if opcoes.get("realtime") and opcoes.get("tipo", "supabase") == "supabase":
+        vigia.ouvir_realtime(segredos["supabase"]["url"], segredos["supabase"]["key"])
+    carteira.iniciar()  # daqui em diante a cópia é atualizada numa thread; as telas só leem
+    return repo, cache, carteira, modelos, arquivo
+
+
+# --- MEDIÇÃO FORA DO APP ---
+def _medir_uma(app, url, pasta, digitacao):
+    """Uma partida neste processo (que deve ser novo): login, digitacao segundos para a senha e a
+    primeira página depois do Entrar. Os tempos são os que o próprio app registra nas métricas."""
+    import json
+    import os
+    import sys
+    from streamlit import config, logger
+    from streamlit.testing.v1 import AppTest
+    config.set_option("logger.level", "error"); logger.set_log_level("error")
+    arquivo = os.path.join(pasta, "metricas.jsonl")
+    at = AppTest.from_file(app, default_timeout=120)
+    at.secrets["acesso"] = {"senha_admin": "partida"}
+    at.secrets["supabase"] = {"url": url, "key": "aaa.bbb.ccc"}
+    at.secrets["armazenamento"] = {"tipo": "supabase", "fila": os.path.join(pasta, "fila.db"),
+                                   "carteira": os.path.join(pasta, "carteira"), "metricas": arquivo}
+    at.run()
+    # O que a thread de aquecimento já trouxe enquanto o login era desenhado
+    carregados = [m for m in PESADOS if m in sys.modules]
+    time.sleep(digitacao)
+    at.session_state["password_correct"] = True
+    at.run()
+    regs = [json.loads(l) for l in open(arquivo, encoding="utf-8")]
+    ms = lambda tipo, nome: next((r["ms"] for r in regs if r["tipo"] == tipo and r["nome"] == nome), None)
+    return {"login_ms": ms("partida", "tela_login"), "pronto_ms": ms("execucao", "script"),
+            "aquecimento": {r["nome"]: r["ms"] for r in regs if r["tipo"] == "partida" and r["nome"] != "tela_login"},
+            "pesados_no_login": carregados, "erros": [str(e.value) for e in at.exception]}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import os
+    import shutil
+    import statistics
+    import subprocess
+    import sys
+    import tempfile
+
+    ap = argparse.ArgumentParser(description="Mede a partida do app em processos novos")
+    ap.add_argument("--app", default="app.py")
+    ap.add_argument("--vezes", type=int, default=5)
+    ap.add_argument("--obras", type=int, default=20)
+    ap.add_argument("--custos", type=int, default=50_000)
+    ap.add_argument("--digitacao", type=float, default=DIGITACAO_S, help="segundos entre o login aparecer e o Entrar")
+    ap.add_argument("--saida", help="grava as medidas em JSON")
+    ap.add_argument("--uma", nargs=4, metavar=("APP", "URL", "PASTA", "DIGITACAO"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.uma:
+        app, url, sessao, digitacao = args.uma
+        print(json.dumps(_medir_uma(app, url, sessao, float(digitacao))))
+        sys.exit(0)
+
+    from gerar_dados import gerar
+    from servidor_falso import ServidorFalso
+
+    aqui = os.path.dirname(os.path.abspath(__file__))
+    app = os.path.abspath(args.app if os.path.exists(args.app) else os.path.join(aqui, args.app))
+    pasta = tempfile.mkdtemp(prefix="partida_")
+    medidas = []
+    try:
+        gerar(os.path.join(pasta, "partida.db"), args.obras, args.custos)
+        with ServidorFalso(os.path.join(pasta, "partida.db")) as srv:
+            for i in range(args.vezes):
+                sessao = os.path.join(pasta, f"p{i}")
+                os.makedirs(sessao)
+                saida = subprocess.run([sys.executable, os.path.abspath(__file__), "--uma", app, srv.url, sessao, str(args.digitacao)],
+                                       capture_output=True, text=True, cwd=aqui, check=True).stdout
+                medidas.append(json.loads(saida.strip().splitlines()[-1]))
+                m = medidas[-1]
+                print(f"partida {i + 1}: login {m['login_ms']:.0f} ms · pronto {m['pronto_ms']:.0f} ms · aquecimento "
+                      + ", ".join(f"{k} {v:.0f}" for k, v in m["aquecimento"].items())
+                      + (f"  ERRO: {m['erros'][0][:80]}" if m["erros"] else ""))
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    login = statistics.median(m["login_ms"] for m in medidas)
+    pronto = statistics.median(m["pronto_ms"] for m in medidas)
+    print(f"\nmediana: login {login:.0f} ms (orçamento {ORCAMENTO_LOGIN_MS}) · pronto {pronto:.0f} ms (orçamento {ORCAMENTO_PRONTO_MS})")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f: json.dump(medidas, f, indent=1, ensure_ascii=False)
+    sys.exit(1 if login > ORCAMENTO_LOGIN_MS or pronto > ORCAMENTO_PRONTO_MS or any(m["erros"] for m in medidas) else 0)
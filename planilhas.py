@@ -0,0 +1,148 @@
+import codecs
+import csv
+import io
+import time
+
+import pandas as pd
+
+from busca import normalizar
+from esquema import para_banco
+
+# --- IMPORTAÇÃO DE TABELAS DE PREÇO ---
+# A planilha do fornecedor é lida em blocos (CSV pelo chunksize do pandas, XLSX pelo modo
+# read_only do openpyxl), então a memória não cresce com o tamanho do arquivo. Cada bloco é
+# casado com o cadastro pelo nome normalizado (sem acento/caixa/pontuação): quem já existe
+# tem unidade e preço atualizados num upsert, o resto entra num insert em lote.
+BLOCO_LINHAS = 5000
+# Campo do cadastro -> começos de nome de coluna que costumam trazê-lo
+PALPITES = {"nome": ("nome", "descricao", "produto", "material", "item"),
+            "unidade": ("unidade", "unid", "und", "un"),
+            "preco_ref": ("preco", "valor", "custo")}
+
+
+def _eh_xlsx(nome_arquivo):
+    return nome_arquivo.lower().endswith((".xlsx", ".xlsm"))
+
+
+def _formato_csv(arquivo):
+    """(encoding, separador) olhando o começo do arquivo"""
+    inicio = arquivo.read(64 * 1024)
+    arquivo.seek(0)
+    try:
+        texto = codecs.getincrementaldecoder("utf-8")().decode(inicio)
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        texto, encoding = inicio.decode("latin-1"), "latin-1"
+    try:
+        sep = csv.Sniffer().sniff(texto.split("\n", 1)[0], delimiters=";,\t|").delimiter
+    except csv.Error:
+        sep = ","
+    return encoding, sep
+
+
+def ler_blocos(arquivo, nome_arquivo, bloco=BLOCO_LINHAS):
+    """Gera (DataFrame de até `bloco` linhas, fração já lida) com todas as células como texto"""
+    arquivo.seek(0)
+    if _eh_xlsx(nome_arquivo):
+        from openpyxl import load_workbook
+        wb = load_workbook(arquivo, read_only=True, data_only=True)
+        try:
+            ws = wb.active
+            total = ws.max_row or 0
+            linhas = ws.iter_rows(values_only=True)
+            cab = [str(c).strip() if c is not None else f"Coluna {i + 1}" for i, c in enumerate(next(linhas, ()))]
+            buf, lidas = [], 1
+            for l in linhas:
+                buf.append(l[:len(cab)])
+                lidas += 1
+                if len(buf) >= bloco:
+                    yield pd.DataFrame(buf, columns=cab, dtype="string"), lidas / total if total else 0.0
+                    buf = []
+            if buf: yield pd.DataFrame(buf, columns=cab, dtype="string"), 1.0
+        finally:
+            wb.close()
+        return
+    encoding, sep = _formato_csv(arquivo)
+    tamanho = getattr(arquivo, "size", None) or len(arquivo.getbuffer())
+    texto = io.TextIOWrapper(arquivo, encoding=encoding, newline="")
+    try:
+        for df in pd.read_csv(texto, sep=sep, dtype="string", chunksize=bloco, skipinitialspace=True):
+            df.columns = [str(c).strip() for c in df.columns]
+            yield df, min(arquivo.tell() / tamanho, 1.0) if tamanho else 0.0
+    finally:
+        texto.detach()  # devolve o arquivo sem fechá-lo
+
+
+def cabecalho(arquivo, nome_arquivo):
+    """Nomes das colunas da planilha (lendo só o primeiro bloco pequeno)"""
+    blocos = ler_blocos(arquivo, nome_arquivo, bloco=5)
+    try:
+        df, _ = next(blocos, (pd.DataFrame(), 0))
+    finally:
+        blocos.close()
+    arquivo.seek(0)
+    return list(df.columns)
+
+
+def adivinhar_colunas(colunas, palpites=PALPITES):
+    """Campo do cadastro -> coluna da planilha (ou None), pelos nomes mais comuns"""
+    mapa = {}
+    for campo, comecos in palpites.items():
+        mapa[campo] = next((c for p in comecos for c in colunas if normalizar(c).startswith(p) and c not in mapa.values()), None)
+    return mapa
+
+
+def converter_precos(serie):
+    """Texto de preço ("R$ 1.234,56", "12.5") -> número; o que não for número vira NaN"""
+    s = serie.astype("string").str.replace(r"[R$\s]", "", regex=True)
+    virgula = s.str.contains(",", regex=False).fillna(False)
+    s = s.where(~virgula, s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(s, errors="coerce")
+
+
+class ImportadorPrecos:
+    def __init__(self, cache):
+        self.cache = cache
+        mat = cache.frame("materiais")
+        self.ids = dict(zip(mat["nome"].fillna("").map(normalizar), mat["id"])) if not mat.empty else {}
+        self.linhas = self.novos = self.atualizados = self.iguais = self.ignorados = 0
+        self.inicio = time.perf_counter()
+
+    def aplicar(self, bloco, mapa):
+        """Grava um bloco da planilha; mapa = campo do cadastro -> coluna (None = não importar)"""
+        self.linhas += len(bloco)
+        df = pd.DataFrame({"nome": bloco[mapa["nome"]].str.strip()})
+        campos = [c for c in ("unidade", "preco_ref") if mapa.get(c)]
+        if "unidade" in campos: df["unidade"] = bloco[mapa["unidade"]].str.strip()
+        if "preco_ref" in campos: df["preco_ref"] = converter_precos(bloco[mapa["preco_ref"]])
+        df = df[df["nome"].fillna("") != ""]
+        df = df.assign(chave=df["nome"].map(normalizar)).drop_duplicates("chave", keep="last")  # no bloco vale a última linha
+        self.ignorados += len(bloco) - len(df)
+        df["id"] = df["chave"].map(self.ids)
+
+        existentes = df[df["id"].notna()]
+        if campos and not existentes.empty:
+            # Linhas completas do cadastro com só os campos preenchidos na planilha por cima
+            atual = self.cache.frame("materiais").set_index("id").loc[existentes["id"].astype(int)]
+            trocas = {}
+            for c in campos:
+                valores = pd.Series(existentes[c].values, index=atual.index)
+                trocas[c] = valores.where(valores.notna(), atual[c].astype(object))
+            novo = atual.assign(**trocas)
+            mudou = ~((novo[campos] == atual[campos]) | (novo[campos].isna() & atual[campos].isna())).all(axis=1)
+            self.atualizados += int(mudou.sum())
+            self.iguais += int((~mudou).sum())
+            if mudou.any(): self.cache.salvar_lote("materiais", novo[mudou].reset_index())
+        else:
+            self.iguais += len(existentes)
+
+        novos = df[df["id"].isna()]
+        if not novos.empty:
+            criadas = self.cache.inserir_lote("materiais", para_banco("materiais", novos[["nome", *campos]]))
+            self.ids.update({normalizar(c["nome"]): c["id"] for c in criadas})
+            self.novos += len(novos)
+
+    def resumo(self):
+        seg = time.perf_counter() - self.inicio
+        return (f"{self.linhas} linhas em {seg:.1f}s ({self.linhas / seg if seg else 0:,.0f} linhas/s): "
+                f"{self.novos} novos, {self.atualizados} atualizados, {self.iguais} sem mudança, {self.ignorados} ignorados")
@@ -0,0 +1,333 @@
+"""Servidor falso do Supabase para o benchmark: responde nas rotas do PostgREST (/rest/v1/...)
+que o create_client usa, com os dados num arquivo SQLite (mesmo esquema do RepositorioSQLite).
+
+Uso:
+    python servidor_falso.py --banco bench.db --latencia 40 --porta 54321
+
+e no .streamlit/secrets.toml: [supabase] url = "http://127.0.0.1:54321", key = "aaa.bbb.ccc".
+Cada requisição espera --latencia ms antes de responder (a ida e volta até o Supabase).
+GET /_bench/stats devolve requisições e bytes contados; POST /_bench/reset zera a contagem.
+Entende só o que o app usa: filtros eq/neq/gt/gte/lt/lte/in/is, or=(...) com and(...),
+order, limit/offset, upsert pelo Prefer e as funções de supabase_funcoes.sql. Respostas acima de
+GZIP_MIN_BYTES vão comprimidas, e os bytes contados são os que passam pela rede. O Storage
+(/storage/v1/object/<bucket>/<caminho>, upload e download) guarda os arquivos na pasta do
+RepositorioSQLite.
+"""
+import argparse
+import email.parser
+import email.policy
+import gzip
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from armazenamento import ESQUEMA_SQLITE, RepositorioSQLite
+
+OPERADORES = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+PARAMS_RESERVADOS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+GZIP_MIN_BYTES = 1024
+
+
+class ErroPostgrest(Exception):
+    def __init__(self, status, codigo, mensagem):
+        super().__init__(mensagem)
+        self.status, self.codigo = status, codigo
+
+
+def _dividir(texto):
+    """Separa por vírgula fora de aspas e parênteses: 'a.eq.1,and(b.eq.2,c.eq.3)' -> 2 partes"""
+    partes, atual, nivel, aspas, escape = [], "", 0, False, False
+    for c in texto:
+        if escape: atual += c; escape = False; continue
+        if c == "\\" and aspas: atual += c; escape = True; continue
+        if c == '"': aspas = not aspas
+        elif not aspas and c == "(": nivel += 1
+        elif not aspas and c == ")": nivel -= 1
+        elif not aspas and nivel == 0 and c == ",":
+            partes.append(atual); atual = ""; continue
+        atual += c
+    if atual: partes.append(atual)
+    return partes
+
+
+def _valor(texto):
+    if len(texto) >= 2 and texto[0] == texto[-1] == '"':
+        return texto[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return texto
+
+
+class Tabela:
+    """Colunas conhecidas da tabela, para montar o SQL só com nomes válidos"""
+
+    def __init__(self, nome):
+        if nome not in ESQUEMA_SQLITE: raise ErroPostgrest(404, "42P01", f'relation "{nome}" does not exist')
+        self.nome = nome
+        self.colunas = {"id", "updated_at", *(c.split()[0] for c in ESQUEMA_SQLITE[nome].split(", "))}
+
+    def coluna(self, nome):
+        if nome not in self.colunas: raise ErroPostgrest(400, "42703", f"column {self.nome}.{nome} does not exist")
+        return nome
+
+    def condicao(self, coluna, expr):
+        """'gt.5' -> ('coluna > ?', ['5'])"""
+        op, _, valor = expr.partition(".")
+        col = self.coluna(coluna)
+        if op in OPERADORES: return f"{col} {OPERADORES[op]} ?", [_valor(valor)]
+        if op == "in":
+            itens = [_valor(v) for v in _dividir(valor.strip()[1:-1])]
+            return (f"{col} IN ({','.join('?' * len(itens))})", itens) if itens else ("0", [])
+        if op == "is": return f"{col} IS {'NULL' if valor == 'null' else 'TRUE' if valor == 'true' else 'FALSE'}", []
+        raise ErroPostgrest(400, "PGRST100", f"operador não suportado: {op}")
+
+    def logica(self, juncao, texto):
+        """or=(...) / and(...): condições separadas por vírgula, com and()/or() aninhados"""
+        sqls, args = [], []
+        for parte in _dividir(texto.strip()[1:-1]):
+            m = re.match(r"^(and|or)(\(.*\))$", parte)
+            if m: sql, a = self.logica(m.group(1).upper(), m.group(2))
+            else:
+                col, _, expr = parte.partition(".")
+                sql, a = self.condicao(col, expr)
+            sqls.append(f"({sql})"); args += a
+        return f" {juncao} ".join(sqls), args
+
+    def onde(self, params):
+        sqls, args = ["1=1"], []
+        for chave, valor in params:
+            if chave in PARAMS_RESERVADOS: continue
+            if chave in ("or", "and"): sql, a = self.logica(chave.upper(), valor)
+            else: sql, a = self.condicao(chave, valor)
+            sqls.append(f"({sql})"); args += a
+        return " AND ".join(sqls), args
+
+    def ordem(self, texto):
+        partes = []
+        for item in texto.split(","):
+            col, *mods = item.split(".")
+            partes.append(f"{self.coluna(col)} {'DESC' if 'desc' in mods else 'ASC'}")
+        return ", ".join(partes)
+
+
+class BancoFalso:
+    """Executa as requisições do PostgREST no SQLite"""
+
+    def __init__(self, caminho):
+        self.repo = RepositorioSQLite(caminho)  # cria o esquema e atende as funções (rpc)
+        self.conn, self.lock = self.repo.conn, self.repo.lock
+        self.funcoes = {
+            "criar_obra": lambda p: self.repo.criar_obra(p["p_obra"], p.get("p_cronograma", []), p.get("p_pontos", [])),
+            "reaplicar_padrao": lambda p: self.repo.reaplicar_padrao(p["p_id_obra"], p.get("p_cronograma", []), p.get("p_pontos", [])),
+            "excluir_obra": lambda p: self.repo.excluir_obra(p["p_id_obra"]),
+            "aplicar_lote": lambda p: self.repo.aplicar_lote(p["p_plano"]),
+            "arquivar_obra": lambda p: self.repo.arquivar_obra(p["p_id_obra"], p["p_resumo"]),
+            "desarquivar_obra": lambda p: self.repo.desarquivar_obra(p["p_id_obra"], p.get("p_tabelas", {})),
+            "pacote_obra": lambda p: self.repo.pacote_obra(p["p_id_obra"], p.get("p_por_obra", {}), p.get("p_globais", {})),
+        }
+
+    def _executar(self, sql, args):
+        with self.lock:
+            return [dict(r) for r in self.conn.execute(sql, args)]
+
+    def selecionar(self, tabela, params, faixa=None):
+        t, d = Tabela(tabela), dict(params)
+        onde, args = t.onde(params)
+        sql = f"SELECT * FROM {tabela} WHERE {onde}"
+        if "order" in d: sql += f" ORDER BY {t.ordem(d['order'])}"
+        inicio, limite = int(d.get("offset", 0)), d.get("limit")
+        if faixa: inicio, limite = faixa[0], faixa[1] - faixa[0] + 1
+        sql += f" LIMIT {int(limite) if limite is not None else -1} OFFSET {inicio}"
+        return self._executar(sql, args)
+
+    def inserir(self, tabela, params, linhas, prefer):
+        t, d = Tabela(tabela), dict(params)
+        linhas = linhas if isinstance(linhas, list) else [linhas]
+        conflito = t.coluna(d.get("on_conflict", "id"))
+        gravadas = []
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for l in linhas:
+                    cols = [t.coluna(c) for c in l]
+                    sql = f"INSERT INTO {tabela} ({', '.join(cols)}) VALUES ({','.join('?' * len(cols))})"
+                    if "resolution=merge-duplicates" in prefer:
+                        sets = ", ".join(f"{c} = excluded.{c}" for c in cols if c != conflito)
+                        sql += f" ON CONFLICT({conflito}) DO UPDATE SET {sets}" if sets else f" ON CONFLICT({conflito}) DO NOTHING"
+                    elif "resolution=ignore-duplicates" in prefer:
+                        sql += f" ON CONFLICT({conflito}) DO NOTHING"
+                    gravadas += [dict(r) for r in self.conn.execute(sql + " RETURNING *", list(l.values()))]
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return gravadas
+
+    def atualizar(self, tabela, params, campos):
+        t = Tabela(tabela)
+        onde, args = t.onde(params)
+        sets = ", ".join(f"{t.coluna(c)} = ?" for c in campos)
+        return self._executar(f"UPDATE {tabela} SET {sets} WHERE {onde} RETURNING *", [*campos.values(), *args])
+
+    def excluir(self, tabela, params):
+        onde, args = Tabela(tabela).onde(params)
+        return self._executar(f"DELETE FROM {tabela} WHERE {onde} RETURNING *", args)
+
+    def rpc(self, funcao, params):
+        if funcao not in self.funcoes:
+            raise ErroPostgrest(404, "PGRST202", f"Could not find the function public.{funcao}")
+        return self.funcoes[funcao](params)
+
+
+class Contador:
+    """Idas e voltas e bytes por rota (método + tabela), como o benchmark enxerga a rede"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.zerar()
+
+    def zerar(self):
+        with self.lock:
+            self.rotas = defaultdict(lambda: {"requisicoes": 0, "bytes_enviados": 0, "bytes_recebidos": 0})
+
+    def contar(self, rota, enviados, recebidos):
+        with self.lock:
+            r = self.rotas[rota]
+            r["requisicoes"] += 1; r["bytes_enviados"] += enviados; r["bytes_recebidos"] += recebidos
+
+    def total(self):
+        with self.lock:
+            soma = {"requisicoes": 0, "bytes_enviados": 0, "bytes_recebidos": 0}
+            for r in self.rotas.values():
+                for k in soma: soma[k] += r[k]
+            return soma
+
+    def por_rota(self):
+        with self.lock:
+            return {k: dict(v) for k, v in self.rotas.items()}
+
+
+class Tratador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # mantém a conexão aberta, como o httpx do cliente espera
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, status, corpo=None, rota=None, recebidos=0, tipo="application/json"):
+        dados = corpo if isinstance(corpo, bytes) else b"" if corpo is None else json.dumps(corpo, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        # Como o gateway do Supabase: respostas maiores vão em gzip quando o cliente aceita
+        if len(dados) > GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", ""):
+            dados = gzip.compress(dados, compresslevel=5)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+        if rota: self.server.contador.contar(rota, recebidos, len(dados))
+
+    def _tratar(self):
+        url = urlsplit(self.path)
+        n = int(self.headers.get("Content-Length") or 0)
+        bruto = self.rfile.read(n) if n else b""
+        if url.path == "/_bench/stats": return self._responder(200, {"total": self.server.contador.total(), "rotas": self.server.contador.por_rota()})
+        if url.path == "/_bench/reset": self.server.contador.zerar(); return self._responder(204)
+        if self.server.latencia: time.sleep(self.server.latencia / 1000)
+
+        if url.path.startswith("/storage/v1/object/"): return self._storage(url.path, bruto)
+        params = parse_qsl(url.query, keep_blank_values=True)
+        prefer = self.headers.get("Prefer", "")
+        partes = url.path.strip("/").split("/")
+        rota = f"{self.command} {'/'.join(partes[2:])}"
+        try:
+            corpo = json.loads(bruto) if bruto else None
+            banco = self.server.banco
+            if partes[:2] != ["rest", "v1"] or len(partes) < 3:
+                raise ErroPostgrest(404, "PGRST000", "rota desconhecida")
+            if partes[2] == "rpc":
+                res = banco.rpc(partes[3], corpo or {})
+                return self._responder(200 if res is not None else 204, res, rota, len(bruto))
+            tabela = partes[2]
+            if self.command == "GET":
+                faixa = re.match(r"(\d+)-(\d+)", self.headers.get("Range", ""))
+                res = banco.selecionar(tabela, params, (int(faixa[1]), int(faixa[2])) if faixa else None)
+            elif self.command == "POST": res = banco.inserir(tabela, params, corpo, prefer)
+            elif self.command == "PATCH": res = banco.atualizar(tabela, params, corpo or {})
+            elif self.command == "DELETE": res = banco.excluir(tabela, params)
+            else: raise ErroPostgrest(405, "PGRST000", "método não suportado")
+            if self.command != "GET" and "return=representation" not in prefer:
+                return self._responder(204, None, rota, len(bruto))
+            self._responder(201 if self.command == "POST" else 200, res, rota, len(bruto))
+        except ErroPostgrest as e:
+            self._responder(e.status, {"code": e.codigo, "message": str(e), "details": None, "hint": None}, rota, len(bruto))
+        except Exception as e:
+            self._responder(400, {"code": "PGRST000", "message": repr(e), "details": None, "hint": None}, rota, len(bruto))
+
+    def _storage(self, caminho, bruto):
+        """Upload (POST multipart, campo "file") e download (GET) de um objeto do bucket"""
+        bucket, _, objeto = caminho.removeprefix("/storage/v1/object/").partition("/")
+        rota, repo = f"{self.command} storage/{bucket}", self.server.banco.repo
+        if self.command == "POST":
+            cabecalho = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+            msg = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(cabecalho + bruto)
+            arquivo = next(p for p in msg.iter_parts() if p.get_param("name", header="content-disposition") == "file")
+            repo.guardar_arquivo(f"{bucket}/{objeto}", arquivo.get_payload(decode=True))
+            return self._responder(200, {"Key": f"{bucket}/{objeto}"}, rota, len(bruto))
+        dados = repo.ler_arquivo(f"{bucket}/{objeto}") if self.command == "GET" else None
+        if dados is None:
+            return self._responder(404, {"statusCode": "404", "error": "not_found", "message": "Object not found"}, rota, len(bruto))
+        self._responder(200, dados, rota, len(bruto), tipo="application/octet-stream")
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _tratar
+
+
+class ServidorFalso:
+    """Sobe o servidor numa thread: with ServidorFalso("bench.db", latencia=40) as srv: srv.url"""
+
+    def __init__(self, caminho, latencia=0, porta=0, host="127.0.0.1"):
+        self.http = ThreadingHTTPServer((host, porta), Tratador)
+        self.http.daemon_threads = True
+        self.http.banco = BancoFalso(caminho)
+        self.http.contador = self.contador = Contador()
+        self.http.latencia = latencia
+        self.url = f"http://{host}:{self.http.server_port}"
+        self.thread = None
+
+    @property
+    def latencia(self):
+        return self.http.latencia
+
+    @latencia.setter
+    def latencia(self, ms):
+        self.http.latencia = ms
+
+    def iniciar(self):
+        self.thread = threading.Thread(target=self.http.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def parar(self):
+        self.http.shutdown()
+        self.http.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Servidor falso do Supabase (PostgREST) sobre SQLite")
+    ap.add_argument("--banco", default="bench.db")
+    ap.add_argument("--latencia", type=float, default=0, help="ms de espera por requisição")
+    ap.add_argument("--porta", type=int, default=54321)
+    args = ap.parse_args()
+    srv = ServidorFalso(args.banco, args.latencia, args.porta)
+    print(f"Servidor falso em {srv.url} (banco {args.banco}, latência {args.latencia:g} ms) - Ctrl+C para sair")
+    try:
+        srv.http.serve_forever()
+    except KeyboardInterrupt:
+        srv.http.server_close()
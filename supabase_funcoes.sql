@@ -0,0 +1,206 @@
+-- Funções do banco usadas pelo app (rodar uma vez no SQL Editor do Supabase).
+-- Cada função roda numa única transação: ou a obra é criada/apagada inteira, ou nada muda.
+
+-- Chave de idempotência dos lançamentos enviados pela fila offline (fila.py) e das linhas
+-- trazidas pelo importar_legado.py (reimportar um bloco não duplica)
+alter table custos add column if not exists chave_idem text unique;
+alter table cronograma add column if not exists chave_idem text unique;
+
+-- Versões dos padrões construtivos (modelos.py); etapas = JSON da versão
+create table if not exists modelos (
+  id bigint generated by default as identity primary key,
+  nome text not null,
+  versao int not null,
+  etapas text not null,
+  updated_at timestamptz default now(),
+  unique (nome, versao)
+);
+
+-- Resumo das obras arquivadas (arquivo_morto.py); as linhas delas ficam em Parquet no Storage
+create table if not exists obras_arquivadas (
+  id bigint generated by default as identity primary key,
+  id_obra bigint not null unique references obras (id),
+  gasto numeric, recebido numeric, orcado numeric,
+  n_custos int, n_cronograma int, n_pontos_criticos int, n_tarefas int,
+  bytes bigint,
+  arquivada_em text,
+  updated_at timestamptz default now()
+);
+insert into storage.buckets (id, name, public) values ('arquivo-obras', 'arquivo-obras', false) on conflict (id) do nothing;
+
+-- Marca d'água da sincronização incremental (dados.py, vigia.py): updated_at em todas as
+-- tabelas do app, com índice e atualizado por gatilho a cada alteração (como no SQLite local).
+-- Sem a coluna o cache cai para a marca por id e só vê edições na recarga completa.
+create or replace function _tocar_updated_at()
+returns trigger language plpgsql as $$
+begin
+  new.updated_at := now();
+  return new;
+end $$;
+
+do $$
+declare
+  v_tabela text;
+begin
+  foreach v_tabela in array array['obras', 'custos', 'cronograma', 'pontos_criticos', 'tarefas', 'materiais',
+                                  'fornecedores', 'modelos', 'obras_arquivadas'] loop
+    execute format('alter table %I add column if not exists updated_at timestamptz default now()', v_tabela);
+    execute format('create index if not exists %I on %I (updated_at)', v_tabela || '_updated_at_idx', v_tabela);
+    execute format('drop trigger if exists %I on %I', v_tabela || '_updated_at', v_tabela);
+    execute format('create trigger %I before update on %I for each row execute function _tocar_updated_at()',
+                   v_tabela || '_updated_at', v_tabela);
+  end loop;
+end $$;
+
+-- Paginação do histórico por (data, id) dentro da obra, sem data no fim nos dois sentidos
+-- (a leitura de trás para frente do primeiro índice poria os nulos no começo)
+create index if not exists custos_obra_data_idx on custos (id_obra, data, id);
+create index if not exists custos_obra_data_desc_idx on custos (id_obra, data desc nulls last, id desc);
+
+-- Insere um array JSON de linhas usando as chaves do primeiro elemento como colunas
+create or replace function _inserir_json(p_tabela text, p_linhas jsonb)
+returns setof bigint language plpgsql as $$
+declare
+  v_cols text;
+begin
+  if p_linhas is null or jsonb_array_length(p_linhas) = 0 then return; end if;
+  select string_agg(quote_ident(k), ', ') into v_cols from jsonb_object_keys(p_linhas -> 0) k;
+  return query execute format(
+    'insert into %I (%s) select %s from jsonb_populate_recordset(null::%I, $1) returning id',
+    p_tabela, v_cols, v_cols, p_tabela) using p_linhas;
+end $$;
+
+-- Acrescenta id_obra em cada linha do array
+create or replace function _com_obra(p_linhas jsonb, p_id bigint)
+returns jsonb language sql immutable as $$
+  select coalesce(jsonb_agg(e || jsonb_build_object('id_obra', p_id)), '[]'::jsonb)
+  from jsonb_array_elements(coalesce(p_linhas, '[]'::jsonb)) e
+$$;
+
+-- Obra + cronograma + checklist padrão numa chamada só; devolve a linha da obra
+create or replace function criar_obra(p_obra jsonb, p_cronograma jsonb default '[]', p_pontos jsonb default '[]')
+returns jsonb language plpgsql as $$
+declare
+  v_id bigint;
+begin
+  select * into v_id from _inserir_json('obras', jsonb_build_array(p_obra));
+  perform _inserir_json('cronograma', _com_obra(p_cronograma, v_id));
+  perform _inserir_json('pontos_criticos', _com_obra(p_pontos, v_id));
+  return (select to_jsonb(o) from obras o where o.id = v_id);
+end $$;
+
+-- Recria cronograma e checklist da obra a partir de um novo padrão
+create or replace function reaplicar_padrao(p_id_obra bigint, p_cronograma jsonb default '[]', p_pontos jsonb default '[]')
+returns void language plpgsql as $$
+begin
+  delete from pontos_criticos where id_obra = p_id_obra;
+  delete from cronograma where id_obra = p_id_obra;
+  perform _inserir_json('cronograma', _com_obra(p_cronograma, p_id_obra));
+  perform _inserir_json('pontos_criticos', _com_obra(p_pontos, p_id_obra));
+end $$;
+
+-- Reaplicação de um padrão em várias obras (modelos.Modelos.aplicar): só as linhas que mudam,
+-- numa transação. p_plano = {"excluir": {"tabela": [ids]}, "atualizar": {"tabela": [linhas com id]},
+-- "inserir": {"tabela": [linhas]}, "renomear": [{"id_obra", "de", "para"}]} (etapa dos custos)
+create or replace function aplicar_lote(p_plano jsonb)
+returns void language plpgsql as $$
+declare
+  v_tabela text;
+  v_linhas jsonb;
+  v_sets text;
+begin
+  for v_tabela, v_linhas in select key, value from jsonb_each(coalesce(p_plano -> 'excluir', '{}')) loop
+    execute format('delete from %I where id in (select jsonb_array_elements_text($1)::bigint)', v_tabela) using v_linhas;
+  end loop;
+  for v_tabela, v_linhas in select key, value from jsonb_each(coalesce(p_plano -> 'atualizar', '{}')) loop
+    continue when jsonb_array_length(v_linhas) = 0;
+    select string_agg(format('%1$I = r.%1$I', k), ', ') into v_sets
+      from jsonb_object_keys(v_linhas -> 0) k where k not in ('id', 'id_obra');
+    execute format('update %I t set %s from jsonb_populate_recordset(null::%I, $1) r where t.id = r.id',
+                   v_tabela, v_sets, v_tabela) using v_linhas;
+  end loop;
+  for v_tabela, v_linhas in select key, value from jsonb_each(coalesce(p_plano -> 'inserir', '{}')) loop
+    perform _inserir_json(v_tabela, v_linhas);
+  end loop;
+  update custos c set etapa = r.para
+    from jsonb_to_recordset(coalesce(p_plano -> 'renomear', '[]')) as r(id_obra bigint, de text, para text)
+    where c.id_obra = r.id_obra and c.etapa = r.de;
+end $$;
+
+-- Apaga a obra e tudo que depende dela (inclusive tarefas)
+create or replace function excluir_obra(p_id_obra bigint)
+returns void language plpgsql as $$
+begin
+  delete from custos where id_obra = p_id_obra;
+  delete from pontos_criticos where id_obra = p_id_obra;
+  delete from cronograma where id_obra = p_id_obra;
+  delete from tarefas where id_obra = p_id_obra;
+  delete from obras_arquivadas where id_obra = p_id_obra;
+  delete from obras where id = p_id_obra;
+end $$;
+
+-- Arquiva a obra depois que os arquivos foram gravados e conferidos: apaga as linhas dela
+-- (se as contagens não batem com as de p_resumo, algo foi gravado depois da cópia e nada muda),
+-- grava o resumo e marca a obra. Devolve {"obra": ..., "resumo": ...}
+create or replace function arquivar_obra(p_id_obra bigint, p_resumo jsonb)
+returns jsonb language plpgsql as $$
+declare
+  v_tabela text;
+  v_n int;
+  v_id bigint;
+begin
+  foreach v_tabela in array array['custos', 'pontos_criticos', 'cronograma', 'tarefas'] loop
+    execute format('delete from %I where id_obra = $1', v_tabela) using p_id_obra;
+    get diagnostics v_n = row_count;
+    if v_n <> (p_resumo ->> ('n_' || v_tabela))::int then
+      raise exception '% mudou durante o arquivamento (% linhas, % no arquivo)', v_tabela, v_n, p_resumo ->> ('n_' || v_tabela);
+    end if;
+  end loop;
+  select * into v_id from _inserir_json('obras_arquivadas', jsonb_build_array(p_resumo || jsonb_build_object('id_obra', p_id_obra)));
+  update obras set status = 'Arquivada' where id = p_id_obra;
+  return jsonb_build_object('obra', (select to_jsonb(o) from obras o where o.id = p_id_obra),
+                            'resumo', (select to_jsonb(a) from obras_arquivadas a where a.id = v_id));
+end $$;
+
+-- Devolve as linhas da obra arquivada (p_tabelas = {"tabela": [linhas com id]}); devolve a obra
+create or replace function desarquivar_obra(p_id_obra bigint, p_tabelas jsonb default '{}')
+returns jsonb language plpgsql as $$
+declare
+  v_tabela text;
+  v_linhas jsonb;
+begin
+  for v_tabela, v_linhas in select key, value from jsonb_each(p_tabelas) loop
+    perform _inserir_json(v_tabela, v_linhas);
+  end loop;
+  delete from obras_arquivadas where id_obra = p_id_obra;
+  update obras set status = 'Concluída' where id = p_id_obra;
+  return (select to_jsonb(o) from obras o where o.id = p_id_obra);
+end $$;
+
+-- Tabelas da tela de uma obra numa resposta só: {"custos": [...], "obras": [...], ...}.
+-- p_por_obra e p_globais = {"tabela": ["coluna", ...]}; lista vazia traz todas as colunas.
+-- As de p_por_obra vêm filtradas por id_obra; as de p_globais, inteiras. Colunas pedidas que a
+-- tabela não tem são ignoradas (o cache completa as que faltam vazias).
+create or replace function pacote_obra(p_id_obra bigint, p_por_obra jsonb default '{}', p_globais jsonb default '{}')
+returns jsonb language plpgsql stable as $$
+declare
+  v_pacote jsonb := '{}';
+  v_tabela text;
+  v_colunas jsonb;
+  v_select text;
+  v_linhas jsonb;
+begin
+  for v_tabela, v_colunas in
+    select key, value from jsonb_each(p_por_obra) union all select key, value from jsonb_each(p_globais)
+  loop
+    select coalesce(string_agg(quote_ident(c), ', '), '*') into v_select
+      from jsonb_array_elements_text(v_colunas) c
+      where exists (select 1 from information_schema.columns ic
+                    where ic.table_schema = 'public' and ic.table_name = v_tabela and ic.column_name = c);
+    execute format('select coalesce(jsonb_agg(to_jsonb(t) order by t.id), ''[]'') from (select %s from %I %s) t',
+                   v_select, v_tabela, case when p_por_obra ? v_tabela then 'where id_obra = $1' else '' end)
+      into v_linhas using p_id_obra;
+    v_pacote := v_pacote || jsonb_build_object(v_tabela, v_linhas);
+  end loop;
+  return v_pacote;
+end $$;
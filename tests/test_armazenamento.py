@@ -0,0 +1,88 @@
+from armazenamento import RepositorioSQLite, RepositorioSupabase
+
+
+def paginas(repo, id_obra, desc):
+    vistos, cursor = [], None
+    while True:
+        linhas = repo.pagina("custos", id_obra, ordem=("data", desc), cursor=cursor, limite=2)
+        vistos += [l["id"] for l in linhas]
+        if len(linhas) < 2: return vistos
+        cursor = (linhas[-1]["data"], linhas[-1]["id"])
+
+
+def test_pagina_com_data_nula_percorre_tudo_com_nulos_no_fim(tmp_path):
+    repo = RepositorioSQLite(str(tmp_path / "t.db"))
+    obra = repo.criar_obra({"nome": "O"})
+    datas = ["2026-01-02", None, "2026-01-01", None, "2026-01-02", None, "2026-01-03"]
+    ids = [l["id"] for l in repo.inserir("custos", [{"id_obra": obra["id"], "data": d, "total": 1.0} for d in datas])]
+    nulos = [i for i, d in zip(ids, datas) if d is None]
+
+    desc, asc = paginas(repo, obra["id"], True), paginas(repo, obra["id"], False)
+    assert sorted(desc) == sorted(asc) == sorted(ids)
+    assert desc[-3:] == sorted(nulos, reverse=True) and asc[-3:] == nulos
+    assert desc[:4] == [ids[6], ids[4], ids[0], ids[2]]
+
+
+# --- SUPABASE SEM AS FUNÇÕES DO BANCO (caminho alternativo) ---
+class SemFuncao(Exception):
+    code = "PGRST202"
+
+
+class Resposta:
+    def __init__(self, data): self.data = data
+
+
+class Consulta:
+    """O pouco do cliente do PostgREST que o RepositorioSupabase usa, sobre listas em memória"""
+    def __init__(self, banco, tabela):
+        self.banco, self.tabela, self.filtros, self.acao, self.faixa = banco, tabela, [], ("select", None), None
+
+    def select(self, *_): return self
+    def update(self, campos): self.acao = ("update", campos); return self
+    def delete(self): self.acao = ("delete", None); return self
+    def insert(self, linhas): self.acao = ("insert", linhas); return self
+    def eq(self, col, valor): self.filtros.append(lambda l: l.get(col) == valor); return self
+    def in_(self, col, valores): self.filtros.append(lambda l: l.get(col) in valores); return self
+    def order(self, *_, **__): return self
+    def range(self, de, ate): self.faixa = (de, ate + 1); return self
+
+    def execute(self):
+        linhas = self.banco.setdefault(self.tabela, [])
+        tipo, arg = self.acao
+        if tipo == "insert":
+            if self.banco.get("falhar_insert"): raise ConnectionError("caiu")
+            novas = [{**l, "id": len(linhas) + i + 100} for i, l in enumerate(arg)]
+            linhas += novas
+            return Resposta(novas)
+        achadas = sorted((l for l in linhas if all(f(l) for f in self.filtros)), key=lambda l: l["id"])
+        if tipo == "update":
+            for l in achadas: l.update(arg)
+        elif tipo == "delete":
+            self.banco[self.tabela] = [l for l in linhas if l not in achadas]
+        return Resposta(achadas[slice(*self.faixa)] if self.faixa else achadas)
+
+
+class ClienteFalso:
+    def __init__(self, banco): self.banco = banco
+    def table(self, tabela): return Consulta(self.banco, tabela)
+    def rpc(self, *_): raise SemFuncao()
+
+
+def test_supabase_renomear_sem_funcao_troca_e_encadeia():
+    banco = {"custos": [{"id": i, "id_obra": 1, "etapa": e} for i, e in enumerate(["A", "B", "C", "D", "A"], 1)]}
+    repo = RepositorioSupabase(ClienteFalso(banco))
+    repo.aplicar_lote({"renomear": [{"id_obra": 1, "de": "A", "para": "B"}, {"id_obra": 1, "de": "B", "para": "A"},
+                                    {"id_obra": 1, "de": "C", "para": "D"}, {"id_obra": 1, "de": "D", "para": "E"}]})
+    assert [l["etapa"] for l in banco["custos"]] == ["B", "A", "D", "E", "B"]
+
+
+def test_supabase_reaplicar_padrao_sem_funcao_so_apaga_depois_de_inserir():
+    banco = {"cronograma": [{"id": 1, "id_obra": 1, "etapa": "velha"}], "pontos_criticos": [{"id": 2, "id_obra": 1, "etapa": "velha"}]}
+    repo = RepositorioSupabase(ClienteFalso(banco))
+    banco["falhar_insert"] = True
+    try: repo.reaplicar_padrao(1, [{"etapa": "nova"}], [{"etapa": "nova"}])
+    except ConnectionError: pass
+    assert [l["etapa"] for l in banco["cronograma"]] == ["velha"]
+    banco["falhar_insert"] = False
+    repo.reaplicar_padrao(1, [{"etapa": "nova"}], [{"etapa": "nova"}])
+    assert [l["etapa"] for l in banco["cronograma"]] == [l["etapa"] for l in banco["pontos_criticos"]] == ["nova"]
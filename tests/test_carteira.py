@@ -0,0 +1,16 @@
+import time
+
+import carteira
+from armazenamento import RepositorioSQLite
+
+
+def test_thread_atualiza_a_copia_sem_versao_nova_quando_nada_muda(tmp_path, monkeypatch):
+    monkeypatch.setattr(carteira, "ATUALIZAR_S", 0.1)
+    repo = RepositorioSQLite(str(tmp_path / "t.db"))
+    obra = repo.criar_obra({"nome": "O"})  # cronograma vazio
+    cart = carteira.CarteiraObras(repo, str(tmp_path / "carteira"))
+    cart.atualizar(forcar=True)
+    cart.iniciar()
+    repo.inserir("custos", [{"id_obra": obra["id"], "data": "2026-01-02", "etapa": "E", "total": 7.0}])
+    time.sleep(0.6)
+    assert cart.frames["custos"]["total"].sum() == 7.0 and cart.versao == 2
@@ -0,0 +1,53 @@
+import pandas as pd
+
+from armazenamento import RepositorioSQLite
+from dados import CacheTabelas, aplicar_linhas
+
+
+def test_aplicar_linhas_nao_altera_o_frame_recebido():
+    df = pd.DataFrame({"id": [1, 2], "etapa": ["A", "B"], "porcentagem": [0, 10]})
+    novo = aplicar_linhas(df, pd.DataFrame({"id": [1], "etapa": ["A2"], "porcentagem": [50]}))
+    assert df["etapa"].tolist() == ["A", "B"] and df["porcentagem"].tolist() == [0, 10]
+    assert novo["etapa"].tolist() == ["A2", "B"] and novo["porcentagem"].tolist() == [50, 10]
+
+
+def test_atualizar_corrige_resumo_e_preserva_referencia_antiga(tmp_path):
+    repo = RepositorioSQLite(str(tmp_path / "t.db"))
+    obra = repo.criar_obra({"nome": "O"}, [{"etapa": "E", "orcamento": 1.0}])
+    cache = CacheTabelas(repo, ["obras"], ["custos", "cronograma"])
+    cache.inserir("custos", [{"id_obra": obra["id"], "data": "2026-01-05", "descricao": "cim", "total": 100.0, "etapa": "E"},
+                             {"id_obra": obra["id"], "data": "2026-01-06", "descricao": "x", "total": 50.0, "etapa": "E"}])
+    cache.carregar_obra(obra["id"])
+    antes = cache.frame("custos", obra["id"])
+    crono_antes = cache.frame("cronograma", obra["id"])
+    id_cim = int(antes.loc[antes["descricao"] == "cim", "id"].iloc[0])
+
+    cache.atualizar("custos", id_cim, {"total": 300.0, "descricao": "y"}, id_obra=obra["id"])
+    cache.atualizar("cronograma", int(crono_antes["id"].iloc[0]), {"porcentagem": 80}, id_obra=obra["id"])
+
+    resumo = cache.resumo(obra["id"])
+    assert resumo.total("E") == 350.0
+    assert resumo.por_descricao().to_dict() == {"y": 300.0, "x": 50.0}
+    assert antes.loc[antes["id"] == id_cim, ["descricao", "total"]].values.tolist() == [["cim", 100.0]]
+    assert crono_antes["porcentagem"].tolist() == [0]
+    assert cache.frame("cronograma", obra["id"])["porcentagem"].tolist() == [80]
+
+
+def test_acompanhar_pega_linha_confirmada_com_hora_anterior_a_marca(tmp_path):
+    repo = RepositorioSQLite(str(tmp_path / "t.db"))
+    obra = repo.criar_obra({"nome": "O"})
+    cache = CacheTabelas(repo, ["obras"], ["custos"])
+    primeira = repo.inserir("custos", [{"id_obra": obra["id"], "data": "2026-01-05", "etapa": "E", "total": 100.0}])[0]
+    cache.carregar_obra(obra["id"])
+    assert cache.acompanhar() == 0
+
+    # Transação que começou antes e terminou depois: updated_at menor que a marca já vista
+    tarde = repo.inserir("custos", [{"id_obra": obra["id"], "data": "2026-01-06", "etapa": "E", "total": 50.0}])[0]
+    hora = (pd.Timestamp(primeira["updated_at"]) - pd.Timedelta(seconds=5)).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
+    repo.conn.execute("UPDATE custos SET updated_at = ? WHERE id = ?", (hora, tarde["id"]))
+
+    assert cache.acompanhar() == 1
+    assert sorted(cache.frame("custos", obra["id"])["id"]) == [primeira["id"], tarde["id"]]
+    assert cache.resumo(obra["id"]).total("E") == 150.0
+    versoes = cache.versoes(obra["id"])
+    assert cache.acompanhar() == 0 and cache.versoes(obra["id"]) == versoes  # a margem não redesenha nada
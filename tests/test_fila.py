@@ -0,0 +1,31 @@
+from armazenamento import RepositorioSQLite
+from dados import CacheTabelas
+from fila import MAX_TENTATIVAS, FilaEscrita
+
+
+def test_linha_recusada_nao_segura_a_fila(tmp_path):
+    repo = RepositorioSQLite(str(tmp_path / "t.db"))
+    obra = repo.criar_obra({"nome": "O"})
+    cache = CacheTabelas(repo, ["obras"], ["custos"])
+    cache.usar_fila(FilaEscrita(repo, str(tmp_path / "fila.db")))
+    cache.carregar_obra(obra["id"])
+    linha = {"id_obra": obra["id"], "data": "2026-01-05", "etapa": "E", "total": 10.0}
+    # Sem iniciar(): não há thread de envio, o teste chama enviar() sozinho
+    cache.fila.enfileirar("custos", [{**linha, "descricao": "a"}, {**linha, "coluna_que_nao_existe": 1},
+                                     {**linha, "descricao": "b"}], obra["id"], acordar=False)
+
+    for _ in range(MAX_TENTATIVAS + 1):
+        try: cache.fila.enviar()
+        except Exception: pass
+
+    assert sorted(r["descricao"] for r in repo.selecionar("custos", obra["id"])) == ["a", "b"]
+    pend, _, falhas, _ = cache.fila.situacao()
+    assert (pend, falhas) == (0, 1)
+    recusada = cache.fila.falhas()[0]
+    assert "coluna_que_nao_existe" in recusada["linha"] and recusada["erro"]
+
+    cache.invalidar("custos", id_obra=obra["id"]); cache.carregar_obra(obra["id"])
+    assert -recusada["seq"] in set(cache.frame("custos", obra["id"])["id"])
+    cache.descartar_pendentes([recusada["seq"]])
+    assert cache.fila.situacao()[2] == 0
+    assert -recusada["seq"] not in set(cache.frame("custos", obra["id"])["id"])
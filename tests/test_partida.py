@@ -0,0 +1,19 @@
+import threading
+
+import pytest
+
+import carteira
+import partida
+from metricas import Metricas
+
+
+def test_montagem_que_falha_nao_deixa_threads(tmp_path, monkeypatch):
+    segredos = {"armazenamento": {"tipo": "sqlite", "caminho": str(tmp_path / "t.db"), "fila": str(tmp_path / "f.db"),
+                                  "carteira": str(tmp_path / "carteira")}}
+    def falhar(self, forcar=False): raise RuntimeError("banco fora do ar")
+    monkeypatch.setattr(carteira.CarteiraObras, "atualizar", falhar)
+    antes = {t.name for t in threading.enumerate()}
+    for _ in range(3):
+        with pytest.raises(RuntimeError): partida.montar(segredos, Metricas(), ["obras"], ["custos"])
+    novas = {t.name for t in threading.enumerate()} - antes
+    assert not novas & {"fila-escrita", "vigia-banco", "carteira"}
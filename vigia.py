@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+
+# --- VIGIA DO BANCO ---
+# Uma thread por processo traz para o CacheTabelas (dados.py) o que outros usuários gravaram:
+# a cada INTERVALO_S ela pergunta a cada tabela só as linhas alteradas desde a última rodada
+# (CacheTabelas.acompanhar). Com o Supabase Realtime ligado ([armazenamento] realtime = true),
+# cada aviso de mudança acorda a thread na hora e apagamentos saem do cache direto; a consulta
+# periódica fica só como rede de segurança (INTERVALO_REALTIME_S). As sessões comparam as
+# versões das partições que mostram (CacheTabelas.versoes) e só redesenham quando elas mudam.
+INTERVALO_S = 3
+INTERVALO_REALTIME_S = 30
+ESPERA_MAX_S = 60
+
+
+class Vigia:
+    def __init__(self, cache, intervalo=INTERVALO_S):
+        self.cache = cache
+        self.intervalo = intervalo
+        self.ultima_rodada = 0.0
+        self.linhas_recebidas = 0
+        self.ultimo_erro = None
+        self.realtime = False
+        self._acordar = threading.Event()
+        cache.vigia = self
+
+    def iniciar(self):
+        threading.Thread(target=self._trabalhar, name="vigia-banco", daemon=True).start()
+
+    def acordar(self):
+        self._acordar.set()
+
+    def _trabalhar(self):
+        espera = self.intervalo
+        while True:
+            try:
+                self.linhas_recebidas += self.cache.acompanhar()
+                self.ultima_rodada = time.time()
+                self.ultimo_erro = None
+                espera = INTERVALO_REALTIME_S if self.realtime else self.intervalo
+            except Exception as e:
+                # Banco fora do ar: as telas continuam com o que está em cache
+                self.ultimo_erro = repr(e)
+                espera = min(espera * 2, ESPERA_MAX_S)
+            self._acordar.wait(espera)
+            self._acordar.clear()
+
+    # --- SUPABASE REALTIME ---
+    def ouvir_realtime(self, url, chave):
+        """Assina as mudanças do schema public; se não conectar, segue só com a consulta periódica"""
+        threading.Thread(target=lambda: asyncio.run(self._ouvir(url, chave)), name="vigia-realtime", daemon=True).start()
+
+    async def _ouvir(self, url, chave):
+        from realtime import RealtimeSubscribeStates
+        from supabase import acreate_client
+
+        def inscrito(estado, erro):
+            self.realtime = estado == RealtimeSubscribeStates.SUBSCRIBED
+
+        try:
+            cliente = await acreate_client(url, chave)
+            canal = cliente.channel("cache-obras")
+            canal.on_postgres_changes("*", schema="public", callback=self._mudanca)
+            await canal.subscribe(inscrito)
+            while True: await asyncio.sleep(3600)
+        except Exception as e:
+            self.realtime, self.ultimo_erro = False, f"Realtime: {e!r}"
+
+    def _mudanca(self, aviso):
+        dados = aviso.get("data", {})
+        antigo = dados.get("old_record") or {}
+        if dados.get("type") == "DELETE" and antigo.get("id") is not None:
+            self.cache.remover(dados.get("table"), [antigo["id"]])
+        else:
+            self.acordar()  # a consulta incremental traz a linha já com os tipos do cache
@@ -0,0 +1,93 @@
+import json
+
+import pandas as pd
+
+from busca import IndiceBusca
+
+# --- VISÕES PRONTAS PARA A TELA ---
+# Colunas derivadas (rótulos, número da etapa, etapa-mãe/sub-etapa), índice id -> linha e
+# grupos já separados, montados com operações vetorizadas uma vez por versão da partição
+# (CacheTabelas.visao). As telas escolhem por id e só formatam o rótulo na exibição.
+SEM_NUMERO = 9999
+
+
+class Visao:
+    """Frame pronto para a tela, com busca de linha por id e por grupo"""
+
+    def __init__(self, df, agrupar=None):
+        self.df = df
+        self.pos = pd.Index(df["id"]) if "id" in df.columns else pd.Index([])
+        self.grupos = df.groupby(agrupar, sort=False).indices if agrupar and not df.empty else {}
+
+    def ids(self):
+        return self.df["id"].tolist() if "id" in self.df.columns else []
+
+    def linha(self, id_linha):
+        """Linha (Series) com esse id, ou None"""
+        if id_linha not in self.pos: return None
+        return self.df.iloc[self.pos.get_loc(id_linha)]
+
+    def valor(self, id_linha, coluna, padrao=None):
+        linha = self.linha(id_linha)
+        return padrao if linha is None or coluna not in linha.index else linha[coluna]
+
+    def rotulo(self, id_linha):
+        """Texto do selectbox (format_func) para o id"""
+        return "" if id_linha is None else self.valor(id_linha, "rotulo", str(id_linha))
+
+    def grupo(self, chave):
+        """Linhas do grupo (coluna passada em agrupar), na ordem do frame"""
+        return self.df.iloc[self.grupos.get(chave, [])]
+
+
+def numero_etapa(etapas):
+    """Número no início do nome da etapa ("3. Alvenaria" -> 3); sem número vai para o fim"""
+    num = etapas.astype(str).str.extract(r"^(\d+)", expand=False)
+    return pd.to_numeric(num, errors="coerce").fillna(SEM_NUMERO).astype(int)
+
+
+def pai_sub(etapas):
+    """Separa "Etapa | Sub-etapa" em (pai, sub); sem " | " o pai é o nome todo e sub fica vazio"""
+    partes = etapas.astype(str).str.split(" | ", regex=False, expand=True)
+    sub = partes[1].fillna("") if 1 in partes.columns else pd.Series("", index=etapas.index)
+    return partes[0], sub
+
+
+# --- VISÕES POR TABELA ---
+def visao_cadastro(df):
+    """obras, materiais, fornecedores: rótulo "id - nome" para os selectbox"""
+    if not df.empty: df = df.assign(rotulo=df["id"].astype(str) + " - " + df["nome"].astype(str))
+    return Visao(df)
+
+
+def visao_materiais(df):
+    """Cadastro com o índice de busca por nome (busca.py)"""
+    v = visao_cadastro(df)
+    v.busca = IndiceBusca(df["id"], df["nome"]) if not df.empty else IndiceBusca([], [])
+    return v
+
+
+def visao_cronograma(df):
+    """Etapas em ordem de número, com etapa-mãe/sub-etapa separadas e agrupadas pela mãe"""
+    if df.empty: return Visao(df)
+    pai, sub = pai_sub(df["etapa"])
+    df = df.assign(sid=numero_etapa(df["etapa"]), pai=pai, sub=sub)
+    return Visao(df.sort_values("sid", kind="stable").reset_index(drop=True), agrupar="pai")
+
+
+def visao_pontos(df):
+    """Checklist agrupado pela etapa"""
+    return Visao(df, agrupar="etapa_pai")
+
+
+def visao_modelos(df):
+    """Versões dos padrões construtivos (modelos.py) já lidas do JSON: versoes[nome], da mais antiga à mais nova"""
+    v = Visao(df)
+    v.versoes = {}
+    for l in df.sort_values("versao").to_dict("records") if not df.empty else []:
+        v.versoes.setdefault(str(l["nome"]), []).append({"versao": int(l["versao"]), "etapas": json.loads(l["etapas"])})
+    return v
+
+
+VISOES = {"obras": visao_cadastro, "materiais": visao_materiais, "fornecedores": visao_cadastro,
+          "cronograma": visao_cronograma, "pontos_criticos": visao_pontos, "modelos": visao_modelos}